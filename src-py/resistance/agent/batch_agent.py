@@ -0,0 +1,118 @@
+'''
+Batch Agent
+
+The batch counterpart of the Agent class.  A BatchAgent plays every seat it
+has been given across a whole batch of games at once, so the batch engine
+makes one call per agent per game step rather than one call per player per game.
+'''
+
+import numpy
+
+from agent import Agent
+
+
+class BatchAgent():
+    '''An abstract super class for an agent playing many games of The Resistance
+    in lockstep.
+
+    At the start of a batch the agent is given every (game, seat) pair it occupies.
+    These pairs are its rows, and every later call passes rows, an integer array
+    of the row indexes the call is about.  All other arguments are NumPy arrays
+    aligned with rows:
+
+        mission and votes are boolean arrays of shape (len(rows), number_of_players)
+        proposer, betrayals and missions_failed are integer arrays of shape (len(rows),)
+
+    new_game and *_outcome methods simply inform agents of events that have occured,
+    while propose_mission, vote, and betray require the agent to commit some action
+    for each row.'''
+
+    mission_sizes = Agent.mission_sizes
+    spy_count = Agent.spy_count
+    fails_required = Agent.fails_required
+
+    def __init__(self, name, rng=None):
+        '''
+        Initialises the agent, and gives it a name.
+        rng is a numpy Generator or seed used for every random decision the agent makes.
+        '''
+        self.name = name
+        self.rng = numpy.random.default_rng(rng)
+
+    def __str__(self):
+        '''
+        Returns a string represnetation of the agent
+        '''
+        return 'BatchAgent '+self.name
+
+    def __repr__(self):
+        '''
+        returns a representation fthe state of the agent.
+        '''
+        return self.__str__()
+
+    def new_game(self, number_of_players, player_number, spies):
+        '''
+        initialises a batch of games, informing the agent of the number_of_players,
+        player_number, an array holding the seat of each row,
+        and spies, a boolean array with a row per seat which marks the spies
+        if the seat is a spy, or is all False if the seat is resistance.
+        '''
+        self.number_of_players = number_of_players
+        self.player_number = player_number
+        self.spies = spies
+        self.spy = spies[numpy.arange(len(player_number)), player_number]
+
+    def is_spy(self, rows):
+        '''
+        returns a boolean array which is True for each row that is a spy
+        '''
+        return self.spy[rows]
+
+    def propose_mission(self, rows, team_size, betrayals_required=1):
+        '''
+        expects a boolean array of shape (len(rows), number_of_players) to be returned,
+        with team_size seats marked in each row.
+        '''
+        raise NotImplementedError
+
+    def vote(self, rows, mission, proposer):
+        '''
+        The function should return a boolean array which is True for each row
+        voting for the mission, and False for each row voting against it.
+        '''
+        raise NotImplementedError
+
+    def vote_outcome(self, rows, mission, proposer, votes):
+        '''
+        votes marks the players that voted for the mission.
+        No return value is required or expected.
+        '''
+
+    def betray(self, rows, mission, proposer):
+        '''
+        Only rows that are spies on the mission are asked.
+        The method should return a boolean array which is True for each row
+        that betrays the mission.
+        '''
+        raise NotImplementedError
+
+    def mission_outcome(self, rows, mission, proposer, betrayals, mission_success):
+        '''
+        betrayals is the number of people on each mission who betrayed the mission,
+        and mission_success is True where there were not enough betrayals to cause
+        the mission to fail.
+        '''
+
+    def round_outcome(self, rows, rounds_complete, missions_failed):
+        '''
+        rounds_complete, the number of rounds (0-5) that have been completed
+        in every game of the batch, and missions_failed, the number of missions (0-3)
+        that have failed in each row's game.
+        '''
+
+    def game_outcome(self, rows, spies_win, spies):
+        '''
+        spies_win, True for each row whose game the spies won,
+        spies, a boolean array marking the spies of each row's game.
+        '''
@@ -0,0 +1,207 @@
+"""
+Batch Deterministic Agent
+
+NumPy port of the DeterministicAgent rules for the batch engine.  Each rule of
+DeterministicAgent is applied to every row at once using boolean masks over the
+players.  The port follows what DeterministicAgent actually does, so where the
+scalar agent's checks have no effect they have no effect here either:
+
+    The burnt-spy checks in vote and vote_outcome compare player numbers
+    against AgentPredisposition objects and never match.
+
+    Spy proposals never add extra spies, so spies and resistance both propose
+    themselves plus players not known to be spies.
+"""
+
+import numpy
+
+from agent.batch_agent import BatchAgent
+
+
+class BatchDeterministicAgent(BatchAgent):
+    '''Plays every row as DeterministicAgent would.  Knowledge that is held
+    in AgentPredisposition objects by the scalar agent is held as boolean arrays
+    of shape (rows, number_of_players).
+    '''
+
+    # Custom Variables
+    current_round = None
+    collusion = False
+
+    # Per row knowledge
+    missions_failed = None
+    confirmed = None
+    burnt = None
+    target_resistance = None
+    winner = None
+
+    def __init__(self, name='BatchDeterministicAgent', rng=None):
+
+        super().__init__(name, rng)
+
+    def new_game(self, number_of_players, player_number, spies):
+        '''New game setup'''
+
+        super().new_game(number_of_players, player_number, spies)
+
+        shape = (len(player_number), number_of_players)
+
+        self.current_round = 0
+        self.missions_failed = numpy.zeros(len(player_number), dtype=int)
+        self.winner = numpy.zeros(len(player_number), dtype=bool)
+
+        # distrust_level == 1.0 in the scalar agent
+        self.confirmed = numpy.zeros(shape, dtype=bool)
+        self.burnt = numpy.zeros(shape, dtype=bool)
+
+        # Resistance Members to Frame
+        self.target_resistance = numpy.zeros(shape, dtype=bool)
+
+    def collusion_mode_on(self):
+        '''Switch for setting collusion mode on'''
+        self.collusion = True
+
+    def collusion_mode_off(self):
+        '''Switch for setting collusion mode off'''
+        self.collusion = False
+
+    def propose_mission(self, rows, team_size, betrayals_required=1):
+        '''Add self then players not confirmed as spies chosen at random'''
+
+        player_number = self.player_number[rows]
+        index = numpy.arange(len(rows))
+
+        # Ordering random keys picks a random team.  Confirmed spies
+        # sort after everyone else and self sorts first.
+        keys = self.rng.random((len(rows), self.number_of_players))
+        keys[self.confirmed[rows]] += 1
+        keys[index, player_number] = -1
+
+        chosen = numpy.argsort(keys, axis=1)[:, :team_size]
+
+        team = numpy.zeros((len(rows), self.number_of_players), dtype=bool)
+        team[index[:, None], chosen] = True
+        return team
+
+    def vote(self, rows, mission, proposer):
+        '''Determine vote based on player model'''
+
+        # Accept any vote in the first round
+        if self.current_round == 0:
+            return numpy.ones(len(rows), dtype=bool)
+
+        index = numpy.arange(len(rows))
+        spy = self.is_spy(rows)
+
+        # RESISTANCE VOTE
+        # Reject proposals from or including confirmed spies
+        confirmed = self.confirmed[rows]
+        votes = ~(confirmed[index, proposer] | (mission & confirmed).any(axis=1))
+
+        # SPY VOTE
+        # Spies shouldn't vote for burnt assets
+        burnt_on_mission = (mission & self.burnt[rows]).any(axis=1)
+
+        # We are trying to frame someone so we should vote against them
+        targets = self.target_resistance[rows]
+        all_targets_on_mission = ~(targets & ~mission).any(axis=1)
+        framing = (targets.any(axis=1) & all_targets_on_mission) | targets[index, proposer]
+
+        # No spies in mission, allow it if we can still win without it
+        no_spies = ~(mission & self.spies[rows]).any(axis=1)
+        can_still_win = 4 - self.current_round >= 3 - self.missions_failed[rows]
+
+        spy_votes = ~burnt_on_mission & ~framing & (~no_spies | can_still_win)
+
+        return numpy.where(spy, spy_votes, votes)
+
+    def betray(self, rows, mission, proposer):
+        '''Determine whether to betray the mission'''
+
+        number_of_players = self.number_of_players
+        player_number = self.player_number[rows]
+        missions_failed = self.missions_failed[rows]
+
+        spies_on_mission_mask = mission & self.spies[rows]
+        spies_on_mission = spies_on_mission_mask.sum(axis=1)
+        mission_size = mission.sum(axis=1)
+
+        # Rules are applied in order, each deciding the rows still undecided
+        betrayal = numpy.ones(len(rows), dtype=bool)
+        undecided = self.is_spy(rows).copy()
+        betrayal[~undecided] = False
+
+        def decide(condition, value):
+            decided = undecided & condition
+            betrayal[decided] = value[decided] if isinstance(value, numpy.ndarray) else value
+            undecided[decided] = False
+
+        # Do not betray mission that can't fail
+        betrayals_required = self.fails_required[number_of_players][self.current_round - 1]
+        decide(spies_on_mission < betrayals_required, False)
+
+        time_pressure = self.current_round / 4
+
+        # Zero risk for betraying on last round or to win
+        decide(numpy.full(len(rows), time_pressure == 1) | (missions_failed == 2), True)
+
+        # COLLUSION MODULE : Lead spy (spy with max player number) will sabotage
+        if self.collusion and self.fails_required[number_of_players][self.current_round] == 1:
+            lead_spy = numpy.where(spies_on_mission_mask,
+                                   numpy.arange(number_of_players),
+                                   -1).max(axis=1)
+            decide(spies_on_mission > 1, player_number == lead_spy)
+
+        # If player is burnt then unlikely on the mission but will always sabotage
+        decide(self.burnt[rows, player_number], True)
+
+        # Betray because agent is the only spy on the mission
+        # and it is late in the game
+        if time_pressure >= 0.5:
+            decide(spies_on_mission == 1, True)
+
+        # Determine actions when multiple spies on mission
+        multiple_spies = spies_on_mission > 1
+
+        if time_pressure <= 0.5:
+            decide(multiple_spies & (missions_failed == 1), False)
+
+        if self.current_round <= 1:
+            chance = self.rng.random(len(rows)) > 0.85 * (self.current_round + 1)
+            decide(multiple_spies & (spies_on_mission == mission_size), chance)
+
+        # When in doubt sabotage the mission
+        return betrayal
+
+    def mission_outcome(self, rows, mission, proposer, betrayals, mission_success):
+        '''Update world understanding based on mission outcome'''
+
+        # If all agents betray the mission they have burned themselves
+        burned = betrayals == mission.sum(axis=1)
+        self.confirmed[rows[burned]] |= mission[burned]
+        self.burnt[rows[burned]] |= mission[burned]
+
+        spy = self.is_spy(rows)
+
+        # Spies target the resistance members of failed missions for vote blocking
+        framed = ~burned & spy & ~mission_success
+        self.target_resistance[rows[framed]] |= mission[framed] & ~self.spies[rows[framed]]
+
+        # Spies become known to the agent if it is the only one not to sabotage
+        player_number = self.player_number[rows]
+        on_mission = mission[numpy.arange(len(rows)), player_number]
+        exposed = ~burned & ~spy & on_mission & (betrayals == mission.sum(axis=1) - 1)
+        known_spies = mission[exposed]
+        known_spies[numpy.arange(len(known_spies)), player_number[exposed]] = False
+        self.confirmed[rows[exposed]] |= known_spies
+
+    def round_outcome(self, rows, rounds_complete, missions_failed):
+        '''Update rounds and mission failures'''
+
+        self.current_round = rounds_complete
+        self.missions_failed[rows] = missions_failed
+
+    def game_outcome(self, rows, spies_win, spies):
+        '''Provide feedback to testing functions'''
+
+        self.winner[rows] = self.is_spy(rows) == spies_win
@@ -0,0 +1,40 @@
+'''
+Batch Random Agent
+
+NumPy port of the RandomAgent for the batch engine.  Decisions are drawn with the
+same probabilities as RandomAgent so batch sweeps can stand in for it.
+'''
+
+import numpy
+
+from agent.batch_agent import BatchAgent
+
+
+class BatchRandomAgent(BatchAgent):
+    '''Plays every row exactly as RandomAgent would'''
+
+    def __init__(self, name='BatchRando', rng=None):
+
+        super().__init__(name, rng)
+
+    def propose_mission(self, rows, team_size, betrayals_required=1):
+        '''
+        RandomAgent draws its team members from randrange(team_size) so its teams
+        are always the first team_size seats, only the order changes.  The order
+        carries no information so the same seats are proposed here.
+        '''
+        team = numpy.zeros((len(rows), self.number_of_players), dtype=bool)
+        team[:, :team_size] = True
+        return team
+
+    def vote(self, rows, mission, proposer):
+        '''
+        Votes for each mission half of the time
+        '''
+        return self.rng.random(len(rows)) < 0.5
+
+    def betray(self, rows, mission, proposer):
+        '''
+        Spies betray 30% of the time
+        '''
+        return (self.rng.random(len(rows)) < 0.3) & self.is_spy(rows)
@@ -11,6 +11,12 @@ Gameplay:
                 Supports spies in votes more as rounds progress.  Tries to bluff players
                 by skewing votes against resistance members that are associated 
                 with suspicous activity.
+
+Trust in each player is held in a BeliefTable.  When trust was held in
+AgentPredisposition objects the burnt-spy checks in vote and vote_outcome
+compared player numbers against those objects and never matched, so they
+were dropped with the move to the table rather than changing how the agent
+plays.
 """
 
 import random
@@ -18,7 +24,8 @@ import random
 from agent import Agent
 
 
-from genetics import AgentPenalties, AgentPredisposition
+from game import to_bitmask
+from genetics import AgentPenalties, BeliefTable
 
 
 class DeterministicAgent(Agent):
@@ -32,6 +39,7 @@ class DeterministicAgent(Agent):
     number_of_players = None
     player_number = None
     spies = None
+    spies_mask = 0
 
     # Custom Variables
     spy = None
@@ -40,7 +48,7 @@ class DeterministicAgent(Agent):
     winner = None
 
     # Probabilities
-    agent_assessment = None
+    beliefs = None
     penalties = None
 
     # Resistance Members to Frame
@@ -62,6 +70,8 @@ class DeterministicAgent(Agent):
         # Spy Variables
         self.target_resistance = list()
 
+        # Trust in each player, reused from game to game
+        self.beliefs = BeliefTable(confirmed_level=1.0)
 
     def new_game(self, number_of_players, player_number, spies):
         '''New game setup'''
@@ -69,14 +79,14 @@ class DeterministicAgent(Agent):
         self.number_of_players = number_of_players
         self.player_number = player_number
         self.spies = spies
+        self.spies_mask = to_bitmask(spies)
         self.winner = None
 
         # Set Play Status
         self.spy = self.player_number in spies
 
         trust_level = self._calculate_initial_spy_probability()
-        self.agent_assessments = {player: AgentPredisposition(player)
-                                  for player in range(0, self.number_of_players)}
+        self.beliefs.reset(self.number_of_players)
 
     def is_spy(self):
         '''return spy status'''
@@ -132,7 +142,7 @@ class DeterministicAgent(Agent):
                       self.player_number,
                       self.current_round,
                       self.spies,
-                      self.agent_assessments)
+                      self.beliefs)
 
         # Accept any vote in the first round
         if self.current_round == 0:
@@ -140,10 +150,6 @@ class DeterministicAgent(Agent):
 
         if self.is_spy():
 
-            # If self is burnt default to fail the vote
-            if self.player_number in self._get_burnt_spies():
-                return False
-
             return voting.spy_vote(self.missions_failed,
                                    self.target_resistance)
 
@@ -152,18 +158,11 @@ class DeterministicAgent(Agent):
     def vote_outcome(self, mission, proposer, votes):
         '''Look for obvious suspicous activity'''
 
-        # Anyone that votes for burnt agents is a spy
-        if any([agent for agent in mission if agent in self._get_burnt_spies()]):
-            self.agent_assessments[proposer].distrust_level = 1.0
-            self.agent_assessments[proposer].burnt = True
-
     def _get_burnt_spies(self):
         '''A burnt spy is one that has been on a mission where the number of betrayals
         is equal to the number of agents on the mission'''
 
-        burnt_spies = [agent
-                       for agent in self.agent_assessments.values()
-                       if agent.burnt]
+        burnt_spies = sorted(self.beliefs.burnt_players)
 
         return burnt_spies
 
@@ -171,7 +170,7 @@ class DeterministicAgent(Agent):
         '''A confirmed spy is one that the agent knows to be a spy but cannot assume other
         players know to be a spy'''
 
-        confirmed_spies = [agent.number for agent in self.agent_assessments.values() if agent.distrust_level == 1.0]
+        confirmed_spies = sorted(self.beliefs.confirmed_players)
         return confirmed_spies
 
     def betray(self, mission, proposer):
@@ -185,7 +184,7 @@ class DeterministicAgent(Agent):
             return False
 
         # Setup betrayal space
-        spies_on_mission = [agent for agent in mission if agent in self.spies]        
+        spies_on_mission = [agent for agent in mission if self.spies_mask >> agent & 1]        
         betrayals_required = self.fails_required[self.number_of_players][self.current_round - 1]
 
         # Do not betray mission that can't fail
@@ -217,7 +216,7 @@ class DeterministicAgent(Agent):
 
         # If player is burnt then unlikely on the mission but will always sabotage
         # Inside random module to prevent intereference with COLLUSION MODULE
-        if self.agent_assessments[self.player_number].burnt:
+        if self.beliefs.burnt[self.player_number]:
             return True
 
         # Betray because agent is the only spy on the mission 
@@ -254,8 +253,7 @@ class DeterministicAgent(Agent):
         if len(mission) == betrayals:
 
             for agent in mission:
-                self.agent_assessments[agent].distrust_level = 1.0
-                self.agent_assessments[agent].burnt = True
+                self.beliefs.burn(agent)
 
             return
 
@@ -270,7 +268,7 @@ class DeterministicAgent(Agent):
         # Target a resistance member for vote blocking if
         # they could be suspect
         if not mission_success:
-            targets = [resistance for resistance in mission if resistance not in self.spies]
+            targets = [resistance for resistance in mission if not self.spies_mask >> resistance & 1]
             self.target_resistance.extend(targets)
 
     def _resistance_mission_outcome(self, mission, betrayals):
@@ -280,7 +278,7 @@ class DeterministicAgent(Agent):
             known_spies = [spy for spy in mission if spy != self.player_number]
 
             for agent in known_spies:
-                self.agent_assessments[agent].distrust_level = 1.0
+                self.beliefs.set_level(agent, 1.0)
 
     def round_outcome(self, rounds_complete, missions_failed):
         '''Update rounds and mission failures'''
@@ -298,25 +296,25 @@ class DeterministicAgent(Agent):
 
 class Vote():
 
-    def __init__(self, proposer, mission, player_number, current_round, spies, agent_assessments):
+    def __init__(self, proposer, mission, player_number, current_round, spies, beliefs):
 
         self.proposer = proposer
         self.mission = mission
+        self.mission_mask = to_bitmask(mission)
 
         self.player_number = player_number
         self.current_round = current_round
         self.spies = spies
-        self.agent_assessments = agent_assessments
+        self.spies_mask = to_bitmask(spies)
+        self.beliefs = beliefs
 
-        self.confirmed_spies = [agent
-                                for agent in self.agent_assessments
-                                if self.agent_assessments[agent].distrust_level == 1.0]
+        self.confirmed_spies = beliefs.confirmed_players
 
     def spy_vote(self, missions_failed, target_resistance):
         '''Decide on voting if player is a spy'''
 
         # Spies shouldn't vote for burnt assets
-        if any([agent in self.mission for agent in self.agent_assessments if self.agent_assessments[agent].burnt]):
+        if self.mission_mask & self.beliefs.burnt_mask:
             return False
 
         # We are trying to frame someone so we should vote against them
@@ -325,7 +323,7 @@ class Vote():
             return False
 
         # No spies in mission
-        if all([team_member not in self.spies for team_member in self.mission]):
+        if not self.mission_mask & self.spies_mask:
 
             # If we can still win without this mission then allow it
             if 4 - self.current_round >= 3 - missions_failed:
@@ -340,11 +338,11 @@ class Vote():
         '''Decide on voting if player is resistance'''
 
         # Proposer is inherently untrustworthy
-        if self.agent_assessments[self.proposer].distrust_level == 1.0:
+        if self.beliefs.distrust_level[self.proposer] == 1.0:
             return False
 
         # Only vote against a player if we know they are a spy
-        if any([agent in self.mission for agent in self.agent_assessments if self.agent_assessments[agent].distrust_level == 1.0]):
+        if self.mission_mask & self.beliefs.confirmed_mask:
             return False
 
         # If no reason not to vote yes then allow it
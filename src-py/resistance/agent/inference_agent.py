@@ -10,12 +10,35 @@ Gameplay:
     Spy:        Increases likeliness of killing mission as rounds progress.
                 Increase negative votes as rounds progress.
                 Supports spies in votes
+
+Trust in each player is held in a BeliefTable.  When trust was held in
+AgentPredisposition objects the burnt-spy checks in vote and vote_outcome
+compared player numbers against those objects and never matched, so they
+were dropped with the move to the table rather than changing how the agent
+plays.
+
+In Bayesian mode the agent also keeps an exact SpyPosterior over every set of
+spies, and as resistance ranks players by their posterior probability of being
+a spy in place of their distrust scores.  The team building and voting rules
+were tuned against the distrust scores, and against DeterministicAgent and
+RandomAgent spies they win fewer games with the posterior ranking, so the mode
+is off by default.
+
+In search mode the agent chooses its proposals and votes with an
+InformationSetSearch over spy sets drawn from the posterior, within a per call
+time budget, and falls back to its usual rules when the search has no time
+to run or the game is already won.
 """
 
 import random
 
-from genetics import AgentPenalties, AgentPredisposition
+import numpy
+
+from genetics import AgentPenalties, BeliefTable
 from agent import Agent
+from agent.search import InformationSetSearch
+from agent.spy_posterior import SpyPosterior
+from game import to_bitmask
 
 
 class InferenceAgent(Agent):
@@ -28,13 +51,16 @@ class InferenceAgent(Agent):
     number_of_players = None
     player_number = None
     spies = None
-    agent_assessments = None
+    spies_mask = 0
+    beliefs = None
 
     # Custom Variables
     spy = None
     voting_round = None
     current_round = None
     collusion = False
+    bayesian = False
+    search = False
 
     # Probabilities    
     penalties = None
@@ -63,6 +89,15 @@ class InferenceAgent(Agent):
         # Spy Variables
         self.target_resistance = list()
 
+        # Trust in each player, reused from game to game
+        self.beliefs = BeliefTable(confirmed_level=2.0)
+
+        # Probability of every set of spies given the public history
+        self.posterior = SpyPosterior()
+
+        # Monte Carlo search over the posterior for search mode
+        self.searcher = InformationSetSearch()
+
     def new_game(self, number_of_players, player_number, spies):
         '''New game setup'''
 
@@ -70,6 +105,7 @@ class InferenceAgent(Agent):
         self.missions_failed = 0
         self.current_round = 0
         self.voting_round = 0
+        self.proposals = 0
         self.winner = None
         self.correctly_identified_spies = 0
 
@@ -77,12 +113,17 @@ class InferenceAgent(Agent):
         self.number_of_players = number_of_players
         self.player_number = player_number
         self.spies = spies
+        self.spies_mask = to_bitmask(spies)
 
         self.spy = self.player_number in spies
 
         # Set initial
-        self.agent_assessments = {player: AgentPredisposition(player)
-                                  for player in range(0, self.number_of_players)}
+        self.beliefs.reset(self.number_of_players)
+
+        # Spies judge players as the resistance see them, so they start from
+        # every spy set rather than the one they know
+        if self.bayesian or self.search:
+            self.posterior.reset(self.number_of_players, [] if self.spy else [self.player_number])
 
 
     def is_spy(self):
@@ -97,6 +138,30 @@ class InferenceAgent(Agent):
         '''Switch for setting collusion mode off'''
         self.collusion = False
 
+    def bayesian_mode_on(self):
+        '''Switch for ranking players by the spy posterior.  Set before a game starts.'''
+        self.bayesian = True
+
+    def bayesian_mode_off(self):
+        '''Switch for ranking players by their distrust scores'''
+        self.bayesian = False
+
+    def search_mode_on(self, per_call=None, max_iterations=None):
+        '''Switch for choosing proposals and votes by searching for up to
+        per_call seconds a decision.  Given max_iterations, each decision runs
+        up to that many iterations, and with no per_call it runs exactly that
+        many so seeded games reproduce.  Set before a game starts.'''
+        self.search = True
+        if max_iterations is not None:
+            self.searcher.max_iterations = max_iterations
+            self.searcher.per_call = per_call
+        elif per_call is not None:
+            self.searcher.per_call = per_call
+
+    def search_mode_off(self):
+        '''Switch for choosing proposals and votes by the agent's rules'''
+        self.search = False
+
     def _calculate_initial_spy_probability(self):
         '''Calculates and initiates trust levels in spies'''
 
@@ -106,19 +171,28 @@ class InferenceAgent(Agent):
         return spy_probability
     
     def _get_agents_sorted_by_trust(self):
-        '''Sorts the agents based on their distrust assessment and returns
-        the most distrusted player'''
+        '''Returns the players ordered from the most to the least trusted.
+        In Bayesian mode the resistance rank players by their probability of
+        being a spy under the posterior.'''
+
+        if self.bayesian and not self.spy:
+            return self.posterior.ranking
 
-        sorted_assessment = dict(sorted(self.agent_assessments.items(), key=lambda item: item[1].distrust_level))
-        return sorted_assessment
+        return self.beliefs.ranking
 
     def propose_mission(self, team_size, betrayals_required=1):
         '''Create a team based on role'''
 
         team = None
+
+        if self.search:
+            team = self.searcher.propose(self, team_size)
+            if team is not None:
+                return team
+
         proposition = TeamBuilder(self,
                                   self.number_of_players,
-                                  self.agent_assessments)
+                                  self.beliefs)
 
         # Resistance team selection
         if not self.is_spy():
@@ -142,6 +216,11 @@ class InferenceAgent(Agent):
 
         self.voting_round += 1
 
+        if self.search:
+            vote = self.searcher.vote(self, to_bitmask(mission), proposer)
+            if vote is not None:
+                return vote
+
         voting = Vote(self,
                       proposer,
                       mission)
@@ -152,10 +231,6 @@ class InferenceAgent(Agent):
 
         if self.is_spy():
 
-            # If self is burnt default to fail the vote
-            if self.player_number in self._get_burnt_spies():
-                return False
-
             return voting.spy_vote(self.missions_failed,
                                    self.target_resistance)
 
@@ -168,38 +243,34 @@ class InferenceAgent(Agent):
 
         mission_go_ahead = len(votes) >= self.number_of_players / 2
 
-        # Anyone that votes for burnt agents is a spy
-        if self.voting_round != 5 and any([agent for agent in mission if agent in self._get_burnt_spies()]):
-
-            self.agent_assessments[proposer].distrust_level = 2.0
-            self.agent_assessments[proposer].burnt = True
+        # The fifth proposal of a round is approved without a vote
+        self.proposals += 1
+        if (self.bayesian or self.search) and self.proposals < 5:
+            self.posterior.vote_outcome(to_bitmask(mission), proposer, to_bitmask(votes))
 
         # Award or penalise based on failing a round with the vote
         if self.voting_round == 5 and not mission_go_ahead:
 
-            for agent in self.agent_assessments:
-                
-                # Trust agents more if they pass the final vote
-                if agent not in votes:
-                    self.agent_assessments[agent].vote_distrust -= self.penalties.vote_fail
-                
-                # Penalise more as the rounds progress for killing vote on final
-                else:
-                    self.agent_assessments[agent].vote_distrust += self.penalties.vote_fail * self.current_round
+            voted_for = numpy.zeros(self.number_of_players, dtype=bool)
+            voted_for[votes] = True
+
+            # Trust agents more if they pass the final vote
+            self.beliefs.vote_distrust[~voted_for] -= self.penalties.vote_fail
+
+            # Penalise more as the rounds progress for killing vote on final
+            self.beliefs.vote_distrust[voted_for] += self.penalties.vote_fail * self.current_round
 
         # If the proposer includes the most suspect agent but isn't them trust them less
-        agent_trust = list(self._get_agents_sorted_by_trust())[-1]
+        agent_trust = self._get_agents_sorted_by_trust()[-1]
         if agent_trust in mission and proposer != agent_trust:
-            self.agent_assessments[proposer].proposal_distrust += self.penalties.propose_suspect
+            self.beliefs.proposal_distrust[proposer] += self.penalties.propose_suspect
 
 
     def _get_burnt_spies(self):
         '''A burnt spy is one that has been on a mission where the number of betrayals
         is equal to the number of agents on the mission'''
 
-        burnt_spies = [agent
-                       for agent in self.agent_assessments.values()
-                       if agent.burnt]
+        burnt_spies = sorted(self.beliefs.burnt_players)
 
         return burnt_spies
 
@@ -215,7 +286,7 @@ class InferenceAgent(Agent):
             return False
 
         # Setup betrayal space
-        spies_on_mission = [agent for agent in mission if agent in self.spies]
+        spies_on_mission = [agent for agent in mission if self.spies_mask >> agent & 1]
         betrayals_required = self.fails_required[self.number_of_players][self.current_round]
 
         # Do not betray mission that can't fail
@@ -245,7 +316,7 @@ class InferenceAgent(Agent):
 
         # If player is burnt then unlikely on the mission but will always sabotage
         # Placed here to prevent intereference with COLLUSION MODULE
-        if self.agent_assessments[self.player_number].burnt:
+        if self.beliefs.burnt[self.player_number]:
             return True
 
         # Always betray the mission in the last two rounds
@@ -276,14 +347,16 @@ class InferenceAgent(Agent):
         '''Update world understanding based on mission outcome'''
         
         # Add minor suspicion to proposer higher weighted in later rounds
-        # self.agent_assessments[proposer].proposal_distrust += self.penalties.p_failed_mission
+        # self.beliefs.proposal_distrust[proposer] += self.penalties.p_failed_mission
+
+        if self.bayesian or self.search:
+            self.posterior.mission_outcome(list(mission), betrayals)
 
         # If all agents betray the mission they have burned themselves
         if len(mission) == betrayals:
 
             for agent in mission:
-                self.agent_assessments[agent].distrust_level = 2.0
-                self.agent_assessments[agent].burnt = True
+                self.beliefs.burn(agent)
 
             return
         
@@ -291,7 +364,7 @@ class InferenceAgent(Agent):
         for agent in mission:
 
             # Never change trust of burnt agents
-            if self.agent_assessments[agent].burnt:
+            if self.beliefs.burnt[agent]:
                 continue
 
             if mission_success:
@@ -311,9 +384,9 @@ class InferenceAgent(Agent):
         # We use the agents existing probability of being 
         # a spy to allow a mission to succeed in conjunction with the 
         # current round.  
-        p_success_spy = 1 - self.agent_assessments[agent].distrust_level
+        p_success_spy = 1 - self.beliefs.distrust_level[agent]
         trust_adjustment = p_success_spy * self.penalties.failed_mission
-        self.agent_assessments[agent].mission_distrust -= trust_adjustment
+        self.beliefs.mission_distrust[agent] -= trust_adjustment
 
     def _failed_mission_trust_adjustment(self, agent, mission, betrayals):
         '''Trus agents less on failure'''
@@ -322,14 +395,14 @@ class InferenceAgent(Agent):
         # If we trust them more the penalty will be less
 
         #Likelihood the agent is a spy as seen by the agent
-        p_spy = self.agent_assessments[agent].distrust_level
+        p_spy = self.beliefs.distrust_level[agent]
 
         # Probability the agent in question betrayed the mission
         p_betrayal = (betrayals / len(mission)) * p_spy
 
         # Trus adjustment calculation
         trust_adjustment = p_betrayal * self.penalties.failed_mission
-        self.agent_assessments[agent].mission_distrust += trust_adjustment
+        self.beliefs.mission_distrust[agent] += trust_adjustment
 
     def _spy_mission_outcome(self, mission, betrayals, mission_success):
         '''Update information for spy player where mision has failed''' 
@@ -337,7 +410,7 @@ class InferenceAgent(Agent):
         # Target a resistance member for vote blocking if
         # they could be suspect
         if not mission_success:
-            targets = [resistance for resistance in mission if resistance not in self.spies]
+            targets = [resistance for resistance in mission if not self.spies_mask >> resistance & 1]
             self.target_resistance.extend(targets)
 
     def _resistance_mission_outcome(self, mission, betrayals):
@@ -348,7 +421,7 @@ class InferenceAgent(Agent):
             known_spies = [spy for spy in mission if spy != self.player_number]
 
             for agent in known_spies:
-                self.agent_assessments[agent].distrust_level = 2.0
+                self.beliefs.set_level(agent, 2.0)
 
     def round_outcome(self, rounds_complete, missions_failed):
         '''Update rounds and mission failures'''
@@ -359,14 +432,10 @@ class InferenceAgent(Agent):
 
         # Reset vote counter
         self.voting_round = 0
+        self.proposals = 0
 
         # Trust levels aggregated at the end of each round
-        for agent in self.agent_assessments:
-
-            if self.agent_assessments[agent].distrust_level != 2.0:
-                self.agent_assessments[agent].distrust_level = sum((self.agent_assessments[agent].mission_distrust,
-                                                                    self.agent_assessments[agent].vote_distrust,
-                                                                    self.agent_assessments[agent].proposal_distrust))
+        self.beliefs.aggregate()
      
     def game_outcome(self, spies_win, spies):
         '''Assign data to variables for post game analysis'''
@@ -383,7 +452,7 @@ class InferenceAgent(Agent):
         incorrectly_identified_spies = 0
         for i in range(1, len(spies)):
             
-            if list(agent_trust.keys())[-i] in spies:
+            if agent_trust[-i] in spies:
                 correctly_identified_spies += 1
             else:
                 incorrectly_identified_spies += 1
@@ -400,18 +469,15 @@ class Vote():
         
         self.proposer = proposer
         self.mission = mission
+        self.mission_mask = to_bitmask(mission)
 
-        self.confirmed_spies = {agent: voter.agent_assessments[agent].distrust_level
-                                for agent in voter.agent_assessments
-                                if voter.agent_assessments[agent].distrust_level == 2.0}
+        self.confirmed_spies = voter.beliefs.confirmed_players
 
     def spy_vote(self, missions_failed, target_resistance):
         '''Decide on voting if player is a spy'''
 
         # Spies shouldn't vote for burnt assets
-        if any([agent in self.mission
-                for agent in self.voter.agent_assessments
-                if self.voter.agent_assessments[agent].burnt]):
+        if self.mission_mask & self.voter.beliefs.burnt_mask:
 
             return False
 
@@ -422,7 +488,7 @@ class Vote():
             return False
 
         # No spies in mission
-        if all([team_member not in self.voter.spies for team_member in self.mission]):
+        if not self.mission_mask & self.voter.spies_mask:
 
             # If we can still win without this mission then allow it
             if 4 - self.voter.current_round >= 3 - missions_failed:
@@ -440,22 +506,20 @@ class Vote():
             return True
 
         # Proposer is known spy so don't trust them
-        if self.voter.agent_assessments[self.proposer].distrust_level == 2.0:
+        if self.voter.beliefs.distrust_level[self.proposer] == 2.0:
             return False
        
         # Only vote against a player if we think are a spy.
         # we assume trust in the first two rounds
-        agent_trust = list(self.voter._get_agents_sorted_by_trust())
-        if any([agent in self.mission
-                for agent in self.voter.agent_assessments
-                if (agent_trust[-1] in self.mission 
-                or agent_trust[-2] in self.mission)
-                and self.voter.current_round != 1]):
+        agent_trust = self.voter._get_agents_sorted_by_trust()
+        if ((self.mission_mask >> agent_trust[-1] & 1
+             or self.mission_mask >> agent_trust[-2] & 1)
+                and self.voter.current_round != 1):
             
             # If we think the mission contains spies then trust
             # the proposer less
             trust_adjustment = self.voter.penalties.propose_suspect
-            self.voter.agent_assessments[self.proposer].proposal_distrust += trust_adjustment
+            self.voter.beliefs.proposal_distrust[self.proposer] += trust_adjustment
 
             return False
 
@@ -467,22 +531,20 @@ class Vote():
 class TeamBuilder():
     '''Proposes teams to undertake missions'''
 
-    def __init__(self, proposer, number_of_players, agent_assessments):
+    def __init__(self, proposer, number_of_players, beliefs):
 
         self.proposer = proposer        
         self.number_of_players = number_of_players
-        self.agent_assessments = agent_assessments
+        self.beliefs = beliefs
 
-        self.confirmed_spies = [agent
-                                for agent in self.agent_assessments
-                                if self.agent_assessments[agent].distrust_level == 2.0]
+        self.confirmed_spies = beliefs.confirmed_players
 
     def resistance_mission_proposal(self, team_size, number_of_spies):
         '''Propose teams as a resistance member.  Tries to minimise risk and maximise information
         found out about other players'''
 
         team = []
-        agent_trust = list(self.proposer._get_agents_sorted_by_trust())
+        agent_trust = self.proposer._get_agents_sorted_by_trust()
 
         # Always include self except choke missions of size 2
         if team_size > 2 and self.proposer.player_number not in team:
@@ -518,7 +580,7 @@ class TeamBuilder():
         team = []
         number_of_spies = len(spies)
 
-        agent_trust = list(self.proposer._get_agents_sorted_by_trust())
+        agent_trust = self.proposer._get_agents_sorted_by_trust()
         
         # Always add self
         team.append(self.proposer.player_number)
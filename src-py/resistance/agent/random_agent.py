@@ -32,7 +32,7 @@ class RandomAgent(Agent):
         self.player_number = player_number
         self.spy_list = spy_list
 
-        logging.debug("{} ({}) IS A SPY {}".format(self.player_number, self.__class__.__name__, self.is_spy()))
+        logging.debug("%s (%s) IS A SPY %s", self.player_number, self.__class__.__name__, self.is_spy())
 
     def is_spy(self):
         '''
@@ -63,7 +63,7 @@ class RandomAgent(Agent):
 
         vote_value = random.random() < 0.5
 
-        logging.debug("RANDOM AGENT {} VOTING {}".format(self.player_number, vote_value))
+        logging.debug("RANDOM AGENT %s VOTING %s", self.player_number, vote_value)
 
         return vote_value
 
@@ -88,7 +88,7 @@ class RandomAgent(Agent):
         '''
 
         betrayal_status = random.random() < 0.3
-        logging.debug("RANDOM AGENT {} BETRAYAL {}".format(self.player_number, betrayal_status))
+        logging.debug("RANDOM AGENT %s BETRAYAL %s", self.player_number, betrayal_status)
 
         if self.is_spy():
             return betrayal_status
@@ -103,7 +103,7 @@ class RandomAgent(Agent):
         It iss not expected or required for this function to return anything.
         '''
         if self.player_number == 0:
-            logging.debug("MISSION SUCCESS: {}".format(mission_success))
+            logging.debug("MISSION SUCCESS: %s", mission_success)
 
     def round_outcome(self, rounds_complete, missions_failed):
         '''
@@ -121,8 +121,7 @@ class RandomAgent(Agent):
         spies, a list of the player indexes for the spies.
         '''
         if self.player_number == 0:
-            logging.debug("SPIES WIN: {}  SPIES WERE: {}\n".format(spies_win,
-                                                                   str(spies)))
+            logging.debug("SPIES WIN: %s  SPIES WERE: %s\n", spies_win, spies)
 
 
 
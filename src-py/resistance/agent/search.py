@@ -0,0 +1,254 @@
+'''
+Search
+
+Information set Monte Carlo tree search for propose_mission and vote.  The
+agent doesn't know who the spies are, so each iteration of the search first
+determinizes the game: a set of spies is drawn from the agent's SpyPosterior,
+or is the agent's own spies if it is a spy.  The candidate action chosen by
+UCB1 is then played in that game and the rest of the game is rolled out with
+a cheap policy:
+
+    proposals   the leader proposes a random team with themselves on it
+    votes       every player votes by the OpponentModel approval
+                probabilities, and the fifth proposal of a round is approved
+    missions    each spy on the team betrays with the model's betrayal
+                probability
+
+The rollout plays a lightweight copy of the game rules on a handful of ints
+and bitmasks, stopping as soon as either side has three missions, so a few
+thousand games can be rolled out in the time of a decision.  The statistics of
+every determinization are pooled in the one root node of the information set,
+and the decisions after the root are left to the rollout policy.
+
+The search is anytime.  It runs until per_call seconds after it was called
+and returns the most visited action, or None if there wasn't time to try
+any or the game is already won, so the agent can fall back to its usual
+rules.
+
+How many iterations fit in the time depends on the machine, so the search
+draws from its own random.Random.  It is seeded with a single draw from the
+global random module at each decision, so the rest of a seeded game draws
+the same numbers however long the search ran.  The decision itself still
+depends on the iterations run, so for games that reproduce on any machine
+give max_iterations and a per_call of None.
+'''
+
+import math
+import random
+from time import perf_counter
+
+import numpy
+
+from agent import Agent
+import combinatorics
+from agent.spy_posterior import OpponentModel
+
+
+DEFAULT_PER_CALL = 0.05
+DEFAULT_EXPLORATION = 0.7
+DEFAULT_MAX_TEAMS = 8
+
+# Spy sets drawn from the posterior at a time
+DETERMINIZATIONS = 64
+
+
+class InformationSetSearch():
+    '''Chooses proposals and votes by Monte Carlo search over determinized games.
+
+    The agent searched for is passed to each decision and read for
+    number_of_players, player_number, spy, spies_mask, posterior,
+    current_round, missions_failed and proposals.
+    '''
+
+    def __init__(self, model=None, per_call=DEFAULT_PER_CALL,
+                 exploration=DEFAULT_EXPLORATION, max_teams=DEFAULT_MAX_TEAMS, max_iterations=None):
+        '''
+        model is the OpponentModel the rollouts play by, which defaults to OpponentModel(),
+        per_call is the number of seconds each decision may search for, or None for no limit,
+        exploration is the UCB1 exploration constant,
+        max_teams is the number of candidate teams a proposal searches over,
+        max_iterations is the number of iterations each decision may run, or None for no limit
+        '''
+        if per_call is None and max_iterations is None:
+            raise ValueError("The search needs a per_call time or max_iterations")
+
+        self.model = model if model is not None else OpponentModel()
+        self.per_call = per_call
+        self.max_iterations = max_iterations
+        self.exploration = exploration
+        self.max_teams = max_teams
+
+        # Teams of each table size and team size that each leader is on
+        self.leader_teams = dict()
+
+        # Iterations run by the last decision
+        self.iterations = 0
+
+        # Reseeded from the global stream at each decision
+        self.random = random.Random()
+
+    def _teams_led_by(self, number_of_players):
+
+        if number_of_players not in self.leader_teams:
+            tables = combinatorics.tables(number_of_players)
+            self.leader_teams[number_of_players] = {
+                team_size: [[int(team) for team in teams if team >> leader & 1]
+                            for leader in range(number_of_players)]
+                for team_size, teams in tables.teams.items()}
+
+        return self.leader_teams[number_of_players]
+
+    def _determinizations(self, agent):
+        '''An endless supply of spy set bitmasks to search over'''
+
+        if agent.spy:
+            while True:
+                yield agent.spies_mask
+
+        spy_sets = agent.posterior.spy_sets.tolist()
+        cumulative = numpy.cumsum(agent.posterior.probabilities).tolist()
+        while True:
+            yield from self.random.choices(spy_sets, cum_weights=cumulative, k=DETERMINIZATIONS)
+
+    def _approved(self, number_of_players, spies, team, voter=-1, vote=True):
+        '''Simulates the vote on team, with voter voting vote'''
+
+        model = self.model
+        spy_approve = model.spy_approve_dirty if team & spies else model.spy_approve_clean
+        resistance_approve = model.resistance_approve
+
+        votes_for = 0
+        for player in range(number_of_players):
+
+            if player == voter:
+                votes_for += vote
+            elif spies >> player & 1:
+                votes_for += self.random.random() < spy_approve
+            else:
+                votes_for += self.random.random() < resistance_approve
+
+        return 2 * votes_for > number_of_players
+
+    def _fails(self, number_of_players, spies, team, rnd):
+        '''Simulates the betrayals of a mission, returning True if it fails'''
+
+        betrayal = self.model.betrayal
+        betrayals = 0
+        for _ in range(bin(team & spies).count('1')):
+            betrayals += self.random.random() < betrayal
+
+        return betrayals >= Agent.fails_required[number_of_players][rnd]
+
+    def _play(self, number_of_players, spies, rnd, failed, proposal, leader, team, voter=-1, vote=True):
+        '''Plays out the game from the proposal of team by leader, returning
+        True if the resistance win'''
+
+        mission_sizes = Agent.mission_sizes[number_of_players]
+        leader_teams = self._teams_led_by(number_of_players)
+
+        while True:
+
+            if proposal == 4 or self._approved(number_of_players, spies, team, voter, vote):
+
+                failed += self._fails(number_of_players, spies, team, rnd)
+                rnd += 1
+                proposal = 0
+
+                if failed >= 3:
+                    return False
+                if rnd - failed >= 3:
+                    return True
+            else:
+                proposal += 1
+
+            # Only the root action is the searcher's own
+            voter = -1
+            leader = (leader + 1) % number_of_players
+            team = self.random.choice(leader_teams[mission_sizes[rnd]][leader])
+
+    def _search(self, agent, actions, play):
+        '''UCB1 over actions, where play(spies, action) rolls out a game and
+        returns True if the searcher's side wins'''
+
+        self.random.seed(random.getrandbits(64))
+
+        # Games play all five rounds, so there is nothing to search for once one is won
+        if agent.missions_failed >= 3 or agent.current_round - agent.missions_failed >= 3:
+            self.iterations = 0
+            return None
+
+        deadline = None if self.per_call is None else perf_counter() + self.per_call
+        max_iterations = math.inf if self.max_iterations is None else self.max_iterations
+        determinizations = self._determinizations(agent)
+
+        visits = [0] * len(actions)
+        wins = [0] * len(actions)
+        total = 0
+
+        while total < max_iterations and (deadline is None or perf_counter() < deadline):
+
+            if total < len(actions):
+                choice = total
+            else:
+                scale = self.exploration * math.sqrt(math.log(total))
+                choice = max(range(len(actions)),
+                             key=lambda a: wins[a] / visits[a] + scale / math.sqrt(visits[a]))
+
+            wins[choice] += play(next(determinizations), actions[choice])
+            visits[choice] += 1
+            total += 1
+
+        self.iterations = total
+        if total == 0:
+            return None
+
+        return actions[max(range(len(actions)), key=lambda a: (visits[a], wins[a]))]
+
+    def _candidate_teams(self, agent, team_size):
+        '''The teams the resistance think most likely to be clean.  A spy
+        keeps to the teams that can fail the mission.'''
+
+        tables = combinatorics.tables(agent.number_of_players)
+        teams = tables.teams[team_size]
+        clean = agent.posterior.probabilities @ (tables.overlaps[team_size] == 0)
+
+        if agent.spy:
+            betrayals_required = Agent.fails_required[agent.number_of_players][agent.current_round]
+            dirty = combinatorics.POPCOUNT[teams & agent.spies_mask] >= betrayals_required
+            if dirty.any():
+                clean = numpy.where(dirty, clean, -1.0)
+
+        order = (-clean).argsort(kind='stable')[:self.max_teams]
+        return [int(team) for team in teams[order]]
+
+    def propose(self, agent, team_size):
+        '''The team to propose as a list of players, or None if there wasn't time to search'''
+
+        number_of_players = agent.number_of_players
+        resistance = not agent.spy
+
+        def play(spies, team):
+            resistance_win = self._play(number_of_players, spies,
+                                        agent.current_round, agent.missions_failed, agent.proposals,
+                                        agent.player_number, team, agent.player_number, True)
+            return resistance_win == resistance
+
+        team = self._search(agent, self._candidate_teams(agent, team_size), play)
+        if team is None:
+            return None
+
+        return [player for player in range(number_of_players) if team >> player & 1]
+
+    def vote(self, agent, team_mask, proposer):
+        '''Whether to vote for team team_mask, or None if there wasn't time to search'''
+
+        number_of_players = agent.number_of_players
+        resistance = not agent.spy
+
+        def play(spies, vote):
+            resistance_win = self._play(number_of_players, spies,
+                                        agent.current_round, agent.missions_failed, agent.proposals,
+                                        proposer, team_mask, agent.player_number, vote)
+            return resistance_win == resistance
+
+        return self._search(agent, [True, False], play)
@@ -0,0 +1,182 @@
+'''
+Spy Posterior
+
+An exact posterior over who the spies are.  Every way of choosing the spies
+of a game is a hypothesis, at most C(10, 4) = 210 of them, and the posterior
+is a NumPy probability vector over the hypotheses.  Each public event is one
+vectorised multiply by the likelihood of the event under every hypothesis:
+
+    mission_outcome     the spies on the team each betray with probability
+                        betrayal, so the number of betrayals is binomial in
+                        the number of spies on the team
+    vote_outcome        spies approve teams with a spy on them more readily
+                        than clean teams, resistance approve at a flat rate
+                        whoever the spies are, and spy leaders tend to
+                        propose teams with a spy on them
+
+A vote's likelihood only depends on whether the team has a spy on it, whether
+the leader is a spy and how many spies voted for it, so it is looked up in a
+small table by popcounts of the spy set bitmasks.  The marginal probability
+that each player is a spy is read off the posterior with one matrix product,
+only when it is asked for.  The spy sets and the number of spies on each team
+under them come from the shared combinatorics tables.
+'''
+
+from math import comb
+
+import numpy
+
+from agent import Agent
+import combinatorics
+from game import to_bitmask
+
+
+
+
+class OpponentModel():
+    '''The likelihoods of public events used by the posterior.  Kept soft so
+    that opponents that play differently slow the posterior down rather than
+    ruling out the truth.'''
+
+    def __init__(self, betrayal=0.8, spy_approve_dirty=0.9, spy_approve_clean=0.4,
+                 resistance_approve=0.7, spy_leader_dirty=0.8, leader_dirty=0.5):
+        '''
+        betrayal is the probability a spy betrays a mission they are on,
+        spy_approve_dirty and spy_approve_clean are the probabilities a spy votes
+        for a team with and without a spy on it,
+        resistance_approve is the probability a resistance member votes for a team,
+        spy_leader_dirty is the probability a spy leader proposes a team with a spy
+        on it, against leader_dirty for a resistance leader
+        '''
+        self.betrayal = betrayal
+        self.spy_approve_dirty = spy_approve_dirty
+        self.spy_approve_clean = spy_approve_clean
+        self.resistance_approve = resistance_approve
+        self.spy_leader_dirty = spy_leader_dirty
+        self.leader_dirty = leader_dirty
+
+    def betrayal_likelihoods(self, max_team_size=5):
+        '''Table of the probability of b betrayals from s spies on a team, indexed [s, b]'''
+
+        table = numpy.zeros((max_team_size + 1, max_team_size + 1))
+        for spies in range(max_team_size + 1):
+            for betrayals in range(spies + 1):
+                table[spies, betrayals] = (comb(spies, betrayals)
+                                           * self.betrayal ** betrayals
+                                           * (1 - self.betrayal) ** (spies - betrayals))
+        return table
+
+    def vote_likelihoods(self, spy_count):
+        '''Table of the ratio of the probability of a vote if the spies are a
+        given spy set to the probability if they are all resistance, indexed
+        [team has a spy on it, leader is a spy, spies voting for the team]'''
+
+        table = numpy.zeros((2, 2, spy_count + 1))
+        for dirty in (0, 1):
+
+            spy_approve = self.spy_approve_dirty if dirty else self.spy_approve_clean
+            approve = spy_approve / self.resistance_approve
+            reject = (1 - spy_approve) / (1 - self.resistance_approve)
+
+            if dirty:
+                leader = self.spy_leader_dirty / self.leader_dirty
+            else:
+                leader = (1 - self.spy_leader_dirty) / (1 - self.leader_dirty)
+
+            for voted_for in range(spy_count + 1):
+                ratio = approve ** voted_for * reject ** (spy_count - voted_for)
+                table[dirty, 0, voted_for] = ratio
+                table[dirty, 1, voted_for] = ratio * leader
+
+        return table
+
+
+class SpyPosterior():
+    '''Probability of every possible set of spies given the public history of a game.
+
+    The spy sets of a game are held as bitmasks in spy_sets and as rows of the
+    0/1 matrix members, shape (hypotheses, number_of_players).  Hypotheses ruled
+    out by what the owner knows privately start with zero probability.
+    '''
+
+    def __init__(self, model=None):
+        '''
+        model is the OpponentModel of the likelihoods, which defaults to OpponentModel()
+        '''
+        self.model = model if model is not None else OpponentModel()
+        self.betrayals = self.model.betrayal_likelihoods(max(max(sizes) for sizes in Agent.mission_sizes.values()))
+        self.tables = None
+        self.number_of_players = 0
+
+    def reset(self, number_of_players, excluded=()):
+        '''
+        Start a new game with a uniform prior over the spy sets that include
+        none of the excluded players, such as the owner if they are resistance
+        '''
+        self.number_of_players = number_of_players
+        self.tables = combinatorics.tables(number_of_players)
+        self.spy_sets = self.tables.spy_sets
+        self.members = self.tables.members
+        self.votes = self.model.vote_likelihoods(Agent.spy_count[number_of_players])
+
+        self.probabilities = numpy.ones(len(self.spy_sets))
+        for player in excluded:
+            self.probabilities[self.members[:, player] == 1.0] = 0.0
+
+        self._normalise(self.probabilities)
+
+    def _normalise(self, probabilities):
+        '''Adopt probabilities as the posterior unless they rule out everything'''
+
+        total = probabilities.sum()
+        if total > 0:
+            self.probabilities = probabilities / total
+            self._marginals = None
+            self._ranking = None
+
+    @property
+    def marginals(self):
+        '''The probability that each player is a spy'''
+
+        if self._marginals is None:
+            self._marginals = self.probabilities @ self.members
+
+        return self._marginals
+
+    @property
+    def ranking(self):
+        '''The players from the least to the most likely to be a spy'''
+
+        if self._ranking is None:
+            self._ranking = self.marginals.argsort(kind='stable').tolist()
+
+        return self._ranking
+
+    def mission_outcome(self, team, betrayals):
+        '''Update on betrayals of the mission with team team.  The spies on the
+        team are counted from the list, as a player listed twice betrays twice.'''
+
+        if betrayals >= self.betrayals.shape[1] or len(team) >= self.betrayals.shape[0]:
+            return
+
+        team_mask = to_bitmask(team)
+        if len(team) == bin(team_mask).count('1'):
+            spies_on_team = self.tables.spies_on_team(team_mask)
+        else:
+            spies_on_team = self.members[:, team].sum(axis=1).astype(int)
+
+        self._normalise(self.probabilities * self.betrayals[spies_on_team, betrayals])
+
+    def vote_outcome(self, team_mask, leader, votes_mask):
+        '''Update on the votes for the team team_mask proposed by leader'''
+
+        dirty = self.tables.spies_on_team(team_mask) > 0
+        spy_leader = self.spy_sets >> leader & 1
+        voted_for = combinatorics.POPCOUNT[self.spy_sets & votes_mask]
+
+        self._normalise(self.probabilities * self.votes[dirty.view(numpy.int8), spy_leader, voted_for])
+
+    def most_likely(self):
+        '''The bitmask of the most probable spy set'''
+
+        return int(self.spy_sets[self.probabilities.argmax()])
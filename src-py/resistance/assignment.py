@@ -6,13 +6,19 @@ playing against each other.  This involves
 '''
 
 # Standard Modules
-import csv
+import hashlib
 import logging
+import math
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 
 # Custom Game Modules
 from game import Game
-from custom_games import AllocatedAgentsGame
+from checkpoint import SweepCheckpoint, write_summary_csv
+from custom_games import AllocatedAgentsGame, role_assignments
+from result_cache import ResultCache, result_key, source_hashes
+from timing import DecisionBudget
 
 # Custom Agents
 from agent import Agent
@@ -45,39 +51,316 @@ FAILS_REQUIRED = {
 
 class AgentTester():
     '''Tests Agents by running games of various sizes against with preconfigured setups
-    to determine the how well agents work in different scenarios.'''
+    to determine the how well agents work in different scenarios.
+
+    Games can be spread across a process pool by setting workers.  When a seed
+    is provided every game is seeded from (seed, matchup, table size, game index)
+    so the win counts are identical whether the games are played serially or
+    split across any number of workers.
+
+    If a DecisionBudget is given every game is played with it, and the latency
+    telemetry of all the games is collected in budget.telemetry.
+
+    When stratified is set the games walk through every set of spy seats in
+    turn, and every first leader too if leader_offsets is set, instead of
+    sampling them.  The agents keep the roles their test gives them and are
+    reseated to fit.  Each role assignment is weighted exactly, so the win
+    counts returned are the stratified estimate scaled to number_of_games.
+
+    A stopping rule from the stopping module ends each matchup early once it
+    is met.  The games actually played are kept in games_played and the win
+    counts returned are scaled to number_of_games.
+
+    With a ResultCache, seeded matchup results are loaded from the cache when
+    nothing they depend on has changed, and stored after being played.  Timed
+    runs are never cached as their results depend on the machine.
+
+    The test_duplicate_* methods compare several agent configurations on the
+    same deals, like duplicate bridge.  Game i is played once per configuration
+    from the same seed, and the paired differences in win rate are reported.'''
 
     number_of_games = None
     squad_creator = None
-
-    def __init__(self, number_of_games=1000):
+    workers = None
+    seed = None
+    budget = None
+    stratified = False
+    leader_offsets = False
+    stopping = None
+    games_played = None
+    cache = None
+
+    def __init__(self, number_of_games=1000, workers=None, seed=None, budget=None,
+                 stratified=False, leader_offsets=False, stopping=None, cache=None):
 
         self.number_of_games = number_of_games
         self.squad_creator = SquadCreator()
+        self.workers = workers
+        self.seed = seed
+        self.budget = budget
+        self.stratified = stratified
+        self.leader_offsets = leader_offsets
+        self.stopping = stopping
+        self.games_played = None
+        self.cache = cache
+        self._executor = None
 
-    def _play_game(self, game, agents):
-        '''Play a game with a preconfigured agent'''
+        # Parallel games must be seeded or the merged results can't be reproduced
+        if self.seed is None and self._is_parallel():
+            self.seed = random.randrange(2 ** 63)
 
-        game.play()
-        success = game.missions_lost < 3
+    def __getstate__(self):
 
-        if success:
-            return 1
+        # The pool stays with the parent process, and workers are sent their own budget
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['budget'] = None
+        state['cache'] = None
+        return state
 
-        return 0
+    def close(self):
+        '''Shut down the worker pool if one has been started'''
 
-    def test_single_class(self, agent_class):
-        '''Play a game using a single agent type as both spies and resistance'''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _is_parallel(self):
+
+        return self.workers is not None and self.workers > 1
+
+    def _get_executor(self):
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        return self._executor
+
+    def _run_games(self, matchup, game_setup, *args):
+        '''Play number_of_games games created by game_setup and return the
+        number of resistance wins, or load them from the cache.'''
+
+        if self.cache is None or self.seed is None or self.budget is not None:
+            return self._play_matchup(matchup, game_setup, args)
+
+        agent_classes = [arg for arg in args if isinstance(arg, type)]
+        key = result_key(agent_classes, agent_count, matchup, self.seed, self.number_of_games, self._options())
+
+        result = self.cache.get(key)
+        if result is not None:
+            self.games_played = result['games_played']
+            return result['wins']
+
+        wins = self._play_matchup(matchup, game_setup, args)
+        self.cache.put(key, {'wins': wins, 'games_played': self.games_played})
+
+        return wins
+
+    def _options(self):
+        '''The settings other than the seed and number of games that change results'''
+
+        stopping = None
+        if self.stopping is not None:
+            stopping = [type(self.stopping).__name__, vars(self.stopping)]
+
+        return {'stratified': self.stratified,
+                'leader_offsets': self.leader_offsets,
+                'stopping': stopping}
+
+    def _play_matchup(self, matchup, game_setup, args):
+        '''Play number_of_games games created by game_setup and return the
+        number of resistance wins.  With a stopping rule the games are played
+        in chunks until the rule is met, and the wins are scaled up to
+        number_of_games.'''
+
+        deals = None
+        if self.stratified:
+            deals = role_assignments(agent_count, self.leader_offsets)
+
+        if self.stopping is None:
+            wins = self._play_range(matchup, game_setup, args, 0, self.number_of_games, deals)
+            self.games_played = self.number_of_games
+            return self._estimate(wins, deals, self.number_of_games)
+
+        # Stratified chunks cover every role assignment equally
+        chunk_size = self.stopping.chunk_size
+        if deals is not None:
+            chunk_size = -(-chunk_size // len(deals)) * len(deals)
+
+        wins = [0] * (len(deals) if deals is not None else 1)
+        played = 0
+        while played < self.number_of_games:
+
+            stop = min(played + chunk_size, self.number_of_games)
+            chunk_wins = self._play_range(matchup, game_setup, args, played, stop, deals)
+            wins = [total + stratum_wins for total, stratum_wins in zip(wins, chunk_wins)]
+            played = stop
+
+            if self.stopping.done(sum(wins), played):
+                break
+
+        self.games_played = played
+
+        print("GAMES PLAYED: ", played)
+        print(self.stopping.describe(sum(wins), played))
+
+        return self._estimate(wins, deals, played)
+
+    def _play_range(self, matchup, game_setup, args, start, stop, deals):
+        '''Play games start to stop (exclusive) and return the wins of each
+        role assignment.  The range is split across the process pool when
+        running in parallel.'''
+
+        if not self._is_parallel():
+            return play_game_range(game_setup, args, agent_count, self.seed,
+                                   matchup, start, stop, self.budget, deals)
+
+        chunk_count = self.workers * 4
+        chunk_size = max(1, -(-(stop - start) // chunk_count))
+        ranges = [(chunk_start, min(chunk_start + chunk_size, stop))
+                  for chunk_start in range(start, stop, chunk_size)]
+
+        if self.budget is not None:
+            return self._play_timed_range(matchup, game_setup, args, ranges, deals)
+
+        futures = [self._get_executor().submit(play_game_range,
+                                               game_setup,
+                                               args,
+                                               agent_count,
+                                               self.seed,
+                                               matchup,
+                                               chunk_start,
+                                               chunk_stop,
+                                               None,
+                                               deals)
+                   for chunk_start, chunk_stop in ranges]
+
+        return [sum(stratum_wins) for stratum_wins in zip(*(future.result() for future in futures))]
+
+    def _estimate(self, wins, deals, games_played):
+        '''Turn the wins of each role assignment in games_played games into
+        the number of resistance wins out of number_of_games.  Stratified wins
+        are weighted so every role assignment counts equally however many
+        games it was played in.'''
+
+        if deals is None:
+
+            if games_played == self.number_of_games:
+                return wins[0]
+
+            return wins[0] / games_played * self.number_of_games
+
+        games = [len(range(stratum, games_played, len(deals))) for stratum in range(len(deals))]
+        rates = [stratum_wins / stratum_games for stratum_wins, stratum_games in zip(wins, games) if stratum_games > 0]
+
+        return sum(rates) / len(rates) * self.number_of_games
+
+    def _play_timed_range(self, matchup, game_setup, args, ranges, deals):
+        '''Play the game ranges across the process pool with the budget,
+        merging each worker's telemetry into the budget's'''
+
+        # Each chunk starts with empty telemetry so nothing is counted twice
+        budget = DecisionBudget(self.budget.per_call, self.budget.per_game)
+
+        futures = [self._get_executor().submit(play_timed_game_range,
+                                               game_setup,
+                                               args,
+                                               agent_count,
+                                               self.seed,
+                                               matchup,
+                                               chunk_start,
+                                               chunk_stop,
+                                               budget,
+                                               deals)
+                   for chunk_start, chunk_stop in ranges]
+
+        wins = [0] * (len(deals) if deals is not None else 1)
+        for future in futures:
+            chunk_wins, telemetry = future.result()
+            self.budget.telemetry.merge(telemetry)
+            wins = [total + stratum_wins for total, stratum_wins in zip(wins, chunk_wins)]
+
+        return wins
+
+    def _setup_single_class(self, agent_count, agent_class):
+
+        agents = self.squad_creator.create_with_agent_defined_roles(agent_count, agent_class, agent_class)
+
+        game = AllocatedAgentsGame(agents)
+        game.allocate_spies_randomly()
+
+        return game
+
+    def _setup_colluding_single_class(self, agent_count, agent_class):
+
+        agents = self.squad_creator.create_collusive_single_agent_squad(agent_count, agent_class)
+
+        game = AllocatedAgentsGame(agents)
+        game.allocate_spies_randomly()
+
+        return game
+
+    def _setup_randomly_colluding_single_class(self, agent_count, collusion_probability, agent_class):
+
+        agents = self.squad_creator.create_random_collusion_with_agent_defined_roles(agent_count, collusion_probability, agent_class, agent_class)
+
+        game = AllocatedAgentsGame(agents)
+        game.allocate_spies_randomly()
 
-        wins = 0
-        squad_creator = SquadCreator()
-        for i in range(0, self.number_of_games):
-            agents = self.squad_creator.create_with_agent_defined_roles(agent_count, agent_class, agent_class)
+        return game
 
-            game = AllocatedAgentsGame(agents)
-            game.allocate_spies_randomly()
+    def _setup_colluding_classes_by_type(self, agent_count, resistance_class, spy_class):
 
-            wins += self._play_game(game, agents)
+        agents = self.squad_creator.create_collusion_with_agent_defined_roles(agent_count, resistance_class, spy_class)
+
+        game = AllocatedAgentsGame(agents)
+        game.allocate_spies_by_type(spy_class)
+
+        return game
+
+    def _setup_randomly_colluding_classes_by_type(self, agent_count, collusion_probability, resistance_class, spy_class):
+
+        agents = self.squad_creator.create_random_collusion_with_agent_defined_roles(agent_count, collusion_probability, resistance_class, spy_class)
+
+        game = AllocatedAgentsGame(agents)
+        game.allocate_spies_by_type(spy_class)
+
+        return game
+
+    def _setup_classes_by_type(self, agent_count, resistance_class, spy_class):
+
+        agents = self.squad_creator.create_with_agent_defined_roles(agent_count, resistance_class, spy_class)
+
+        game = AllocatedAgentsGame(agents)
+        game.allocate_spies_by_type(spy_class)
+
+        return game
+
+    def _setup_classes_by_selected_spy(self, agent_count, custom_class, is_spy, resistance_class, spy_class):
+
+        player_type = "RES"
+        if is_spy:
+            player_type = "SPY"
+
+        custom_agent = custom_class(name="{}_PLANTED_IN_RANDOM_POOL".format(player_type))
+        agents = self.squad_creator.replace_single_agent_in_squad(custom_agent, agent_count, is_spy, resistance_class, spy_class)
+
+        logging.debug("\n\nNEW GAME ({})".format(AllocatedAgentsGame.__name__))
+
+        game = AllocatedAgentsGame(agents)
+
+        if is_spy:
+            game.allocate_single_spy(custom_agent.name)
+        else:
+            game.allocate_single_resistance(custom_agent.name)
+
+        return game
+
+    def test_single_class(self, agent_class):
+        '''Play a game using a single agent type as both spies and resistance'''
+
+        matchup = "single_class:{}".format(agent_class.__name__)
+        wins = self._run_games(matchup, self._setup_single_class, agent_class)
 
         print("RESISTANCE SUCCESS RATE: ", round((wins/self.number_of_games) * 100, 3), "%")
 
@@ -87,15 +370,8 @@ class AgentTester():
     def test_colluding_single_class(self, agent_class):
         '''Play a game with a single agent type in which the spies have implemented collusion'''
 
-        wins = 0
-        squad_creator = SquadCreator()
-        for i in range(0, self.number_of_games):
-            agents = self.squad_creator.create_collusive_single_agent_squad(agent_count, agent_class)
-
-            game = AllocatedAgentsGame(agents)
-            game.allocate_spies_randomly()
-
-            wins += self._play_game(game, agents)
+        matchup = "colluding_single_class:{}".format(agent_class.__name__)
+        wins = self._run_games(matchup, self._setup_colluding_single_class, agent_class)
 
         print("RESISTANCE SUCCESS RATE: ", round((wins/self.number_of_games) * 100, 3), "%")
 
@@ -105,15 +381,8 @@ class AgentTester():
         '''Play a game where collusion is on only for some of the agents depending on the provided probability that they
         will collude'''
 
-        wins = 0
-        squad_creator = SquadCreator()
-        for i in range(0, self.number_of_games):
-            agents = self.squad_creator.create_random_collusion_with_agent_defined_roles(agent_count, collusion_probability, agent_class, agent_class)
-
-            game = AllocatedAgentsGame(agents)
-            game.allocate_spies_randomly()
-
-            wins += self._play_game(game, agents)
+        matchup = "randomly_colluding_single_class:{}:{}".format(collusion_probability, agent_class.__name__)
+        wins = self._run_games(matchup, self._setup_randomly_colluding_single_class, collusion_probability, agent_class)
 
         print("RESISTANCE SUCCESS RATE: ", round((wins/self.number_of_games) * 100, 3), "%")
 
@@ -122,14 +391,8 @@ class AgentTester():
 
     def test_colluding_classes_by_type(self, resistance_class, spy_class):
 
-        wins = 0
-        for i in range(0, self.number_of_games):
-            agents = self.squad_creator.create_collusion_with_agent_defined_roles(agent_count, resistance_class, spy_class)
-
-            game = AllocatedAgentsGame(agents)
-            game.allocate_spies_by_type(spy_class)
-
-            wins += self._play_game(game, agents)
+        matchup = "colluding_classes_by_type:{}:{}".format(resistance_class.__name__, spy_class.__name__)
+        wins = self._run_games(matchup, self._setup_colluding_classes_by_type, resistance_class, spy_class)
 
         print("RESISTANCE SUCCESS RATE: ", round((wins/self.number_of_games) * 100, 3), "%")
 
@@ -137,15 +400,10 @@ class AgentTester():
     
     def test_randomly_colluding_classes_by_type(self, collusion_probability, resistance_class, spy_class):
 
-        wins = 0
-        
-        for i in range(0, self.number_of_games):
-            agents = self.squad_creator.create_random_collusion_with_agent_defined_roles(agent_count, collusion_probability, resistance_class, spy_class)
-
-            game = AllocatedAgentsGame(agents)
-            game.allocate_spies_by_type(spy_class)
-
-            wins += self._play_game(game, agents)
+        matchup = "randomly_colluding_classes_by_type:{}:{}:{}".format(collusion_probability,
+                                                                       resistance_class.__name__,
+                                                                       spy_class.__name__)
+        wins = self._run_games(matchup, self._setup_randomly_colluding_classes_by_type, collusion_probability, resistance_class, spy_class)
 
         print("RESISTANCE SUCCESS RATE: ", round((wins/self.number_of_games) * 100, 3), "%")
 
@@ -154,47 +412,201 @@ class AgentTester():
 
     def test_classes_by_type(self, resistance_class, spy_class):
 
-        wins = 0
-        for i in range(0, self.number_of_games):
-            agents = self.squad_creator.create_with_agent_defined_roles(agent_count, resistance_class, spy_class)
+        matchup = "classes_by_type:{}:{}".format(resistance_class.__name__, spy_class.__name__)
+        wins = self._run_games(matchup, self._setup_classes_by_type, resistance_class, spy_class)
+
+        print("RESISTANCE SUCCESS RATE: ", round((wins/self.number_of_games) * 100, 3), "%")
+
+        return wins
+
 
-            game = AllocatedAgentsGame(agents)
-            game.allocate_spies_by_type(spy_class)
+    def test_classes_by_selected_spy(self, custom_class, is_spy, resistance_class, spy_class):
 
-            wins += self._play_game(game, agents)
+        matchup = "classes_by_selected_spy:{}:{}:{}:{}".format(custom_class.__name__,
+                                                               is_spy,
+                                                               resistance_class.__name__,
+                                                               spy_class.__name__)
+        wins = self._run_games(matchup, self._setup_classes_by_selected_spy, custom_class, is_spy, resistance_class, spy_class)
 
+        logging.info("RESISTANCE SUCCESS RATE: " + str(round((wins/self.number_of_games) * 100, 3)) + "%")
         print("RESISTANCE SUCCESS RATE: ", round((wins/self.number_of_games) * 100, 3), "%")
 
         return wins
 
+    def _run_duplicate(self, matchup, configurations):
+        '''Play every game once for each configuration, a (game_setup, args)
+        pair, with the same seed so each configuration is dealt the same
+        seating, spies and random stream.  Returns, for each configuration,
+        the counts of games in which [neither, only it, only the first
+        configuration, both] had a resistance win.'''
 
-    def test_classes_by_selected_spy(self, custom_class, is_spy, resistance_class, spy_class):
+        seed = self.seed if self.seed is not None else random.randrange(2 ** 63)
 
-        wins = 0
+        deals = None
+        if self.stratified:
+            deals = role_assignments(agent_count, self.leader_offsets)
 
-        player_type = "RES"
-        if is_spy:
-            player_type = "SPY"
+        if not self._is_parallel():
+            return play_duplicate_range(configurations, agent_count, seed, matchup, 0, self.number_of_games, deals)
 
-        for i in range(0, self.number_of_games):
-            custom_agent = custom_class(name="{}_PLANTED_IN_RANDOM_POOL".format(player_type))
-            agents = self.squad_creator.replace_single_agent_in_squad(custom_agent, agent_count, is_spy, resistance_class, spy_class)
+        chunk_count = self.workers * 4
+        chunk_size = max(1, -(-self.number_of_games // chunk_count))
 
-            logging.debug("\n\nNEW GAME ({}) {}".format(AllocatedAgentsGame.__name__, i))
+        futures = [self._get_executor().submit(play_duplicate_range,
+                                               configurations,
+                                               agent_count,
+                                               seed,
+                                               matchup,
+                                               start,
+                                               min(start + chunk_size, self.number_of_games),
+                                               deals)
+                   for start in range(0, self.number_of_games, chunk_size)]
 
-            game = AllocatedAgentsGame(agents)
+        tables = [[0, 0, 0, 0] for _ in configurations]
+        for future in futures:
+            for table, chunk_table in zip(tables, future.result()):
+                for outcome in range(4):
+                    table[outcome] += chunk_table[outcome]
 
-            if is_spy:
-                game.allocate_single_spy(custom_agent.name)
-            else:
-                game.allocate_single_resistance(custom_agent.name)
+        return tables
 
-            wins += self._play_game(game, agents)
+    def _report_duplicate(self, labels, tables):
+        '''Print the win rate of each configuration and its paired difference
+        from the first, and return them as a list of dicts'''
 
-        logging.info("RESISTANCE SUCCESS RATE: " + str(round((wins/self.number_of_games) * 100, 3)) + "%")
-        print("RESISTANCE SUCCESS RATE: ", round((wins/self.number_of_games) * 100, 3), "%")
+        report = list()
+        for label, (neither, only_this, only_first, both) in zip(labels, tables):
+
+            games = neither + only_this + only_first + both
+            difference = (only_this - only_first) / games
+            variance = (only_this + only_first) / games - difference ** 2
+            standard_error = math.sqrt(variance / games)
+
+            report.append({'label': label,
+                           'games': games,
+                           'wins': only_this + both,
+                           'difference': difference,
+                           'standard_error': standard_error})
+
+            print("\n{}".format(label))
+            print("RESISTANCE SUCCESS RATE: ", round((only_this + both) / games * 100, 3), "%")
+
+            if label != labels[0]:
+                print("PAIRED DIFFERENCE FROM {}: ".format(labels[0]),
+                      round(difference * 100, 3), "% +/-", round(1.96 * standard_error * 100, 3), "%")
+
+        return report
+
+    def test_duplicate_classes_by_type(self, resistance_classes, spy_class):
+        '''Play the same deals with each resistance class against spy_class and
+        report the paired differences from the first resistance class'''
+
+        matchup = "duplicate_classes_by_type:{}".format(spy_class.__name__)
+        configurations = [(self._setup_classes_by_type, (resistance_class, spy_class))
+                          for resistance_class in resistance_classes]
+
+        tables = self._run_duplicate(matchup, configurations)
+
+        return self._report_duplicate(["{} RESISTANCE VS {} SPIES".format(resistance_class.__name__,
+                                                                          spy_class.__name__)
+                                       for resistance_class in resistance_classes], tables)
+
+    def test_duplicate_classes_by_selected_spy(self, custom_classes, is_spy, resistance_class, spy_class):
+        '''Play the same deals with each custom class planted in the squad and
+        report the paired differences from the first custom class'''
+
+        matchup = "duplicate_classes_by_selected_spy:{}:{}:{}".format(is_spy,
+                                                                      resistance_class.__name__,
+                                                                      spy_class.__name__)
+        configurations = [(self._setup_classes_by_selected_spy, (custom_class, is_spy, resistance_class, spy_class))
+                          for custom_class in custom_classes]
+
+        tables = self._run_duplicate(matchup, configurations)
+
+        return self._report_duplicate(["SINGLE {} {} AMONGST {} AGENTS".format(custom_class.__name__,
+                                                                               "SPY" if is_spy else "RESISTANCE",
+                                                                               resistance_class.__name__)
+                                       for custom_class in custom_classes], tables)
+
+
+def game_seed(seed, matchup, agent_count, game_index):
+    '''Derive the seed for a single game from the master seed, the matchup,
+    the table size and the index of the game.  hashlib is used rather than
+    hash() so the value is the same in every worker process.'''
+
+    key = "{}|{}|{}|{}".format(seed, matchup, agent_count, game_index)
+    digest = hashlib.sha256(key.encode()).digest()
+
+    return int.from_bytes(digest[:8], 'big')
+
+
+def play_game_range(game_setup, args, agent_count, seed, matchup, start, stop, budget=None, deals=None):
+    '''Play games start to stop (exclusive) of a matchup and return the number
+    of resistance wins.  Runs in the parent process for serial play and in a
+    pool worker for parallel play.
+
+    If deals is a list of role assignments, game i is reseated to deal
+    i % len(deals) and the wins are returned as a list with the wins of each
+    deal.  Otherwise the list holds the single total.'''
+
+    wins = [0] * (len(deals) if deals is not None else 1)
+    for i in range(start, stop):
+
+        if seed is not None:
+            random.seed(game_seed(seed, matchup, agent_count, i))
+
+        game = game_setup(agent_count, *args)
+        game.budget = budget
+
+        stratum = 0
+        if deals is not None:
+            stratum = i % len(deals)
+            game.deal(*deals[stratum])
+
+        game.play()
+
+        if game.missions_lost < 3:
+            wins[stratum] += 1
+
+    return wins
 
-        return wins
+
+def play_timed_game_range(game_setup, args, agent_count, seed, matchup, start, stop, budget, deals=None):
+    '''Play a range of games in a pool worker with a budget and return the
+    resistance wins with the worker's latency telemetry'''
+
+    wins = play_game_range(game_setup, args, agent_count, seed, matchup, start, stop, budget, deals)
+
+    return wins, budget.telemetry
+
+
+def play_duplicate_range(configurations, agent_count, seed, matchup, start, stop, deals=None):
+    '''Play games start to stop (exclusive) once for each configuration with
+    the same seed, and tally the resistance wins of each configuration against
+    those of the first as [neither, only it, only the first, both].'''
+
+    tables = [[0, 0, 0, 0] for _ in configurations]
+    for i in range(start, stop):
+
+        first_won = None
+        for table, (game_setup, args) in zip(tables, configurations):
+
+            random.seed(game_seed(seed, matchup, agent_count, i))
+
+            game = game_setup(agent_count, *args)
+
+            if deals is not None:
+                game.deal(*deals[i % len(deals)])
+
+            game.play()
+            won = game.missions_lost < 3
+
+            if first_won is None:
+                first_won = won
+
+            table[2 * first_won + won] += 1
+
+    return tables
 
 
 class SquadCreator():
@@ -299,7 +711,25 @@ class InvalidAgentException(Exception):
     from the Agent class'''
 
 
-def summarise():
+def summarise(checkpoint=None):
+    '''Play every cell of the summary for the current table size.  With a
+    SweepCheckpoint, finished cells are streamed to it and cells it already
+    holds are not played again.'''
+
+    def cell(group, label, test, *args):
+
+        if checkpoint is not None and checkpoint.has(agent_count, label):
+            wins = checkpoint.get(agent_count, label)
+            print("RESUMED FROM CHECKPOINT")
+            print("RESISTANCE SUCCESS RATE: ", round((wins/tester.number_of_games) * 100, 3), "%")
+            return wins
+
+        wins = test(*args)
+
+        if checkpoint is not None:
+            checkpoint.record(agent_count, group, label, wins)
+
+        return wins
 
     agent_models = {
         "RANDOM": RandomAgent, 
@@ -309,14 +739,14 @@ def summarise():
     
     n_player_outcomes = list()
     
-    for primary_agent in agent_models.keys():
+    for group, primary_agent in enumerate(agent_models.keys()):
 
         agent_type_outcomes = dict()
         collusion_probabilities = [0.95, 0.8, 0.65, 0.5, 0.25]
 
         print("\nAll {} Agents".format(primary_agent))
         homogenous_label = "All {} Agents".format(primary_agent) 
-        agent_type_outcomes[homogenous_label] = tester.test_single_class(agent_models[primary_agent])
+        agent_type_outcomes[homogenous_label] = cell(group, homogenous_label, tester.test_single_class, agent_models[primary_agent])
 
         for secondary_agent in agent_models.keys():
 
@@ -327,15 +757,15 @@ def summarise():
                     primary_agent,
                     secondary_agent
                 ))
-                agent_type_outcomes[a_vs_b] = tester.test_classes_by_type(agent_models[primary_agent], agent_models[secondary_agent])
+                agent_type_outcomes[a_vs_b] = cell(group, a_vs_b, tester.test_classes_by_type, agent_models[primary_agent], agent_models[secondary_agent])
 
                 single_spy = "Single {} Spy amongst {} Agents".format(primary_agent, secondary_agent)
                 print("\nSINGLE {} SPY AMONGST {} AGENTS".format(primary_agent, secondary_agent))            
-                agent_type_outcomes[single_spy] = tester.test_classes_by_selected_spy(agent_models[primary_agent], True, agent_models[secondary_agent], agent_models[secondary_agent])
+                agent_type_outcomes[single_spy] = cell(group, single_spy, tester.test_classes_by_selected_spy, agent_models[primary_agent], True, agent_models[secondary_agent], agent_models[secondary_agent])
 
                 single_resistance = "Single {} Resistance amongst {} Agents".format(primary_agent, secondary_agent)
                 print("\nSINGLE {} RESISTANCE AMONGST {} AGENTS".format(primary_agent, secondary_agent))            
-                agent_type_outcomes[single_resistance] = tester.test_classes_by_selected_spy(agent_models[primary_agent], False, agent_models[secondary_agent], agent_models[secondary_agent])
+                agent_type_outcomes[single_resistance] = cell(group, single_resistance, tester.test_classes_by_selected_spy, agent_models[primary_agent], False, agent_models[secondary_agent], agent_models[secondary_agent])
 
                 # Random can't collude
                 if secondary_agent == 'RANDOM':
@@ -343,7 +773,7 @@ def summarise():
                 
                 resistance_vs_colluding = "{} Resistance amongst Colluding {} Spies".format(primary_agent, secondary_agent)
                 print("\n{} RESISTANCE VS COLLUDING {} SPIES".format(primary_agent, secondary_agent))            
-                agent_type_outcomes[resistance_vs_colluding] = tester.test_colluding_classes_by_type(
+                agent_type_outcomes[resistance_vs_colluding] = cell(group, resistance_vs_colluding, tester.test_colluding_classes_by_type,
                     agent_models[primary_agent], 
                     agent_models[secondary_agent])
 
@@ -351,7 +781,7 @@ def summarise():
                 for collusion_probability in collusion_probabilities:
                     resistance_vs_randomly_colluding = "{} Resistance amongst ({}%) Colluding {} Spies".format(primary_agent, collusion_probability * 100, secondary_agent)
                     print("\n{} RESISTANCE VS  ({}%) COLLUDING {} SPIES".format(primary_agent, collusion_probability * 100, secondary_agent))            
-                    agent_type_outcomes[resistance_vs_randomly_colluding] = tester.test_randomly_colluding_classes_by_type(
+                    agent_type_outcomes[resistance_vs_randomly_colluding] = cell(group, resistance_vs_randomly_colluding, tester.test_randomly_colluding_classes_by_type,
                         collusion_probability,
                         agent_models[primary_agent], 
                         agent_models[secondary_agent])
@@ -364,14 +794,14 @@ def summarise():
 
                 resistance_vs_colluding = "{} Resistance amongst Colluding {} Spies".format(primary_agent, secondary_agent)
                 print("\n{} RESISTANCE VS COLLUDING {} SPIES".format(primary_agent, secondary_agent))            
-                agent_type_outcomes[resistance_vs_colluding] = tester.test_colluding_single_class(
+                agent_type_outcomes[resistance_vs_colluding] = cell(group, resistance_vs_colluding, tester.test_colluding_single_class,
                     agent_models[primary_agent])
                 
 
                 for collusion_probability in collusion_probabilities:
                     resistance_vs_randomly_colluding = "{} Resistance amongst ({}%) Colluding {} Spies".format(primary_agent, collusion_probability * 100, secondary_agent)
                     print("\n{} RESISTANCE VS  ({}%) COLLUDING {} SPIES".format(primary_agent, collusion_probability * 100, secondary_agent))            
-                    agent_type_outcomes[resistance_vs_randomly_colluding] = tester.test_randomly_colluding_single_class(
+                    agent_type_outcomes[resistance_vs_randomly_colluding] = cell(group, resistance_vs_randomly_colluding, tester.test_randomly_colluding_single_class, 
                         collusion_probability,
                         agent_models[primary_agent])
         
@@ -385,14 +815,23 @@ if __name__ == '__main__':
     in the project report.  The data is then saved into a CSV file foranalysis in the report.
     '''
 
-    # Set up testing functions with the number of games to play
+    # Set up testing functions with the number of games to play per matchup.
+    # Every game is played so summary.csv holds whole win counts.  Passing
+    # stopping=ConfidenceWidth(width=0.04) from the stopping module ends each
+    # matchup once its 95% interval is narrower than 4%, but the wins are then
+    # scaled up from the games played.
     number_of_games = 10000
-    tester = AgentTester(number_of_games)
-
-    # Mission Outcomes holds the information relating to each mission
-    # in terms of which Agents were involved and what the results were.
-    # Wins are considered as resistance wins
-    mission_outcomes = dict()
+    tester = AgentTester(number_of_games, workers=os.cpu_count(), seed=3001, cache=ResultCache())
+
+    # Every finished cell is streamed to the checkpoint so an interrupted
+    # sweep resumes where it stopped when run again.  The tester settings and
+    # agent sources are part of the config, so cells played before either
+    # changed aren't mixed into the new sweep
+    checkpoint = SweepCheckpoint("./logs/summary_rows.jsonl",
+                                 config={'number_of_games': number_of_games,
+                                         'seed': tester.seed,
+                                         'options': tester._options(),
+                                         'sources': source_hashes([RandomAgent, DeterministicAgent, InferenceAgent])})
 
     # Run through missions for the specified number of players
     for agent_count in range(5, 11):
@@ -402,35 +841,17 @@ if __name__ == '__main__':
         # Okay, so we aren't passing agent_outcome to anything...
         # I admit it is a global variable and I realised it too late
         # to fix without risking everything else.
-        mission_outcomes[agent_count] = summarise()
+        summarise(checkpoint)
 
-    # Write to CSV for analysis
-    with open("./logs/summary.csv", 'w', newline="\n") as file:
-
-        csv_writer = csv.writer(file)
-        csv_writer.writerow("game_type,5_players,6_players,7_players,8_players,9_players,10_players".split(','))
-
-        table = dict()
-        print(mission_outcomes.keys())
+    checkpoint.finish()
 
-        for agent_number in range(5, 11):
-            
-            round_number = mission_outcomes[agent_number]
-            
-            for agent_type in range(0,3):
-                
-                for key in round_number[agent_type].keys():
-
-                    if key not in table:
-                        table[key] = list()
-
-                    table[key].append(round_number[agent_type][key])
-
-        for key in table.keys():
-            
-            row = table[key].copy()
-            row.insert(0, key)            
-            csv_writer.writerow(row)
+    # Mission Outcomes holds the information relating to each mission
+    # in terms of which Agents were involved and what the results were.
+    # Wins are considered as resistance wins
+    mission_outcomes = checkpoint.outcomes()
+    print(mission_outcomes.keys())
 
+    # Write to CSV for analysis
+    write_summary_csv("./logs/summary.csv", mission_outcomes)
 
-            
\ No newline at end of file
+    tester.close()
@@ -0,0 +1,239 @@
+'''
+Batch Games
+
+Plays many independent games of The Resistance in lockstep.  Every game in
+the batch is at the same round and proposal at the same time, so each step of
+play is a handful of NumPy operations over all games plus one call per
+BatchAgent, rather than one Python method call per player per game.
+
+The rules and turn order are those of game.Game:  agents are shuffled into
+seats for each game, seat 0 leads first, the fifth proposal of a round is
+approved without a vote and all five rounds are always played.
+'''
+
+# Standard Modules
+import logging
+
+# Third Party Modules
+import numpy
+
+# Game Play Modules
+from agent import Agent
+from custom_games import SpyAllocationException, UnallocatedSpiesException
+
+
+class BatchGame():
+    '''Maintains the state of number_of_games games between the same list
+    of BatchAgents.  The same BatchAgent instance may fill several places
+    in the list, in which case it plays all of those seats.'''
+
+    # Setup Game Space
+    agents = None
+    number_of_games = None
+    number_of_players = None
+    spies = None
+    missions_lost = None
+
+    def __init__(self, agents, number_of_games, rng=None):
+
+        if len(agents) < 5 or len(agents) > 10:
+            raise Exception('Agent array out of range')
+
+        self.rng = numpy.random.default_rng(rng)
+        self.number_of_games = number_of_games
+
+        self._setup_agents(agents)
+
+    def _setup_agents(self, agents):
+
+        self.agents = list(agents)
+        self.number_of_players = len(agents)
+
+        # Distinct agent instances, each of which is called once per step
+        self.players = list()
+        for agent in self.agents:
+            if not any(agent is player for player in self.players):
+                self.players.append(agent)
+
+        # Shuffle the agent list independently for every game
+        keys = self.rng.random((self.number_of_games, self.number_of_players))
+        self.seating = numpy.argsort(keys, axis=1)
+
+        player_index = numpy.array([[i for i, player in enumerate(self.players) if player is agent][0]
+                                    for agent in self.agents])
+        self.owner = player_index[self.seating]
+
+        self.spies = None
+
+    def allocate_spies_randomly(self):
+        '''Allocate spies and resistance randomly'''
+
+        spy_count = Agent.spy_count[self.number_of_players]
+
+        keys = self.rng.random((self.number_of_games, self.number_of_players))
+        spy_seats = numpy.argsort(keys, axis=1)[:, :spy_count]
+
+        self.spies = numpy.zeros((self.number_of_games, self.number_of_players), dtype=bool)
+        self.spies[numpy.arange(self.number_of_games)[:, None], spy_seats] = True
+
+        self._initialise_agents()
+        self._initialise_rounds()
+
+    def allocate_spies_by_type(self, spy_class):
+        '''Allocate all players of a certain type to be spies.  All other
+        players are assigned to be resistance.'''
+
+        is_spy_class = numpy.array([isinstance(agent, spy_class) for agent in self.agents])
+
+        if is_spy_class.sum() != Agent.spy_count[self.number_of_players]:
+            message = "Spy count does not match the number of spies required"
+            raise SpyAllocationException(message)
+
+        self.spies = is_spy_class[self.seating]
+
+        self._initialise_agents()
+        self._initialise_rounds()
+
+    def _initialise_agents(self):
+
+        # rows maps each (game, seat) to the row of the seat in its agent's arrays
+        self.rows = numpy.zeros((self.number_of_games, self.number_of_players), dtype=int)
+
+        for player_index, agent in enumerate(self.players):
+
+            games, seats = numpy.nonzero(self.owner == player_index)
+            self.rows[games, seats] = numpy.arange(len(games))
+
+            spy_list = self.spies[games] & self.spies[games, seats][:, None]
+            agent.new_game(self.number_of_players, seats, spy_list)
+
+    def _initialise_rounds(self):
+
+        self.missions_lost = numpy.zeros(self.number_of_games, dtype=int)
+
+    def _calls(self, games, seats):
+        '''Split the (games[i], seats[i]) pairs by the agent that plays them.
+        Yields the agent, the positions of its pairs and its rows.'''
+
+        # A table of one agent owns every pair
+        if len(self.players) == 1:
+            yield self.players[0], numpy.arange(len(games)), self.rows[games, seats]
+            return
+
+        owners = self.owner[games, seats]
+
+        for player_index, agent in enumerate(self.players):
+
+            positions = numpy.nonzero(owners == player_index)[0]
+
+            if len(positions) > 0:
+                yield agent, positions, self.rows[games[positions], seats[positions]]
+
+    def _all_seats(self, games):
+        '''Pairs for every seat of the given games'''
+
+        seats = numpy.broadcast_to(numpy.arange(self.number_of_players), (len(games), self.number_of_players))
+        game_index = numpy.broadcast_to(numpy.arange(len(games))[:, None], seats.shape)
+
+        return game_index.ravel(), seats.ravel()
+
+    def _propose(self, games, leaders, mission_size, fails_required):
+
+        team = numpy.zeros((len(games), self.number_of_players), dtype=bool)
+
+        for agent, positions, rows in self._calls(games, leaders):
+            team[positions] = agent.propose_mission(rows, mission_size, fails_required)
+
+        return team
+
+    def _vote(self, games, team, leaders):
+
+        game_index, seats = self._all_seats(games)
+        votes = numpy.zeros((len(games), self.number_of_players), dtype=bool)
+
+        for agent, positions, rows in self._calls(games[game_index], seats):
+            owners = game_index[positions]
+            votes[owners, seats[positions]] = agent.vote(rows, team[owners], leaders[owners])
+
+        return votes
+
+    def _betray(self, games, team, leaders):
+
+        game_index, seats = numpy.nonzero(team & self.spies[games])
+        betrayals = numpy.zeros(len(games), dtype=int)
+
+        for agent, positions, rows in self._calls(games[game_index], seats):
+            owners = game_index[positions]
+            betrayed = agent.betray(rows, team[owners], leaders[owners])
+            numpy.add.at(betrayals, owners[betrayed], 1)
+
+        return betrayals
+
+    def _inform(self, games, method, *args):
+        '''Call an informative method on every seat of the given games.
+        Array arguments are indexed by game.'''
+
+        game_index, seats = self._all_seats(games)
+
+        for agent, positions, rows in self._calls(games[game_index], seats):
+            owners = game_index[positions]
+            getattr(agent, method)(rows, *[arg[owners] if isinstance(arg, numpy.ndarray) else arg
+                                           for arg in args])
+
+    def play(self):
+
+        if self.spies is None:
+            exception_message = "Spies have not been allocated"
+            raise UnallocatedSpiesException(exception_message)
+
+        all_games = numpy.arange(self.number_of_games)
+        leader_id = numpy.zeros(self.number_of_games, dtype=int)
+
+        for i in range(5):
+            logging.debug("STARTING BATCH ROUND %s", i)
+
+            mission_size = Agent.mission_sizes[self.number_of_players][i]
+            fails_required = Agent.fails_required[self.number_of_players][i]
+
+            round_success = numpy.zeros(self.number_of_games, dtype=bool)
+            games = all_games
+
+            for proposal in range(5):
+
+                leaders = leader_id[games]
+                team = self._propose(games, leaders, mission_size, fails_required)
+
+                # The fifth proposal is approved without a vote
+                if proposal == 4:
+                    votes = numpy.ones((len(games), self.number_of_players), dtype=bool)
+                else:
+                    votes = self._vote(games, team, leaders)
+
+                self._inform(games, 'vote_outcome', team, leaders, votes)
+
+                leader_id[games] = (leaders + 1) % self.number_of_players
+                approved = 2 * votes.sum(axis=1) > self.number_of_players
+
+                if approved.any():
+                    missions = games[approved]
+                    betrayals = self._betray(missions, team[approved], leaders[approved])
+                    success = betrayals < fails_required
+                    round_success[missions] = success
+
+                    self._inform(missions, 'mission_outcome', team[approved], leaders[approved], betrayals, success)
+
+                games = games[~approved]
+
+                if len(games) == 0:
+                    break
+
+            self.missions_lost += ~round_success
+
+            self._inform(all_games, 'round_outcome', i+1, self.missions_lost)
+
+        self._inform(all_games, 'game_outcome', self.missions_lost > 2, self.spies)
+
+    def resistance_wins(self):
+        '''Returns the number of games in the batch won by the resistance'''
+
+        return int((self.missions_lost < 3).sum())
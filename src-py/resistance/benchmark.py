@@ -0,0 +1,209 @@
+'''
+Benchmark
+
+Measures the throughput of the game engines with each agent class at every
+table size.  For each engine (Game and AllocatedAgentsGame), agent class and
+table size three passes are made over freshly created squads:
+
+    throughput  games/sec, the best of several timed repeats
+    callbacks   mean and p99 time per agent callback, timed with a DecisionBudget
+                that has no limits so the games play out as normal
+    memory      peak memory allocated while playing, from tracemalloc
+
+The passes are kept apart so the timing and tracing overheads don't count
+against games/sec.  Results are written as JSON, and a stored result can be
+given as a baseline to flag regressions.
+
+Run from the resistance directory:
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json
+'''
+
+# Standard Modules
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+# Game Play Modules
+from game import Game
+from custom_games import AllocatedAgentsGame
+from timing import DecisionBudget
+
+# Custom Agents
+from agent.random_agent import RandomAgent
+from agent.deterministic_agent import DeterministicAgent
+from agent.inference_agent import InferenceAgent
+
+
+ENGINES = {
+    'Game': Game,
+    'AllocatedAgentsGame': AllocatedAgentsGame
+}
+
+AGENT_CLASSES = {
+    'RandomAgent': RandomAgent,
+    'DeterministicAgent': DeterministicAgent,
+    'InferenceAgent': InferenceAgent
+}
+
+TABLE_SIZES = range(5, 11)
+
+DEFAULT_THRESHOLD = 0.1
+
+
+def create_game(engine, agent_class, number_of_players, budget=None):
+
+    agents = [agent_class(name='{}_{}'.format(agent_class.__name__, i)) for i in range(number_of_players)]
+
+    if engine is AllocatedAgentsGame:
+        game = AllocatedAgentsGame(agents, budget=budget)
+        game.allocate_spies_randomly()
+        return game
+
+    return Game(agents, budget=budget)
+
+
+def play_games(engine, agent_class, number_of_players, number_of_games, budget=None):
+
+    for _ in range(number_of_games):
+        create_game(engine, agent_class, number_of_players, budget).play()
+
+
+def benchmark(engine, agent_class, number_of_players, number_of_games=200, repeats=3, seed=0):
+    '''Measure one engine, agent class and table size'''
+
+    # Throughput
+    best = None
+    for _ in range(repeats):
+        random.seed(seed)
+        start = time.perf_counter()
+        play_games(engine, agent_class, number_of_players, number_of_games)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Time per callback
+    random.seed(seed)
+    budget = DecisionBudget()
+    play_games(engine, agent_class, number_of_players, number_of_games, budget)
+
+    callbacks = dict()
+    for (_, callback), histogram in sorted(budget.telemetry.histograms.items()):
+        callbacks[callback] = {'calls': histogram.calls,
+                               'mean': histogram.total / histogram.calls,
+                               'p99': histogram.percentile(99)}
+
+    # Peak memory
+    random.seed(seed)
+    tracemalloc.start()
+    play_games(engine, agent_class, number_of_players, number_of_games)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'games_per_second': number_of_games / best,
+            'callbacks': callbacks,
+            'peak_memory': peak}
+
+
+def run_benchmarks(engines=ENGINES, agent_classes=AGENT_CLASSES, table_sizes=TABLE_SIZES,
+                   number_of_games=200, repeats=3, seed=0):
+    '''Run every benchmark and return the results keyed by engine:agent class:table size'''
+
+    results = dict()
+    for engine_name, engine in engines.items():
+        for class_name, agent_class in agent_classes.items():
+            for number_of_players in table_sizes:
+
+                key = '{}:{}:{}'.format(engine_name, class_name, number_of_players)
+                results[key] = benchmark(engine, agent_class, number_of_players, number_of_games, repeats, seed)
+
+                print("{}: {:.1f} games/sec, peak memory {:.1f} KB".format(key,
+                                                                           results[key]['games_per_second'],
+                                                                           results[key]['peak_memory'] / 1024))
+
+    return {'meta': {'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'date': datetime.datetime.now().isoformat(),
+                     'number_of_games': number_of_games,
+                     'repeats': repeats,
+                     'seed': seed},
+            'results': results}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    '''List the benchmarks that are slower, use more memory or have slower
+    callbacks than the baseline by more than threshold, as
+    (key, measure, baseline, current).  Callback measures are named
+    callbacks.<callback>.mean and callbacks.<callback>.p99.'''
+
+    regressions = list()
+    for key, result in current['results'].items():
+
+        if key not in baseline['results']:
+            continue
+
+        base = baseline['results'][key]
+
+        if result['games_per_second'] < base['games_per_second'] * (1 - threshold):
+            regressions.append((key, 'games_per_second', base['games_per_second'], result['games_per_second']))
+
+        if result['peak_memory'] > base['peak_memory'] * (1 + threshold):
+            regressions.append((key, 'peak_memory', base['peak_memory'], result['peak_memory']))
+
+        for callback, latency in result['callbacks'].items():
+
+            if callback not in base['callbacks']:
+                continue
+
+            for measure in ('mean', 'p99'):
+                if latency[measure] > base['callbacks'][callback][measure] * (1 + threshold):
+                    regressions.append((key, 'callbacks.{}.{}'.format(callback, measure),
+                                        base['callbacks'][callback][measure], latency[measure]))
+
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Benchmark the game engines and agents")
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument('--agents', nargs='+', choices=sorted(AGENT_CLASSES), default=sorted(AGENT_CLASSES))
+    parser.add_argument('--sizes', nargs='+', type=int, choices=list(TABLE_SIZES), default=list(TABLE_SIZES))
+    parser.add_argument('--games', type=int, default=200, help="games per repeat")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="flag regressions against this baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction a measure may worsen by before it is flagged")
+    arguments = parser.parse_args()
+
+    benchmark_results = run_benchmarks({name: ENGINES[name] for name in arguments.engines},
+                                       {name: AGENT_CLASSES[name] for name in arguments.agents},
+                                       arguments.sizes,
+                                       arguments.games,
+                                       arguments.repeats,
+                                       arguments.seed)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(benchmark_results, output_file, indent=2)
+
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            baseline_results = json.load(baseline_file)
+
+        found = compare(baseline_results, benchmark_results, arguments.threshold)
+
+        for key, measure, base, result in found:
+            print("REGRESSION {} {}: {:.4g} -> {:.4g}".format(key, measure, base, result))
+
+        if found:
+            sys.exit(1)
+
+        print("NO REGRESSIONS")
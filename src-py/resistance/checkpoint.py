@@ -0,0 +1,173 @@
+'''
+Checkpoint
+
+Streams the cells of the assignment.py summary sweep to disk as they finish so
+a sweep that crashes or is interrupted can pick up where it stopped.
+
+    path            one JSON row per finished cell, appended and synced as
+                    soon as the cell is played
+    path.checkpoint the number of rows and bytes of path that are complete,
+                    replaced atomically after every row
+
+On resume the rows file is cut back to the checkpointed length, dropping any
+row that was half written, and the finished cells are answered from the rows
+instead of being played again.  The summary csv is rebuilt from the rows, in
+the order the cells were first played, so it has the same layout whether the
+sweep ran in one go or was resumed.
+'''
+
+# Standard Modules
+import csv
+import json
+import os
+
+
+class SweepCheckpoint():
+    '''The finished cells of a summary sweep'''
+
+    def __init__(self, path, config=None):
+        '''
+        path is the file the rows are streamed to,
+        config is a dict of the sweep settings, which must match those of
+        the checkpoint being resumed
+        '''
+        self.path = path
+        self.config = config or {}
+        self.rows = list()
+        self.cells = dict()
+        self.offset = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._resume()
+
+        self.rows_file = open(path, 'a', encoding='utf-8')
+
+    def _resume(self):
+
+        if not os.path.exists(self.path + '.checkpoint'):
+            # Nothing was checkpointed so any rows left are incomplete
+            open(self.path, 'w').close()
+            return
+
+        with open(self.path + '.checkpoint', encoding='utf-8') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+
+        if checkpoint['config'] != self.config:
+            message = "The checkpoint at {} is for a sweep with settings {}".format(self.path, checkpoint['config'])
+            raise CheckpointException(message)
+
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < checkpoint['offset']:
+            message = "The rows at {} are shorter than their checkpoint".format(self.path)
+            raise CheckpointException(message)
+
+        with open(self.path, 'r+', encoding='utf-8') as rows_file:
+            rows_file.truncate(checkpoint['offset'])
+
+        with open(self.path, encoding='utf-8') as rows_file:
+            for line in rows_file:
+                self._add(json.loads(line))
+
+        self.offset = checkpoint['offset']
+
+    def _add(self, row):
+
+        self.rows.append(row)
+        self.cells[(row['agent_count'], row['label'])] = row['wins']
+
+    def _save(self):
+
+        temporary = self.path + '.checkpoint.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump({'config': self.config, 'rows': len(self.rows), 'offset': self.offset}, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+
+        os.replace(temporary, self.path + '.checkpoint')
+
+    def has(self, agent_count, label):
+
+        return (agent_count, label) in self.cells
+
+    def get(self, agent_count, label):
+
+        return self.cells[(agent_count, label)]
+
+    def record(self, agent_count, group, label, wins):
+        '''Stream a finished cell to disk and checkpoint it'''
+
+        row = {'agent_count': agent_count, 'group': group, 'label': label, 'wins': wins}
+        line = json.dumps(row) + '\n'
+
+        self.rows_file.write(line)
+        self.rows_file.flush()
+        os.fsync(self.rows_file.fileno())
+
+        self.offset += len(line.encode('utf-8'))
+        self._add(row)
+        self._save()
+
+    def outcomes(self):
+        '''The rows as returned by summarise() for each table size: a list with
+        a dict of label to wins for each primary agent type'''
+
+        outcomes = dict()
+        for row in self.rows:
+            groups = outcomes.setdefault(row['agent_count'], list())
+
+            while len(groups) <= row['group']:
+                groups.append(dict())
+
+            groups[row['group']][row['label']] = row['wins']
+
+        return outcomes
+
+    def close(self):
+
+        self.rows_file.close()
+
+    def finish(self):
+        '''Close a completed sweep.  The rows are kept but the checkpoint is
+        removed so the next sweep starts afresh.'''
+
+        self.close()
+        os.remove(self.path + '.checkpoint')
+
+
+def write_summary_csv(path, mission_outcomes):
+    '''Write the summary table of a sweep, with a row per cell label and a
+    column per table size.  The file is replaced atomically.'''
+
+    table = dict()
+    for agent_number in range(5, 11):
+
+        round_number = mission_outcomes[agent_number]
+
+        for agent_type in range(0, 3):
+
+            for key in round_number[agent_type].keys():
+
+                if key not in table:
+                    table[key] = list()
+
+                table[key].append(round_number[agent_type][key])
+
+    temporary = path + '.tmp'
+    with open(temporary, 'w', newline="\n") as file:
+
+        csv_writer = csv.writer(file)
+        csv_writer.writerow("game_type,5_players,6_players,7_players,8_players,9_players,10_players".split(','))
+
+        for key in table.keys():
+
+            row = table[key].copy()
+            row.insert(0, key)
+            csv_writer.writerow(row)
+
+    os.replace(temporary, path)
+
+
+class CheckpointException(Exception):
+    '''Raise when a checkpoint can't be resumed'''
@@ -0,0 +1,159 @@
+'''
+Combinatorics
+
+Read-only tables of the spy sets and legal teams of each table size, for agents
+that reason over every possible set of spies:
+
+    spy_sets    bitmask of every set of spies, in itertools.combinations order
+    members     0/1 matrix of the players in each spy set, shape (spy sets, players)
+    teams       bitmask of every team of each mission size, in combinations order
+    team_index  row of every bitmask in the teams of its size, or -1 if it is
+                not a team of that size
+    overlaps    number of spies on every team under every spy set, shape
+                (spy sets, teams), up to 210 x 252 for 10 players
+
+A table size's tables are built the first time they are asked for and saved as
+.npy files in a cache directory, then loaded memory-mapped and read only.  Every
+agent in a process shares the one CombinatorialTables of a table size, and
+every process loading the same files shares their pages, so the worker
+processes of a parallel tournament don't each build and hold their own.
+Files are written to a temporary file and renamed, so processes building the
+same tables at once can't read a half written file.  If the cache directory
+can't be written the tables are held in memory instead.
+'''
+
+# Standard Modules
+import logging
+import os
+import tempfile
+from itertools import combinations
+
+# Numerical Modules
+import numpy
+
+# Game Play Modules
+from agent import Agent
+
+
+DEFAULT_PATH = './logs/combinatorics'
+
+# Changing how the tables are laid out needs a new version so stale files aren't loaded
+VERSION = 1
+
+# Popcount of every bitmask of up to 10 players
+POPCOUNT = numpy.array([bin(mask).count('1') for mask in range(1 << 10)], dtype=numpy.uint8)
+
+
+class CombinatorialTables():
+    '''The spy set and team tables of one table size'''
+
+    def __init__(self, number_of_players, path=DEFAULT_PATH):
+        '''
+        number_of_players is the table size, path is the cache directory, or
+        None to hold the tables in memory only
+        '''
+
+        self.number_of_players = number_of_players
+        self.spy_count = Agent.spy_count[number_of_players]
+        self.team_sizes = sorted(set(Agent.mission_sizes[number_of_players]))
+        self.path = path
+
+        self.spy_sets = self._load('spy_sets', self._build_spy_sets)
+        self.members = self._load('members', self._build_members)
+
+        self.teams = dict()
+        self.team_index = dict()
+        self.overlaps = dict()
+        for team_size in self.team_sizes:
+            self.teams[team_size] = self._load('teams_%d' % team_size,
+                                               lambda: self._build_teams(team_size))
+            self.team_index[team_size] = self._load('team_index_%d' % team_size,
+                                                    lambda: self._build_team_index(team_size))
+            self.overlaps[team_size] = self._load('overlaps_%d' % team_size,
+                                                  lambda: self._build_overlaps(team_size))
+
+    def _file(self, name):
+
+        return os.path.join(self.path, 'v%d_%d_%s.npy' % (VERSION, self.number_of_players, name))
+
+    def _load(self, name, build):
+        '''Memory-map the named table from the cache, building and saving it first if needed'''
+
+        if self.path is None:
+            return build()
+
+        try:
+            return self._map(name)
+        except (OSError, ValueError):
+            pass
+
+        table = build()
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(descriptor, 'wb') as table_file:
+                numpy.save(table_file, table)
+            os.replace(temporary, self._file(name))
+        except OSError as error:
+            logging.debug("COMBINATORIAL TABLE %s NOT CACHED: %s", name, error)
+            table.flags.writeable = False
+            return table
+
+        return self._map(name)
+
+    def _map(self, name):
+        '''The named table memory-mapped read only.  It is viewed as a plain
+        ndarray, as NumPy operations on memmap objects are slower.'''
+
+        return numpy.load(self._file(name), mmap_mode='r').view(numpy.ndarray)
+
+    def _build_spy_sets(self):
+
+        return numpy.array([sum(1 << spy for spy in spies)
+                            for spies in combinations(range(self.number_of_players), self.spy_count)],
+                           dtype=numpy.uint16)
+
+    def _build_members(self):
+
+        players = numpy.arange(self.number_of_players)
+        return (self.spy_sets[:, None].astype(numpy.int64) >> players & 1).astype(numpy.float64)
+
+    def _build_teams(self, team_size):
+
+        return numpy.array([sum(1 << player for player in team)
+                            for team in combinations(range(self.number_of_players), team_size)],
+                           dtype=numpy.uint16)
+
+    def _build_team_index(self, team_size):
+
+        index = numpy.full(1 << self.number_of_players, -1, dtype=numpy.int16)
+        index[self.teams[team_size]] = numpy.arange(len(self.teams[team_size]))
+        return index
+
+    def _build_overlaps(self, team_size):
+
+        return POPCOUNT[self.spy_sets[:, None] & self.teams[team_size][None, :]]
+
+    def spies_on_team(self, team_mask):
+        '''Number of spies on the team team_mask under every spy set'''
+
+        team_size = int(POPCOUNT[team_mask])
+        if team_size in self.team_index:
+            return self.overlaps[team_size][:, self.team_index[team_size][team_mask]]
+
+        return POPCOUNT[self.spy_sets & team_mask]
+
+
+# The tables of each table size loaded by this process
+_tables = dict()
+
+
+def tables(number_of_players, path=DEFAULT_PATH):
+    '''The CombinatorialTables of a table size, shared by every caller in the process'''
+
+    key = (number_of_players, path)
+    if key not in _tables:
+        _tables[key] = CombinatorialTables(number_of_players, path)
+
+    return _tables[key]
@@ -10,26 +10,41 @@ to either the resistance or spy groups
 # Standard Modules
 import logging
 import random
+from itertools import combinations
 
 # Game Play Modules
-from game import Round
+from game import GameState, PlayerSet, Round
 from agent import Agent
+from events import game_observers
 
 
 class AllocatedAgentsGame():
     '''Allocates Spies and Resistance using Agent Type
-    to choose play type'''
+    to choose play type.  The agents are told their seats and roles when
+    the game is played, so they only hear of the final allocation.'''
 
     # Setup Game Space
     agents = None
     number_of_players = None
     spies = None
+    state = None
+    log = None
+    observers = ()
+    budget = None
+    first_leader = 0
 
-    def __init__(self, agents):
+    def __init__(self, agents, log=None, observers=None, budget=None):
+        '''If a GameLogWriter is given as log the game is appended to it once played.
+        observers is a list of GameObservers, which defaults to the subscribed observers.
+        If a DecisionBudget is given as budget the agents' callbacks are timed and limited.'''
 
         if len(agents) < 5 or len(agents) > 10:
             raise Exception('Agent array out of range')
 
+        self.log = log
+        self.observers = game_observers(observers, log)
+        self.budget = budget
+
         self._setup_agents(agents)
 
     def _setup_agents(self, agents):
@@ -47,7 +62,6 @@ class AllocatedAgentsGame():
             if spy not in self.spies:
                 self.spies.append(spy)
 
-        self._initialise_agents()
         self._initialise_rounds()
 
     def allocate_spies_by_type(self, spy_class):
@@ -62,7 +76,6 @@ class AllocatedAgentsGame():
             message = "Spy count does not match the number of spies required"
             raise SpyAllocationException(message)
 
-        self._initialise_agents()
         self._initialise_rounds()
 
     def allocate_single_spy(self, name):
@@ -107,10 +120,29 @@ class AllocatedAgentsGame():
 
             self.spies[self.spies.index(resistance_agent)] = alternate_spies[0]
 
+    def deal(self, spies, first_leader=0):
+        '''Reseat the allocated agents so the spies sit at the given seats,
+        keeping the order of the spies and of the resistance around the
+        table.  first_leader is the seat that proposes the first mission.'''
+
+        if len(spies) != len(self.spies):
+            message = "Spy count does not match the number of spies allocated"
+            raise SpyAllocationException(message)
+
+        spy_agents = [self.agents[i] for i in sorted(self.spies)]
+        resistance_agents = [agent for i, agent in enumerate(self.agents) if i not in self.spies]
+
+        self.agents = [spy_agents.pop(0) if seat in spies else resistance_agents.pop(0)
+                       for seat in range(self.number_of_players)]
+        self.spies = list(spies)
+        self.first_leader = first_leader
+
+        self._initialise_rounds()
+
     def _initialise_agents(self):
 
         for player_number in range(self.number_of_players):
-            spy_list = self.spies.copy() if player_number in self.spies else []
+            spy_list = PlayerSet(self.spies) if player_number in self.spies else PlayerSet()
             self.agents[player_number].new_game(self.number_of_players,
                                                 player_number,
                                                 spy_list)
@@ -118,30 +150,64 @@ class AllocatedAgentsGame():
 
     def _initialise_rounds(self):
 
-        self.rounds = list()
+        self.state = None
         self.missions_lost = 0
 
+    @property
+    def rounds(self):
+        '''Rounds played so far, rendered from the game state'''
+
+        if self.state is None:
+            return []
+
+        return self.state.rounds(self.agents)
+
     def play(self):
 
         if len(self.spies) == 0:
             exception_message = "Spies have not been allocated"
             raise UnallocatedSpiesException(exception_message)
 
-        leader_id = 0
+        self._initialise_agents()
+        self.state = GameState(self.number_of_players, self.spies)
+        observers = self.observers
+        agents = self.agents if self.budget is None else self.budget.seats(self.agents)
+        if observers:
+            for o in observers:
+                o.game_start(self)
+        leader_id = self.first_leader
         for i in range(5):
-            logging.debug("STARTING ROUND {}".format(i))
-            self.rounds.append(Round(leader_id, self.agents, self.spies, i))
+            logging.debug("STARTING ROUND %s", i)
+            current_round = Round(leader_id, agents, self.spies, i, self.state, observers)
 
-            if not self.rounds[i].play():
+            if not current_round.play():
                 self.missions_lost += 1
 
-            for a in self.agents:
+            for a in agents:
                 a.round_outcome(i+1, self.missions_lost)
+            if observers:
+                for o in observers:
+                    o.round_end(i+1, self.missions_lost)
+
+            leader_id = current_round.leader_id
+
+        spies = PlayerSet(self.spies)
+        for a in agents:
+            a.game_outcome(self.missions_lost > 2, spies)
+        if observers:
+            for o in observers:
+                o.game_end(self)
+
+
+def role_assignments(number_of_players, leader_offsets=False):
+    '''Every set of spy seats for a table of number_of_players, each with the
+    first leader, as (spies, first_leader) pairs for AllocatedAgentsGame.deal.
+    Seat 0 leads first unless leader_offsets is set, when every seat does.'''
 
-            leader_id = (leader_id+len(self.rounds[i].missions)) % len(self.agents)
+    spy_sets = combinations(range(number_of_players), Agent.spy_count[number_of_players])
+    leaders = range(number_of_players) if leader_offsets else [0]
 
-        for a in self.agents:
-            a.game_outcome(self.missions_lost > 2, self.spies)
+    return [(list(spies), leader) for spies in spy_sets for leader in leaders]
 
 
 class UnallocatedSpiesException(Exception):
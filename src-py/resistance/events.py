@@ -0,0 +1,76 @@
+'''
+Events
+
+Observers let analytics, recorders and metrics follow games without living
+inside the agents.  An observer subclasses GameObserver and overrides the
+events it is interested in.  It can be passed to a single game, or subscribed
+here to receive the events of every game created afterwards in this process.
+
+Games only dispatch events when they have observers, so a game with none
+pays for a single truth test per event.
+'''
+
+
+# Observers given to every new game
+OBSERVERS = list()
+
+
+class GameObserver():
+    '''A super class for objects that follow the events of a game.
+    All events do nothing by default.'''
+
+    def game_start(self, game):
+        '''
+        game has been set up and is about to be played.
+        The agents and spies are available as game.agents and game.spies.
+        '''
+
+    def proposal(self, rnd, leader_id, team):
+        '''
+        leader_id has proposed team for a mission in round rnd (0-4)
+        '''
+
+    def vote(self, rnd, leader_id, team, votes_for):
+        '''
+        votes_for is the list of players that voted for the team proposed by leader_id
+        '''
+
+    def mission(self, rnd, leader_id, team, betrayals, mission_success):
+        '''
+        team has been on a mission, betrayals is the number of players that
+        betrayed it and mission_success is True if the mission succeeded
+        '''
+
+    def round_end(self, rounds_complete, missions_failed):
+        '''
+        rounds_complete rounds (1-5) have been played and missions_failed of them failed
+        '''
+
+    def game_end(self, game):
+        '''
+        game has been played.  game.missions_lost > 2 if the spies won.
+        '''
+
+
+def subscribe(observer):
+    '''Send the events of every game created from now on to observer'''
+
+    OBSERVERS.append(observer)
+
+
+def unsubscribe(observer):
+    '''Stop sending the events of new games to observer'''
+
+    OBSERVERS.remove(observer)
+
+
+def game_observers(observers=None, log=None):
+    '''The observers for a new game:  the given observers or the subscribed
+    ones, followed by the game log if there is one'''
+
+    observers = list(OBSERVERS if observers is None else observers)
+
+    if log is not None:
+        observers.append(log)
+
+    return observers
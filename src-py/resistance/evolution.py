@@ -6,6 +6,7 @@ Evolution
 import logging
 
 from custom_games import AllocatedAgentsGame
+from events import GameObserver
 
 from genetics import AgentOriginator
 from assignment import AgentTester, SquadCreator
@@ -52,22 +53,10 @@ class AgentWorld():
     def run_single_game(self):
         '''Run a single instance of a game'''
 
-        game = AllocatedAgentsGame(list(self.agents.keys()))
+        game = AllocatedAgentsGame(list(self.agents.keys()), observers=[WorldTally(self.agents)])
         game.allocate_spies_randomly()
         game.play()
 
-        for agent in self.agents:
-            
-            if agent.winner:
-
-                if agent.is_spy():
-                    self.agents[agent]['spy'] += 1
-                    continue
-                
-                self.agents[agent]['resistance'] += 1
-            
-            self.agents[agent]['spies_found'] += agent.correctly_identified_spies
-
                
     
     def trial_of_the_champions(self, number=1000):
@@ -99,7 +88,31 @@ class AgentWorld():
         return total_wins_1, self.agents[agent_superior_1]['resistance'], self.agents[agent_superior_1]['spy'], self.agents[agent_superior_1]['spies_found'], agent_superior_1
 
 
-        
+
+class WorldTally(GameObserver):
+    '''Adds the result of each game it observes to the win counts of an AgentWorld'''
+
+    def __init__(self, agents):
+
+        self.agents = agents
+
+    def game_end(self, game):
+
+        spies_win = game.missions_lost > 2
+
+        for seat, agent in enumerate(game.agents):
+
+            if (seat in game.spies) == spies_win:
+
+                if spies_win:
+                    self.agents[agent]['spy'] += 1
+                    continue
+
+                self.agents[agent]['resistance'] += 1
+
+            self.agents[agent]['spies_found'] += agent.correctly_identified_spies
+
+
 def debug_log_setup():
 
     logging.basicConfig(
@@ -0,0 +1,121 @@
+'''
+Exact Odds
+
+Calculates the exact probability that the resistance wins a game in which every
+player is a RandomAgent.  No games are simulated, so the results can be used as
+a baseline for the other agents and as an oracle for the game engines.
+
+RandomAgent votes for a mission half of the time, betrays 30% of the time as a
+spy and draws its team with randrange(team_size), so every team it proposes is
+the first team_size seats.  As the team is the same whoever leads, the leader
+does not change the odds and is left out of the game state.  The spies are a
+uniformly random set of seats, and for each spy set a dynamic program is run
+over (round, missions failed, rejected proposals).  Probabilities are held as
+Fractions so the results are exact.
+'''
+
+# Standard Modules
+from collections import Counter
+from fractions import Fraction
+from itertools import combinations
+from math import comb
+
+# Custom Game Modules
+from agent import Agent
+
+
+VOTE_PROBABILITY = Fraction(1, 2)
+BETRAY_PROBABILITY = Fraction(3, 10)
+
+
+def approval_probability(number_of_players, vote_probability=VOTE_PROBABILITY):
+    '''Probability that more than half of the players vote for a mission'''
+
+    return sum(comb(number_of_players, votes_for)
+               * vote_probability ** votes_for
+               * (1 - vote_probability) ** (number_of_players - votes_for)
+               for votes_for in range(number_of_players + 1)
+               if 2 * votes_for > number_of_players)
+
+
+def mission_failure_probability(spies_on_mission, betrayals_required, betray_probability=BETRAY_PROBABILITY):
+    '''Probability that at least betrayals_required of the spies on a mission betray it'''
+
+    return sum(comb(spies_on_mission, betrayals)
+               * betray_probability ** betrayals
+               * (1 - betray_probability) ** (spies_on_mission - betrayals)
+               for betrayals in range(betrayals_required, spies_on_mission + 1))
+
+
+def _spies_on_missions(number_of_players, spies):
+    '''Number of spies on the team of each round for a set of spy seats'''
+
+    return tuple(len([spy for spy in spies if spy < team_size])
+                 for team_size in Agent.mission_sizes[number_of_players])
+
+
+def _win_probability(number_of_players, spies_on_missions, p_approve, betray_probability):
+    '''Run the dynamic program for the spy counts of a single set of spy seats'''
+
+    # Probability of each number of missions failed after the rounds so far
+    missions_failed = {0: Fraction(1)}
+
+    for rnd in range(5):
+
+        betrayals_required = Agent.fails_required[number_of_players][rnd]
+        p_fail = mission_failure_probability(spies_on_missions[rnd], betrayals_required, betray_probability)
+
+        # Probability the mission is sent after each number of rejected proposals.
+        # The fifth proposal is approved without a vote.
+        p_sent = Fraction(0)
+        p_rejected = Fraction(1)
+        for rejections in range(5):
+            p_approved = p_approve if rejections < 4 else Fraction(1)
+            p_sent += p_rejected * p_approved
+            p_rejected *= 1 - p_approved
+
+        next_missions_failed = dict()
+        for failed, probability in missions_failed.items():
+            next_missions_failed[failed + 1] = next_missions_failed.get(failed + 1, 0) + probability * p_sent * p_fail
+            next_missions_failed[failed] = next_missions_failed.get(failed, 0) + probability * p_sent * (1 - p_fail)
+
+        missions_failed = next_missions_failed
+
+    return sum(probability for failed, probability in missions_failed.items() if failed < 3)
+
+
+def random_squad_win_probability(number_of_players,
+                                 vote_probability=VOTE_PROBABILITY,
+                                 betray_probability=BETRAY_PROBABILITY):
+    '''Exact probability that the resistance wins a game of number_of_players RandomAgents'''
+
+    if number_of_players < 5 or number_of_players > 10:
+        raise Exception('Agent array out of range')
+
+    p_approve = approval_probability(number_of_players, vote_probability)
+
+    # Spy sets that put the same number of spies on each team have the same odds
+    spy_sets = Counter(_spies_on_missions(number_of_players, spies)
+                       for spies in combinations(range(number_of_players), Agent.spy_count[number_of_players]))
+
+    total = sum(count * _win_probability(number_of_players, spies_on_missions, p_approve, betray_probability)
+                for spies_on_missions, count in spy_sets.items())
+
+    return total / sum(spy_sets.values())
+
+
+def random_squad_win_probabilities(vote_probability=VOTE_PROBABILITY,
+                                   betray_probability=BETRAY_PROBABILITY):
+    '''Exact resistance win probabilities of RandomAgent squads for every table size'''
+
+    return {number_of_players: random_squad_win_probability(number_of_players,
+                                                            vote_probability,
+                                                            betray_probability)
+            for number_of_players in range(5, 11)}
+
+
+if __name__ == '__main__':
+
+    for number_of_players, probability in random_squad_win_probabilities().items():
+        print("RESISTANCE MEMBERS: {}".format(number_of_players))
+        print("WIN PERCENT: ", round(float(probability) * 100, 3), "%")
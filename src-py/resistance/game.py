@@ -3,7 +3,21 @@ Game Classes
 '''
 
 from agent import Agent
+from array import array
+from events import game_observers
+from zobrist import PublicHistory
 import random
+import sys
+
+
+# A game has five rounds of at most five proposals
+MAX_PROPOSALS = 25
+
+# Betrayals recorded for a proposal that was never sent on a mission
+NOT_SENT = 0xFFFF
+
+# Seats kept in the proposed order of a team
+TEAM_ORDER_SEATS = 8
 
 
 class Game:
@@ -18,16 +32,27 @@ class Game:
     agents = None
     num_players = 0
     spies = None
+    state = None
+    log = None
+    observers = ()
+    budget = None
+    first_leader = 0
 
     
 
-    def __init__(self, agents):
+    def __init__(self, agents, log=None, observers=None, budget=None):
         '''Setup Game.  If randomise is set to False we will assign
-        particular agents to be spies/resistance'''
+        particular agents to be spies/resistance.
+        If a GameLogWriter is given as log the game is appended to it once played.
+        observers is a list of GameObservers, which defaults to the subscribed observers.
+        If a DecisionBudget is given as budget the agents' callbacks are timed and limited.'''
 
         if len(agents) < 5 or len(agents) > 10:
             raise Exception('Agent array out of range')
 
+        self.log = log
+        self.observers = game_observers(observers, log)
+        self.budget = budget
         self._setup_agents(agents)
         self._allocate_spies()
         self._initialise_agents()
@@ -51,63 +76,313 @@ class Game:
     def _initialise_agents(self):
 
         for agent_id in range(self.num_players):
-            spy_list = self.spies.copy() if agent_id in self.spies else []
+            spy_list = PlayerSet(self.spies) if agent_id in self.spies else PlayerSet()
             self.agents[agent_id].new_game(self.num_players, agent_id, spy_list)
     
     def _initialise_rounds(self):
 
-        self.rounds = list()
+        self.state = None
         self.missions_lost = 0
 
+    @property
+    def rounds(self):
+        '''Rounds played so far, rendered from the game state'''
+
+        if self.state is None:
+            return []
+
+        return self.state.rounds(self.agents)
+
     def __str__(self):
-        s = 'Game between agents:' + str(self.agents)
-        for r in self.rounds:
-            s = s + '\n' + str(r)
-        if self.missions_lost < 3:
-            s = s + '\nThe Resistance succeeded!'
-        else:
-            s = s + '\nThe Resistance failed!'
-        s = s + 'The spies were agents: '+ str(self.spies)    
-        return s    
+        return describe_game(self.agents, self.rounds, self.missions_lost, self.spies)
 
     def play(self):
-        leader_id = 0
+        self.state = GameState(self.num_players, self.spies)
+        observers = self.observers
+        agents = self.agents if self.budget is None else self.budget.seats(self.agents)
+        if observers:
+            for o in observers:
+                o.game_start(self)
+        leader_id = self.first_leader
         for i in range(5):
-            self.rounds.append(Round(leader_id, self.agents, self.spies, i))
+            current_round = Round(leader_id, agents, self.spies, i, self.state, observers)
             
-            if not self.rounds[i].play():
+            if not current_round.play():
                 self.missions_lost += 1
 
-            for a in self.agents:                
+            for a in agents:
                 a.round_outcome(i+1, self.missions_lost)
+            if observers:
+                for o in observers:
+                    o.round_end(i+1, self.missions_lost)
+
+            leader_id = current_round.leader_id
+
+        spies = PlayerSet(self.spies)
+        for a in agents:
+            a.game_outcome(self.missions_lost > 2, spies)
+        if observers:
+            for o in observers:
+                o.game_end(self)
+
+    def results_to_csv(self, path, store=None):
+        '''Print results info to a CSV that can be analysed later.
+        The game is added to store, a ResultsStore that defaults to one in memory,
+        and the results of everything in the store are exported to path.'''
+
+        from results_store import ResultsStore
+
+        if store is None:
+            store = ResultsStore()
+
+        store.append(self)
+        store.to_csv(path)
+
+
+def describe_game(agents, rounds, missions_lost, spies):
+    '''
+    produces the string representation of a game
+    '''
+    s = 'Game between agents:' + str(agents)
+    for r in rounds:
+        s = s + '\n' + str(r)
+    if missions_lost < 3:
+        s = s + '\nThe Resistance succeeded!'
+    else:
+        s = s + '\nThe Resistance failed!'
+    s = s + 'The spies were agents: '+ str(spies)    
+    return s    
+
+
+class GameState():
+    '''
+    a compact record of every proposal made in a game.
+    Each proposal is seven unsigned shorts in a fixed-width array:
+    the leader and round, the team as a bitmask of player indexes,
+    the votes for as a bitmask, the number of betrayals
+    (NOT_SENT if the mission was not approved), the betrayers as a bitmask
+    and the team in the order proposed, packed by pack_seats into two shorts.
+    Only the first TEAM_ORDER_SEATS seats of a team keep their order.
+    spy_order is the list of spies in the order they were dealt.
+    history is the PublicHistory hash of the public situation of the game,
+    updated as each proposal is decided.
+    '''
+
+    __slots__ = ('number_of_players', 'spies', 'spy_order', 'proposals', 'records', 'history')
+
+    WIDTH = 7
+
+    def __init__(self, number_of_players, spies):
+        '''
+        number_of_players is the number of agents in the game,
+        spies is the list of indexes of spies in the game
+        '''
+        self.number_of_players = number_of_players
+        self.spies = to_bitmask(spies)
+        self.spy_order = list(spies)
+        self.proposals = 0
+        self.records = array('H', bytes(2 * self.WIDTH * MAX_PROPOSALS))
+        self.history = PublicHistory(number_of_players)
+
+    @classmethod
+    def frombytes(cls, number_of_players, spies, data, spy_order=None):
+        '''
+        rebuilds a state from the spy bitmask and the little-endian bytes of its used records.
+        spy_order is the list of spies in the order dealt, which defaults to seat order
+        '''
+        records = array('H', data)
+        if sys.byteorder == 'big':
+            records.byteswap()
+
+        state = cls(number_of_players, [])
+        state.spies = spies
+        state.spy_order = list(spy_order) if spy_order is not None else from_bitmask(spies)
+        state.proposals = len(records) // cls.WIDTH
+        state.records[:len(records)] = records
+        for i in range(state.proposals):
+            state.decided(i)
+        return state
+
+    def tobytes(self):
+        '''
+        returns the records used so far as little-endian bytes
+        '''
+        records = self.records[:self.proposals * self.WIDTH]
+        if sys.byteorder == 'big':
+            records.byteswap()
+        return records.tobytes()
+
+    def decided(self, index):
+        '''
+        updates the history hash once proposal index has been voted on and, if approved, played
+        '''
+        betrayals = self.records[index * self.WIDTH + 3]
+        if betrayals == NOT_SENT:
+            self.history.rejected()
+        else:
+            self.history.mission(self.records[index * self.WIDTH + 1], betrayals)
+
+    def leader_id(self, index):
+        return self.records[index * self.WIDTH] & 0xFF
+
+    def rnd(self, index):
+        return self.records[index * self.WIDTH] >> 8
+
+    def team(self, index):
+        '''
+        returns the team of proposal index in the order it was proposed
+        '''
+        offset = index * self.WIDTH
+        return unpack_seats(self.records[offset + 5] | self.records[offset + 6] << 16)
+
+    def team_mask(self, index):
+        return self.records[index * self.WIDTH + 1]
+
+    def votes_for(self, index):
+        return from_bitmask(self.records[index * self.WIDTH + 2])
+
+    def betrayals(self, index):
+        return self.records[index * self.WIDTH + 3]
+
+    def betrayers(self, index):
+        return from_bitmask(self.records[index * self.WIDTH + 4])
+
+    def spy_list(self):
+        return list(self.spy_order)
+
+    def round_proposals(self, rnd):
+        '''
+        returns the indexes of the proposals made in round rnd
+        '''
+        return [i for i in range(self.proposals) if self.rnd(i) == rnd]
+
+    def rounds(self, agents):
+        '''
+        returns a Round view for each round with proposals
+        '''
+        played = sorted(set(self.rnd(i) for i in range(self.proposals)))
+        return [Round.view(self, agents, rnd) for rnd in played]
+
 
-            leader_id = (leader_id+len(self.rounds[i].missions)) % len(self.agents)
+def to_bitmask(players):
+    '''
+    returns an int with bit i set for each player index i in players
+    '''
+    if type(players) is PlayerSet:
+        return players.mask
+    mask = 0
+    for i in players:
+        mask |= 1 << i
+    return mask
+
+
+def from_bitmask(mask):
+    '''
+    returns the sorted list of player indexes set in mask
+    '''
+    return [i for i in range(mask.bit_length()) if mask >> i & 1]
+
+
+def pack_seats(seats, places=TEAM_ORDER_SEATS):
+    '''
+    packs the first places seats in order into 4 bits each, from the lowest bits up.
+    Unused places are 0xF, which is never a seat.
+    '''
+    packed = (1 << 4 * places) - 1
+    for place, seat in enumerate(seats[:places]):
+        packed ^= (0xF ^ seat) << 4 * place
+    return packed
+
+
+def unpack_seats(packed, places=TEAM_ORDER_SEATS):
+    '''
+    returns the list of seats packed by pack_seats
+    '''
+    seats = []
+    for _ in range(places):
+        seat = packed & 0xF
+        if seat == 0xF:
+            break
+        seats.append(seat)
+        packed >>= 4
+    return seats
 
-        for a in self.agents:
-            a.game_outcome(self.missions_lost > 2, self.spies)
 
-    def results_to_csv(self):
-        '''Print results info to a CSV that can be analysed later'''
+def popcount(mask):
+    '''
+    returns the number of players set in mask
+    '''
+    return bin(mask).count('1')
 
 
+class PlayerSet(list):
+    '''
+    a list of player indexes that also holds them as a bitmask in mask.
+    The engine hands teams, votes and spy lists to agents as PlayerSets, so
+    membership, overlap and counts can be single bit operations on mask while
+    agents written against lists keep working.
+    The mask is not updated if the list is changed, so treat it as read only.
+    '''
+
+    __slots__ = ('mask',)
+
+    def __init__(self, players=(), mask=None):
+        '''
+        players is the list of player indexes in order,
+        mask is their bitmask if already known
+        '''
+        super().__init__(players)
+        if mask is None:
+            mask = 0
+            for i in self:
+                mask |= 1 << i
+        self.mask = mask
+
+    @classmethod
+    def from_mask(cls, mask):
+        '''
+        builds the set of players in mask, in player order
+        '''
+        return cls(from_bitmask(mask), mask)
+
 
 class Round():
     '''
     a representation of a round in the game.
+    A round only lives while it is played, afterwards it is
+    rendered on demand from the GameState.
     '''
 
-    def __init__(self, leader_id, agents, spies, rnd):
+    __slots__ = ('leader_id', 'agents', 'spies', 'rnd', 'state', 'observers')
+
+    def __init__(self, leader_id, agents, spies, rnd, state=None, observers=()):
         '''
         leader_id is the current leader (next to propose a mission)
         agents is the list of agents in the game,
         spies is the list of indexes of spies in the game
         rnd is what round the game is up to 
+        state is the GameState the round's proposals are recorded in
+        observers is the list of GameObservers following the game
         '''
         self.leader_id = leader_id
         self.agents = agents
         self.spies = spies
         self.rnd = rnd
-        self.missions = []
+        self.state = state if state is not None else GameState(len(agents), spies)
+        self.observers = observers
+
+    @classmethod
+    def view(cls, state, agents, rnd):
+        '''
+        builds a round from a recorded game state
+        '''
+        proposals = state.round_proposals(rnd)
+        leader_id = (state.leader_id(proposals[-1]) + 1) % len(agents)
+        return cls(leader_id, agents, state.spy_list(), rnd, state)
+
+    @property
+    def missions(self):
+        return [Mission.view(self.state, self.agents, i) for i in self.state.round_proposals(self.rnd)]
 
     def __str__(self):
         '''
@@ -127,10 +402,10 @@ class Round():
         '''
         produces a formal representation of the round
         '''
-        s = 'Round(leader_id=' + self.leader_id \
-                + ', agents=' + self.agents \
-                + ', rnd=' + self.rnd \
-                + ', missions=' + self.missions+')'
+        s = 'Round(leader_id=' + str(self.leader_id) \
+                + ', agents=' + str(self.agents) \
+                + ', rnd=' + str(self.rnd) \
+                + ', missions=' + str(self.missions)+')'
         return s        
 
     def play(self):
@@ -139,44 +414,82 @@ class Round():
         or five missions are proposed, 
         and returns True is the final mission was successful
         '''
-        mission_size = Agent.mission_sizes[len(self.agents)][self.rnd]
-        fails_required = Agent.fails_required[len(self.agents)][self.rnd]
-        while len(self.missions)<5:
-            team = self.agents[self.leader_id].propose_mission(mission_size, fails_required)
-            mission = Mission(self.leader_id, team, self.agents, self.spies, self.rnd, len(self.missions)==4)
-            self.missions.append(mission)
-            self.leader_id = (self.leader_id+1) % len(self.agents)
-            if mission.is_approved():
-                return mission.is_successful()
-        return mission.is_successful()   
+        agents = self.agents
+        state = self.state
+        mission_size = Agent.mission_sizes[len(agents)][self.rnd]
+        fails_required = Agent.fails_required[len(agents)][self.rnd]
+        for proposal in range(5):
+            team = agents[self.leader_id].propose_mission(mission_size, fails_required)
+            index = state.proposals
+            state.proposals += 1
+            betrayals = Mission.play(state, index, agents, self.rnd, self.leader_id, team, proposal==4, fails_required, self.observers)
+            self.leader_id = (self.leader_id+1) % len(agents)
+            if betrayals != NOT_SENT:
+                return betrayals < fails_required
+        return False
 
     def is_successful(self):
         '''
         returns true is the mission was successful
         '''
-        return len(self.missions)>0 and self.missions[-1].is_successful()
+        proposals = self.state.round_proposals(self.rnd)
+        return len(proposals)>0 and Mission.view(self.state, self.agents, proposals[-1]).is_successful()
 
 
 class Mission():
     '''
     a representation of a proposed mission
+    A mission only lives while it is run, afterwards it is
+    rendered on demand from the GameState.
     '''
+
+    __slots__ = ('leader_id', 'team', 'agents', 'spies', 'rnd', 'state', 'index')
     
-    def __init__(self, leader_id, team, agents, spies, rnd, auto_approve):
+    def __init__(self, leader_id, team, agents, spies, rnd, auto_approve, state=None):
         '''
         leader_id is the id of the agent who proposed the mission
         team is the list of agent indexes on the mission
         agents is the list of agents in the game,
         spies is the list of indexes of spies in the game
         rnd is the round number of the game
+        state is the GameState the mission is recorded in
         '''
         self.leader_id = leader_id
         self.team = team
         self.agents = agents
         self.spies = spies
         self.rnd = rnd
+        self.state = state if state is not None else GameState(len(agents), spies)
+        self.index = self.state.proposals
+        self.state.proposals += 1
         self.run(auto_approve)
 
+    @classmethod
+    def view(cls, state, agents, index):
+        '''
+        builds a mission from a recorded game state
+        '''
+        mission = cls.__new__(cls)
+        mission.leader_id = state.leader_id(index)
+        mission.team = state.team(index)
+        mission.agents = agents
+        mission.spies = state.spy_list()
+        mission.rnd = state.rnd(index)
+        mission.state = state
+        mission.index = index
+        return mission
+
+    @property
+    def votes_for(self):
+        return self.state.votes_for(self.index)
+
+    @property
+    def betrayals(self):
+        '''
+        the number of agents that betrayed the mission, None if it was not sent
+        '''
+        betrayals = self.state.betrayals(self.index)
+        return None if betrayals == NOT_SENT else betrayals
 
     def run(self, auto_approve):    
         '''
@@ -184,16 +497,103 @@ class Mission():
         and if the vote is in favour,
         asking spies if they wish to fail the mission
         '''
-        self.votes_for = [i for i in range(len(self.agents)) if auto_approve or self.agents[i].vote(self.team, self.leader_id)]
-        for a in self.agents:
-            a.vote_outcome(self.team, self.leader_id, self.votes_for)
-        if 2*len(self.votes_for) > len(self.agents):
-            self.fails = [i for i in self.team if i in self.spies and self.agents[i].betray(self.team, self.leader_id)]
-            success = len(self.fails) < Agent.fails_required[len(self.agents)][self.rnd]
-            for a in self.agents:
-                a.mission_outcome(self.team,self.leader_id, len(self.fails), success)
+        fails_required = Agent.fails_required[len(self.agents)][self.rnd]
+        Mission.play(self.state, self.index, self.agents, self.rnd, self.leader_id, self.team, auto_approve, fails_required)
 
+    @staticmethod
+    def play(state, index, agents, rnd, leader_id, team, auto_approve, fails_required, observers=()):
+        '''
+        Runs proposal index of the game state without building a Mission.
+        Returns the number of betrayals, or NOT_SENT if the mission was not approved.
+        '''
+        team = Mission.record_proposal(state, index, rnd, leader_id, team, observers)
 
+        if auto_approve:
+            votes_mask = (1 << len(agents)) - 1
+        else:
+            votes_mask = 0
+            for i, a in enumerate(agents):
+                if a.vote(team, leader_id):
+                    votes_mask |= 1 << i
+
+        if not Mission.record_votes(state, index, agents, rnd, leader_id, team, votes_mask, observers):
+            return NOT_SENT
+
+        spies = state.spies
+        betrayals = 0
+        betrayers = 0
+        for i in team:
+            if spies >> i & 1 and agents[i].betray(team, leader_id):
+                betrayals += 1
+                betrayers |= 1 << i
+
+        return Mission.record_betrayals(state, index, agents, rnd, leader_id, team,
+                                        betrayals, betrayers, fails_required, observers)
+
+    # The steps of a proposal, shared by every engine.  The engine collects the
+    # decisions, in turn or concurrently, and each step records them in the
+    # game state and informs the agents and observers.
+
+    @staticmethod
+    def record_proposal(state, index, rnd, leader_id, team, observers=()):
+        '''
+        Records team as proposal index, led by leader_id in round rnd.
+        Returns the team as the PlayerSet handed to the agents.
+        '''
+        records = state.records
+        offset = index * GameState.WIDTH
+
+        team_mask = to_bitmask(team)
+        team = PlayerSet(team, team_mask)
+        team_order = pack_seats(team)
+        records[offset] = leader_id | rnd << 8
+        records[offset + 1] = team_mask
+        records[offset + 5] = team_order & 0xFFFF
+        records[offset + 6] = team_order >> 16
+        if observers:
+            for o in observers:
+                o.proposal(rnd, leader_id, team)
+        return team
+
+    @staticmethod
+    def record_votes(state, index, agents, rnd, leader_id, team, votes_mask, observers=()):
+        '''
+        Records the votes for proposal index as a bitmask and sends the vote outcome.
+        Returns True if the mission was approved.
+        '''
+        votes_for = PlayerSet.from_mask(votes_mask)
+        state.records[index * GameState.WIDTH + 2] = votes_mask
+
+        for a in agents:
+            a.vote_outcome(team, leader_id, votes_for)
+        if observers:
+            for o in observers:
+                o.vote(rnd, leader_id, team, votes_for)
+        if 2*popcount(votes_mask) <= len(agents):
+            state.records[index * GameState.WIDTH + 3] = NOT_SENT
+            state.history.rejected()
+            return False
+        return True
+
+    @staticmethod
+    def record_betrayals(state, index, agents, rnd, leader_id, team, betrayals, betrayers, fails_required, observers=()):
+        '''
+        Records the betrayals of the approved proposal index and sends the mission outcome.
+        Returns the number of betrayals.
+        '''
+        records = state.records
+        offset = index * GameState.WIDTH
+
+        records[offset + 3] = betrayals
+        records[offset + 4] = betrayers
+        state.history.mission(team.mask, betrayals)
+        success = betrayals < fails_required
+        for a in agents:
+            a.mission_outcome(team, leader_id, betrayals, success)
+        if observers:
+            for o in observers:
+                o.mission(rnd, leader_id, team, betrayals, success)
+        return betrayals
 
     def __str__(self):
         '''
@@ -206,7 +606,7 @@ class Mission():
         for i in self.votes_for:
             s+= str(self.agents[i])+', '
         if self.is_approved():    
-            s = s[:-2]+'\nFails recorded: '+ str(len(self.fails))
+            s = s[:-2]+'\nFails recorded: '+ str(self.betrayals)
             s += "\nSPIES: " 
             for i in self.spies:
                 s += str(i)+', '
@@ -219,34 +619,25 @@ class Mission():
         '''
         Creates formal (json) representation of the mission
         '''
-        return 'Mission(leader_id='+ self.agents[leader_id] \
-                       + ', team='+self.team \
-                       +', agents='+self.agents \
-                       +', rnd='+self.rnd \
-                       +', votes_for='+self.votes_for \
-                       +', fail_num=' +len(self.fails)+')'
+        return 'Mission(leader_id='+ str(self.leader_id) \
+                       + ', team='+str(self.team) \
+                       +', agents='+str(self.agents) \
+                       +', rnd='+str(self.rnd) \
+                       +', votes_for='+str(self.votes_for) \
+                       +', fail_num=' +str(self.betrayals)+')'
 
     
     def is_approved(self):
         '''
         Returns True if the mission is approved, 
         False if the mission is not approved,
-        and 
-        Raises an exception if the mission has not yet had the votes recorded
         '''
-        return 2*len(self.votes_for) > len(self.agents)
+        return self.state.records[self.index * GameState.WIDTH + 3] != NOT_SENT
 
     def is_successful(self):
         '''
         Returns True is no agents failed the mission 
         (or only one agent failed round 4 in a game of 7 or more players)
-        raises an exception if the mission is not approved or fails not recorded.
         '''
-        return self.is_approved() and len(self.fails) < Agent.fails_required[len(self.agents)][self.rnd]
-                
-
-
-
-
-
-
+        betrayals = self.state.records[self.index * GameState.WIDTH + 3]
+        return betrayals != NOT_SENT and betrayals < Agent.fails_required[len(self.agents)][self.rnd]
@@ -0,0 +1,230 @@
+'''
+Game Log
+
+An append-only binary log of played games.  Each game is written as a single
+struct-packed record once it has been played, so no text is formatted while
+games are running.  The text form of a game is only produced when a record is
+rendered with str().
+
+A log at path is made up of three files:
+
+    path        the game records
+    path.idx    the byte offset of every record as an unsigned 64 bit int
+    path.names  the agent names, one per line, referenced by line number
+
+Each record is laid out little-endian as:
+
+    record length                               uint16
+    number of players, missions lost, proposals uint8 x 3
+    spies bitmask                               uint16
+    spies in the order dealt (pack_seats)       uint16
+    seating (name number of each seat)          uint16 x number of players
+    proposals (GameState records)               uint16 x 7 x proposals
+
+Teams and spies keep the order they were proposed and dealt in, so a record
+renders the same text as str() of the game it was logged from.  A writer
+created with check set reads every record back as it is appended and raises
+GameLogException if its text differs from the game's, as rendered by
+describe_game.
+'''
+
+# Standard Modules
+import os
+import struct
+
+# Game Play Modules
+from agent import Agent
+from events import GameObserver
+from game import GameState, describe_game, pack_seats, unpack_seats
+
+
+LENGTH = struct.Struct('<H')
+HEADER = struct.Struct('<BBBHH')
+
+# The most spies in a game, packed into one uint16
+SPY_ORDER_SEATS = 4
+OFFSET = struct.Struct('<Q')
+
+
+class GameLogWriter(GameObserver):
+    '''Appends played games to a game log.  As a GameObserver it logs
+    every game it is given to or subscribed for as the game ends.'''
+
+    def __init__(self, path, check=False):
+        '''If check is set every game is read back as it is appended and
+        compared with the game's own text'''
+
+        self.path = path
+        self.check = check
+        self.names = dict()
+
+        if os.path.exists(path + '.names'):
+            with open(path + '.names', encoding='utf-8') as names_file:
+                for number, name in enumerate(names_file.read().splitlines()):
+                    self.names[name] = number
+
+        self.log_file = open(path, 'ab')
+        self.index_file = open(path + '.idx', 'ab')
+        self.names_file = open(path + '.names', 'a', encoding='utf-8')
+
+        self.offset = self.log_file.tell()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _name_number(self, name):
+        '''Returns the number of an agent name, adding it to the names file if new'''
+
+        if name not in self.names:
+
+            if '\n' in name:
+                raise GameLogException("Agent names in a game log cannot contain new lines")
+
+            self.names[name] = len(self.names)
+            self.names_file.write(name + '\n')
+
+        return self.names[name]
+
+    def append(self, game):
+        '''Append a played Game or AllocatedAgentsGame to the log'''
+
+        state = game.state
+
+        if state is None:
+            raise GameLogException("Only played games can be logged")
+
+        seating = [self._name_number(str(agent.name)) for agent in game.agents]
+        proposals = state.tobytes()
+
+        header = HEADER.pack(state.number_of_players, game.missions_lost, state.proposals, state.spies,
+                             pack_seats(state.spy_order, SPY_ORDER_SEATS))
+        body = header + struct.pack('<{}H'.format(len(seating)), *seating) + proposals
+
+        if self.check:
+            names = {number: name for name, number in self.names.items()}
+            record = parse_record(body, [names[number] for number in range(len(names))])
+            if str(record) != describe_game(game.agents, game.rounds, game.missions_lost, game.spies):
+                raise GameLogException("A logged game does not read back as it was played")
+
+        self.log_file.write(LENGTH.pack(len(body)) + body)
+        self.index_file.write(OFFSET.pack(self.offset))
+
+        self.offset += LENGTH.size + len(body)
+
+    def game_end(self, game):
+        self.append(game)
+
+    def flush(self):
+
+        self.names_file.flush()
+        self.log_file.flush()
+        self.index_file.flush()
+
+    def close(self):
+
+        self.names_file.close()
+        self.log_file.close()
+        self.index_file.close()
+
+
+class GameLogReader():
+    '''Reads the records of a game log.  Iterating streams the records in order,
+    and indexing by game number seeks straight to a record using the index.'''
+
+    def __init__(self, path):
+
+        self.path = path
+
+        with open(path + '.names', encoding='utf-8') as names_file:
+            self.names = names_file.read().splitlines()
+
+    def __len__(self):
+
+        return os.path.getsize(self.path + '.idx') // OFFSET.size
+
+    def __iter__(self):
+
+        with open(self.path, 'rb') as log_file:
+            while True:
+                length = log_file.read(LENGTH.size)
+
+                if len(length) < LENGTH.size:
+                    return
+
+                yield self._parse(log_file.read(LENGTH.unpack(length)[0]))
+
+    def __getitem__(self, game_number):
+
+        if game_number < 0:
+            game_number += len(self)
+
+        with open(self.path + '.idx', 'rb') as index_file:
+            index_file.seek(game_number * OFFSET.size)
+            offset = index_file.read(OFFSET.size)
+
+        if len(offset) < OFFSET.size:
+            raise IndexError("Game {} is not in the log".format(game_number))
+
+        with open(self.path, 'rb') as log_file:
+            log_file.seek(OFFSET.unpack(offset)[0])
+            length = LENGTH.unpack(log_file.read(LENGTH.size))[0]
+            return self._parse(log_file.read(length))
+
+    def _parse(self, body):
+
+        return parse_record(body, self.names)
+
+
+def parse_record(body, names):
+    '''Builds the GameRecord of a record body, where names are the agent
+    names by name number'''
+
+    number_of_players, missions_lost, proposals, spies, spy_order = HEADER.unpack_from(body)
+
+    seating_end = HEADER.size + 2 * number_of_players
+    seating = struct.unpack_from('<{}H'.format(number_of_players), body, HEADER.size)
+
+    agents = [names[number] for number in seating]
+    state = GameState.frombytes(number_of_players, spies, body[seating_end:],
+                                unpack_seats(spy_order, SPY_ORDER_SEATS))
+
+    return GameRecord(agents, missions_lost, state)
+
+
+class GameRecord():
+    '''A game read back from a game log.  Holds the compact game state and
+    only builds the text of the game when it is asked for.'''
+
+    __slots__ = ('agents', 'missions_lost', 'state')
+
+    def __init__(self, agents, missions_lost, state):
+        '''
+        agents is the list of agent names in seat order,
+        missions_lost is the number of failed missions,
+        state is the GameState holding the proposals of the game
+        '''
+        self.agents = agents
+        self.missions_lost = missions_lost
+        self.state = state
+
+    @property
+    def spies(self):
+        return self.state.spy_list()
+
+    @property
+    def resistance_won(self):
+        return self.missions_lost < 3
+
+    def __str__(self):
+        '''
+        Renders the game as the text produced by Game.__str__
+        '''
+        agents = [Agent(name) for name in self.agents]
+        return describe_game(agents, self.state.rounds(agents), self.missions_lost, self.spies)
+
+
+class GameLogException(Exception):
+    '''Raise when a game cannot be written to a game log'''
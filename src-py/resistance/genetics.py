@@ -11,6 +11,8 @@ import datetime
 import logging
 import random
 
+import numpy
+
 
 class AgentGenetics():
     '''Holds values for which a player will either trust another player
@@ -71,6 +73,96 @@ class AgentPredisposition():
    
     
 
+class BeliefTable():
+    '''Holds the level of trust for every player in a game, with a row per
+    player and a NumPy column for each AgentPredisposition field.
+
+    The columns are allocated once for the largest table and reset for each
+    game, so an agent reuses its table from game to game.  Alongside the
+    columns the table keeps
+
+        ranking             players ordered from the most to the least trusted,
+                            with ties in player order
+        confirmed_players   players with the confirmed distrust level
+        burnt_players       players that have been burnt
+        confirmed_mask      confirmed_players as a bitmask of player indexes
+        burnt_mask          burnt_players as a bitmask of player indexes
+
+    which are only updated when a distrust level or burnt flag changes, so
+    levels and flags are set through set_level, burn and aggregate.
+    '''
+
+    MAX_PLAYERS = 10
+
+    def __init__(self, confirmed_level=2.0):
+        '''
+        confirmed_level is the distrust level of a player known to be a spy
+        '''
+        self.confirmed_level = confirmed_level
+
+        self._distrust_level = numpy.empty(self.MAX_PLAYERS)
+        self._mission_distrust = numpy.empty(self.MAX_PLAYERS)
+        self._vote_distrust = numpy.empty(self.MAX_PLAYERS)
+        self._proposal_distrust = numpy.empty(self.MAX_PLAYERS)
+        self._burnt = numpy.empty(self.MAX_PLAYERS, dtype=bool)
+
+        self.reset(0)
+
+    def reset(self, number_of_players):
+        '''Start a new game of number_of_players with the AgentPredisposition defaults'''
+
+        self.number_of_players = number_of_players
+
+        self.distrust_level = self._distrust_level[:number_of_players]
+        self.mission_distrust = self._mission_distrust[:number_of_players]
+        self.vote_distrust = self._vote_distrust[:number_of_players]
+        self.proposal_distrust = self._proposal_distrust[:number_of_players]
+        self.burnt = self._burnt[:number_of_players]
+
+        self.distrust_level.fill(0.8)
+        self.mission_distrust.fill(0.5)
+        self.vote_distrust.fill(0.1)
+        self.proposal_distrust.fill(0.2)
+        self.burnt.fill(False)
+
+        self.ranking = list(range(number_of_players))
+        self.confirmed_players = set()
+        self.burnt_players = set()
+        self.confirmed_mask = 0
+        self.burnt_mask = 0
+
+    def rerank(self):
+        '''Rebuild the ranking and confirmed players from the distrust levels'''
+
+        self.ranking = self.distrust_level.argsort(kind='stable').tolist()
+        confirmed = (self.distrust_level == self.confirmed_level).nonzero()[0].tolist()
+        self.confirmed_players = set(confirmed)
+        self.confirmed_mask = sum(1 << player for player in confirmed)
+
+    def set_level(self, player, level):
+        '''Set the distrust level of player'''
+
+        if self.distrust_level[player] != level:
+            self.distrust_level[player] = level
+            self.rerank()
+
+    def burn(self, player):
+        '''Mark player as burnt, which also confirms them as a spy'''
+
+        self.set_level(player, self.confirmed_level)
+        self.burnt[player] = True
+        self.burnt_players.add(player)
+        self.burnt_mask |= 1 << player
+
+    def aggregate(self):
+        '''Set the distrust level of every unconfirmed player to the sum of
+        their mission, vote and proposal distrust'''
+
+        total = self.mission_distrust + self.vote_distrust + self.proposal_distrust
+        numpy.copyto(self.distrust_level, total, where=self.distrust_level != self.confirmed_level)
+        self.rerank()
+
+
 class AgentOriginator():
 
     def __init__(self):
@@ -0,0 +1,312 @@
+'''
+Load Test
+
+Capacity planning for the tournament server.  A game hosting process runs a
+TournamentServer while client processes connect thousands of synthetic agents
+to it, built from RandomAgent and DeterministicAgent.  The server then plays a
+number of games at each step of increasing concurrency and reports:
+
+    games/sec           games completed per second of the step
+    decision RTT        p50, p99 and max of the time from sending a decision
+                        request to receiving the answer, measured by the server
+    memory per game     growth of the server's resident memory over its idle
+                        baseline, divided by the number of games in progress.
+                        Read from /proc so only available on Linux, and only
+                        approximate as freed memory is rarely returned.
+
+Run from the resistance directory:
+
+    python load_test.py --clients 2000 --concurrency 1 10 100 300 --games 1000
+
+The clients share event loops, so when they are starved of CPU the round trip
+times include client time.  Spread them over more processes with
+--client-processes to keep them ahead of the server.
+'''
+
+# Standard Modules
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import time
+from queue import Empty
+
+# Game Play Modules
+from agent.random_agent import RandomAgent
+from agent.deterministic_agent import DeterministicAgent
+from timing import LatencyHistogram
+from tournament_server import TournamentServer, run_client
+
+
+BEHAVIOURS = {
+    'random': [RandomAgent],
+    'deterministic': [DeterministicAgent],
+    'mixed': [RandomAgent, DeterministicAgent]
+}
+
+SAMPLE_INTERVAL = 0.05
+
+# Seconds between checks that the game hosting process is still running
+POLL_INTERVAL = 1.0
+
+
+def raise_file_limit():
+    '''Every client is a socket, so allow as many open files as the system will'''
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def resident_memory():
+    '''Resident memory of this process in bytes, or None if it can't be read'''
+
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+async def run_step(server, concurrency, number_of_games, number_of_players, step_timeout):
+    '''Play one step of the load test and return its measurements'''
+
+    latency = LatencyHistogram()
+    for agent in server.idle:
+        agent.latency = latency
+
+    baseline = resident_memory()
+    samples = list()
+
+    async def sample():
+        while True:
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            samples.append((server.active_games, resident_memory()))
+
+    sampler = asyncio.ensure_future(sample())
+    games_before = server.games_played
+    start = time.perf_counter()
+
+    try:
+        await asyncio.wait_for(server.play_games(number_of_games, number_of_players, concurrency), step_timeout)
+        completed = True
+    except asyncio.TimeoutError:
+        logging.warning("LOAD TEST STEP AT CONCURRENCY %s TIMED OUT", concurrency)
+        completed = False
+
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+
+    games = server.games_played - games_before
+
+    memory_per_game = None
+    active = [(games_active, memory) for games_active, memory in samples if games_active > 0 and memory is not None]
+    if baseline is not None and active:
+        peak_games = max(games_active for games_active, _ in active)
+        peak_memory = max(memory for _, memory in active)
+        memory_per_game = max(0, peak_memory - baseline) / peak_games
+
+    return {
+        'concurrency': concurrency,
+        'games': games,
+        'completed': completed,
+        'seconds': elapsed,
+        'games_per_second': games / elapsed if elapsed > 0 else 0.0,
+        'decisions': latency.calls,
+        'rtt_p50': latency.percentile(50),
+        'rtt_p99': latency.percentile(99),
+        'rtt_max': latency.max,
+        'memory_per_game': memory_per_game,
+        'connected_agents': len(server.idle)
+    }
+
+
+async def host(port_queue, results_queue, number_of_clients, steps, number_of_players, timeout, step_timeout,
+               connect_timeout):
+    '''Play the steps of the load test.  Ends the results with None however it
+    stops, after an {'error': text} result if it failed.'''
+
+    server = TournamentServer(timeout=timeout)
+
+    try:
+        port = await server.start(port=0)
+        port_queue.put(port)
+
+        try:
+            await asyncio.wait_for(server.wait_for_agents(number_of_clients), connect_timeout)
+        except asyncio.TimeoutError:
+            raise LoadTestException("{} of {} clients connected in {}s".format(len(server.idle), number_of_clients,
+                                                                              connect_timeout))
+
+        for concurrency, number_of_games in steps:
+            results_queue.put(await run_step(server, concurrency, number_of_games, number_of_players, step_timeout))
+
+    except Exception as error:
+        results_queue.put({'error': "{}: {}".format(type(error).__name__, error)})
+        raise
+
+    finally:
+        results_queue.put(None)
+        await server.close()
+
+
+def host_process(port_queue, results_queue, number_of_clients, steps, number_of_players, timeout, step_timeout,
+                 connect_timeout):
+    '''Game hosting process'''
+
+    raise_file_limit()
+    asyncio.run(host(port_queue, results_queue, number_of_clients, steps, number_of_players, timeout, step_timeout,
+                     connect_timeout))
+
+
+async def connect_clients(port, first, count, behaviour):
+
+    agent_classes = BEHAVIOURS[behaviour]
+    clients = list()
+
+    for i in range(first, first + count):
+        agent_class = agent_classes[i % len(agent_classes)]
+        agent = agent_class(name='LOAD_{}_{}'.format(agent_class.__name__, i))
+        clients.append(asyncio.ensure_future(run_client(agent, port=port)))
+
+    await asyncio.gather(*clients, return_exceptions=True)
+
+
+def client_process(port, first, count, behaviour):
+    '''Client process running count synthetic agents on one event loop'''
+
+    raise_file_limit()
+    asyncio.run(connect_clients(port, first, count, behaviour))
+
+
+def receive(queue, process):
+    '''The next item put on queue by process.  Raises LoadTestException if
+    the process exits without putting one.'''
+
+    while True:
+        try:
+            return queue.get(timeout=POLL_INTERVAL)
+        except Empty:
+            pass
+
+        if not process.is_alive():
+            # Anything put before it exited has been flushed by now
+            try:
+                return queue.get(timeout=POLL_INTERVAL)
+            except Empty:
+                raise LoadTestException("game hosting process exited with code {}".format(process.exitcode))
+
+
+def load_test(number_of_clients=1000, concurrency=(1, 10, 100), number_of_games=500, number_of_players=5,
+              behaviour='random', client_processes=1, timeout=5.0, step_timeout=600.0, connect_timeout=60.0):
+    '''Run the load test and return the measurements of each step.  Raises
+    LoadTestException if the game hosting process fails, including when the
+    clients haven't all connected within connect_timeout seconds.'''
+
+    needed = max(concurrency) * number_of_players
+    if number_of_clients < needed:
+        raise LoadTestException("{} clients can't fill {} tables of {}".format(number_of_clients,
+                                                                               max(concurrency),
+                                                                               number_of_players))
+
+    port_queue = multiprocessing.Queue()
+    results_queue = multiprocessing.Queue()
+    steps = [(level, number_of_games) for level in concurrency]
+
+    server = multiprocessing.Process(target=host_process,
+                                     args=(port_queue, results_queue, number_of_clients, steps,
+                                           number_of_players, timeout, step_timeout, connect_timeout))
+    server.start()
+
+    error = None
+    try:
+        port = receive(port_queue, server)
+    except LoadTestException as exception:
+        # The reason is read from the results below
+        error = str(exception)
+        number_of_clients = 0
+
+    clients = list()
+    per_process = max(1, -(-number_of_clients // client_processes))
+    for first in range(0, number_of_clients, per_process):
+        count = min(per_process, number_of_clients - first)
+        process = multiprocessing.Process(target=client_process, args=(port, first, count, behaviour))
+        process.start()
+        clients.append(process)
+
+    results = list()
+    try:
+        while True:
+            result = receive(results_queue, server)
+
+            if result is None:
+                break
+
+            if 'error' in result:
+                error = result['error']
+                continue
+
+            print_step(result)
+            results.append(result)
+
+    except LoadTestException as exception:
+        error = str(exception)
+
+    server.join()
+    for process in clients:
+        # Clients still in a game when the host failed are never told to close
+        process.join(None if error is None else POLL_INTERVAL)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    if error is not None:
+        raise LoadTestException("load test failed: {}".format(error))
+
+    return results
+
+
+def print_step(result):
+
+    memory = result['memory_per_game']
+    memory = "n/a" if memory is None else "{:.1f} KB".format(memory / 1024)
+
+    print("CONCURRENCY {concurrency}: {games} games in {seconds:.2f}s, {games_per_second:.1f} games/sec, "
+          "RTT p50 {p50:.3f}ms p99 {p99:.3f}ms max {max:.3f}ms, {memory} per active game".format(
+              concurrency=result['concurrency'],
+              games=result['games'],
+              seconds=result['seconds'],
+              games_per_second=result['games_per_second'],
+              p50=result['rtt_p50'] * 1000,
+              p99=result['rtt_p99'] * 1000,
+              max=result['rtt_max'] * 1000,
+              memory=memory))
+
+
+class LoadTestException(Exception):
+    '''Raise when a load test is configured so it can't run, or fails'''
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Load test the tournament server")
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--games', type=int, default=500, help="games played at each concurrency")
+    parser.add_argument('--players', type=int, default=5)
+    parser.add_argument('--behaviour', choices=sorted(BEHAVIOURS), default='random')
+    parser.add_argument('--client-processes', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=5.0, help="seconds allowed for each decision")
+    parser.add_argument('--json', help="write the results to this file")
+    arguments = parser.parse_args()
+
+    load_results = load_test(arguments.clients, arguments.concurrency, arguments.games, arguments.players,
+                             arguments.behaviour, arguments.client_processes, arguments.timeout)
+
+    if arguments.json:
+        with open(arguments.json, 'w') as json_file:
+            json.dump(load_results, json_file, indent=2)
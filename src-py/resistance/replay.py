@@ -0,0 +1,208 @@
+'''
+Replay
+
+Re-runs games recorded in a game log with one seat swapped for the agent
+under test.  The game is played through the normal Game, Round and Mission
+classes with the recorded seating and spies, but while the public history
+still matches the record every other seat answers propose_mission, vote and
+betray from the record instead of calling its agent.  Only the agent under
+test makes decisions, and each one is checked against the record.  At the
+first decision that differs the replay has diverged and every seat is played
+live from then on.
+
+The other seats' agents still receive new_game and every *_outcome call
+during the replay so they are ready to take over at a divergence.  Agents that
+change their own state inside propose_mission, vote or betray miss those
+changes for the replayed part of the game.
+'''
+
+# Standard Modules
+import logging
+
+# Game Play Modules
+from agent import Agent
+from game import Game, NOT_SENT, to_bitmask
+from game_log import GameLogReader
+
+
+class ReplayGame(Game):
+    '''A game played from a GameRecord with the agent at test_seat making
+    its own decisions and every other seat following the record until
+    the replay diverges.'''
+
+    record = None
+    test_seat = None
+    diverged_at = None
+
+    def __init__(self, record, agents, test_seat, log=None, observers=None, budget=None):
+        '''
+        record is the GameRecord to replay,
+        agents is the list of agents in the recorded seat order,
+        with the agent under test at test_seat.
+        A DecisionBudget given as budget times the agents inside their seats,
+        so the answers read from the record aren't timed, and a default the
+        agent under test plays on overrunning is checked like any decision.
+        '''
+
+        if len(agents) != record.state.number_of_players:
+            raise ReplayException("The number of agents does not match the recorded game")
+
+        self.record = record
+        self.test_seat = test_seat
+        self.diverged_at = None
+        self.proposal = -1
+
+        # The recorded game may have been dealt with another seat leading first
+        self.first_leader = record.state.leader_id(0)
+
+        # The seats keep track of the replay, so they must see every decision
+        # even when the timed agent they hold forfeits it
+        if budget is not None:
+            agents = budget.seats(agents)
+
+        seats = [RecordedSeat(self, agent, seat) for seat, agent in enumerate(agents)]
+        seats[test_seat] = TestSeat(self, agents[test_seat], test_seat)
+
+        super().__init__(seats, log, observers)
+
+    def _setup_agents(self, agents):
+
+        # Keep the recorded seating
+        self.agents = agents.copy()
+        self.num_players = len(agents)
+        self.spies = list()
+
+    def _allocate_spies(self):
+
+        self.spies = self.record.spies
+
+    def is_replaying(self):
+        '''True while the public history matches the record'''
+
+        return self.diverged_at is None and self.proposal < self.record.state.proposals
+
+    def diverged(self):
+        '''True if the agent under test has made a decision that differs from the record'''
+
+        return self.diverged_at is not None
+
+    def check(self, matches):
+        '''Mark the replay as diverged if a decision of the agent under test does not match'''
+
+        if self.diverged_at is None and not matches:
+            logging.debug("REPLAY DIVERGED AT PROPOSAL %s", self.proposal)
+            self.diverged_at = self.proposal
+
+
+class RecordedSeat(Agent):
+    '''Answers decisions from the record while the replay is in step,
+    and from the wrapped agent once it has diverged.'''
+
+    def __init__(self, replay, agent, seat):
+
+        self.replay = replay
+        self.agent = agent
+        self.seat = seat
+        self.name = agent.name
+
+    def __str__(self):
+        return str(self.agent)
+
+    def new_game(self, number_of_players, player_number, spies):
+        self.agent.new_game(number_of_players, player_number, spies)
+
+    def propose_mission(self, team_size, betrayals_required=1):
+
+        self.replay.proposal += 1
+
+        if self.replay.is_replaying():
+            return self.replay.record.state.team(self.replay.proposal)
+
+        return self.agent.propose_mission(team_size, betrayals_required)
+
+    def vote(self, mission, proposer):
+
+        if self.replay.is_replaying():
+            return self.seat in self.replay.record.state.votes_for(self.replay.proposal)
+
+        return self.agent.vote(mission, proposer)
+
+    def vote_outcome(self, mission, proposer, votes):
+        self.agent.vote_outcome(mission, proposer, votes)
+
+    def betray(self, mission, proposer):
+
+        if self.replay.is_replaying():
+            return self.seat in self.replay.record.state.betrayers(self.replay.proposal)
+
+        return self.agent.betray(mission, proposer)
+
+    def mission_outcome(self, mission, proposer, betrayals, mission_success):
+        self.agent.mission_outcome(mission, proposer, betrayals, mission_success)
+
+    def round_outcome(self, rounds_complete, missions_failed):
+        self.agent.round_outcome(rounds_complete, missions_failed)
+
+    def game_outcome(self, spies_win, spies):
+        self.agent.game_outcome(spies_win, spies)
+
+
+class TestSeat(RecordedSeat):
+    '''Always asks the agent under test, and checks its decisions against
+    the record while the replay is in step.'''
+
+    def propose_mission(self, team_size, betrayals_required=1):
+
+        self.replay.proposal += 1
+        team = self.agent.propose_mission(team_size, betrayals_required)
+
+        if self.replay.is_replaying():
+            self.replay.check(to_bitmask(team) == self.replay.record.state.team_mask(self.replay.proposal))
+
+        return team
+
+    def vote(self, mission, proposer):
+
+        vote = self.agent.vote(mission, proposer)
+
+        if self.replay.is_replaying():
+            recorded = self.seat in self.replay.record.state.votes_for(self.replay.proposal)
+            self.replay.check(bool(vote) == recorded)
+
+        return vote
+
+    def betray(self, mission, proposer):
+
+        betrayal = self.agent.betray(mission, proposer)
+
+        if self.replay.is_replaying():
+            state = self.replay.record.state
+            recorded = (state.betrayals(self.replay.proposal) != NOT_SENT
+                        and self.seat in state.betrayers(self.replay.proposal))
+            self.replay.check(bool(betrayal) == recorded)
+
+        return betrayal
+
+
+def replay_log(path, agent_factory, test_agent, test_name):
+    '''Replay every game in the log at path that has a seat named test_name,
+    with test_agent playing that seat.  agent_factory(name) creates the agent
+    for every other recorded seat.  Yields each record with its ReplayGame.'''
+
+    for record in GameLogReader(path):
+
+        if test_name not in record.agents:
+            continue
+
+        test_seat = record.agents.index(test_name)
+        agents = [test_agent if seat == test_seat else agent_factory(name)
+                  for seat, name in enumerate(record.agents)]
+
+        game = ReplayGame(record, agents, test_seat)
+        game.play()
+
+        yield record, game
+
+
+class ReplayException(Exception):
+    '''Raise when a recorded game cannot be replayed with the given agents'''
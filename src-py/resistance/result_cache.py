@@ -0,0 +1,228 @@
+'''
+Result Cache
+
+A content addressed on-disk cache of AgentTester matchup results.  Each result
+is stored in its own small JSON file named by the SHA-256 of everything that
+decides it:
+
+    the source of the modules defining the agent classes in the matchup
+    the source of the game engine modules
+    the source of every project module those import, directly or indirectly
+    the default AgentPenalties and AgentGenetics values
+    the table size, the matchup (its type, classes and collusion probability)
+    the seed, the number of games and the tester options that change results
+
+Editing one agent module, or a helper module it imports such as genetics,
+changes the keys of the matchups that use it, so only those are played again.
+Only seeded runs are cached, as unseeded results can't be reproduced.
+
+The cache is bounded by max_bytes.  A hit marks its file as recently used, and
+when a store takes the cache over the bound the least recently used files are
+removed first.
+'''
+
+# Standard Modules
+import ast
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import tempfile
+
+# Game Play Modules
+from genetics import AgentGenetics, AgentPenalties
+
+
+DEFAULT_PATH = './logs/result_cache'
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+ENGINE_MODULES = ('agent', 'game', 'custom_games', 'timing')
+
+# Modules with source files under this directory are part of the project
+PROJECT_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def _project_file(module_name):
+    '''The source file of a project module, or None for any other module'''
+
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except (ImportError, ValueError):
+        return None
+
+    if spec is None or spec.origin is None or not spec.origin.endswith('.py'):
+        return None
+
+    origin = os.path.abspath(spec.origin)
+    if not origin.startswith(PROJECT_PATH + os.sep):
+        return None
+
+    return origin
+
+
+def _imported_names(module_name, path):
+    '''Every module name the source of a module imports, including imports
+    inside functions.  Names imported from a module may be submodules, so
+    they are listed too and the ones that aren't are dropped later.'''
+
+    with open(path) as source_file:
+        tree = ast.parse(source_file.read(), path)
+
+    package = module_name if path.endswith('__init__.py') else module_name.rpartition('.')[0]
+
+    names = list()
+    for node in ast.walk(tree):
+
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+
+        elif isinstance(node, ast.ImportFrom):
+
+            base = node.module or ''
+            if node.level:
+                parent = package.rsplit('.', node.level - 1)[0] if node.level > 1 else package
+                base = parent + '.' + base if base else parent
+
+            names.append(base)
+            names.extend(base + '.' + alias.name for alias in node.names)
+
+    # Importing a submodule imports its packages too
+    return [prefix for name in names
+            for prefix in ('.'.join(name.split('.')[:i + 1]) for i in range(name.count('.') + 1))]
+
+
+def project_dependencies(module_names):
+    '''The project modules among module_names and every project module they
+    import, directly or indirectly, as a sorted list of names'''
+
+    found = set()
+    pending = list(module_names)
+
+    while pending:
+
+        module_name = pending.pop()
+        if module_name in found:
+            continue
+
+        path = _project_file(module_name)
+        if path is None:
+            continue
+
+        found.add(module_name)
+        pending.extend(_imported_names(module_name, path))
+
+    return sorted(found)
+
+
+def module_source_hash(module_name):
+    '''SHA-256 of the source of a project module'''
+
+    path = _project_file(module_name)
+
+    try:
+        with open(path, 'rb') as source_file:
+            source = source_file.read()
+    except (OSError, TypeError):
+        # Fall back to the module's name when its source isn't on disk
+        source = module_name.encode()
+
+    return hashlib.sha256(source).hexdigest()
+
+
+def source_hashes(agent_classes):
+    '''SHA-256 of the source of every project module that decides how the
+    agent classes play, keyed by module name'''
+
+    modules = set(agent_class.__module__ for agent_class in agent_classes) | set(ENGINE_MODULES)
+
+    return {module: module_source_hash(module) for module in project_dependencies(modules)}
+
+
+def result_key(agent_classes, agent_count, matchup, seed, number_of_games, options=None):
+    '''The cache key of a matchup result'''
+
+    content = {
+        'sources': source_hashes(agent_classes),
+        'penalties': vars(AgentPenalties()),
+        'genetics': vars(AgentGenetics()),
+        'agent_count': agent_count,
+        'matchup': matchup,
+        'seed': seed,
+        'number_of_games': number_of_games,
+        'options': options or {}
+    }
+
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache():
+    '''Stores matchup results as files in a directory'''
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+
+        return os.path.join(self.path, key + '.json')
+
+    def get(self, key):
+        '''The result stored under key, or None'''
+
+        try:
+            with open(self._file(key)) as result_file:
+                result = json.load(result_file)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # Mark as recently used
+        os.utime(self._file(key))
+        self.hits += 1
+
+        return result
+
+    def put(self, key, result):
+        '''Store a JSON serialisable result under key'''
+
+        # Written to a temporary file and renamed so a result is never half written
+        descriptor, temporary = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as result_file:
+            json.dump(result, result_file)
+
+        os.replace(temporary, self._file(key))
+
+        self.evict()
+
+    def evict(self):
+        '''Remove the least recently used results until the cache fits in max_bytes'''
+
+        entries = list()
+        for entry in os.scandir(self.path):
+
+            if entry.name.endswith('.json'):
+                status = entry.stat()
+                entries.append((status.st_mtime, status.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+
+            if total <= self.max_bytes:
+                break
+
+            logging.debug("EVICTING CACHED RESULT %s", path)
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.json'):
+                os.remove(entry.path)
@@ -0,0 +1,230 @@
+'''
+Results Store
+
+An indexed SQLite store of played games, kept down to the single vote so
+questions like who votes against legitimate players, or how vote order changes
+with the round, can be answered with a query over millions of games.
+
+As a GameObserver the store reads each game's compact GameState once the game
+ends, so nothing is recorded while it is played.  Rows are buffered and
+written with executemany in one transaction per batch_size games, which keeps
+the cost of a commit off every game.  Call flush() or close() to write the
+last partial batch.
+
+Tables:
+
+    games       game_id, number_of_players, missions_lost, resistance_won, spies (bitmask)
+    players     game_id, seat, agent_class, agent_name, role ('spy' or 'resistance')
+    proposals   game_id, proposal, round, leader, team (bitmask), approved
+    votes       game_id, proposal, round, seat, role, vote_for
+    missions    game_id, proposal, round, leader, team (bitmask), betrayals, betrayers (bitmask), success
+
+Rounds are numbered 0-4 and proposals count up from 0 through the game.  The
+fifth proposal of a round is approved without a vote, so it has no rows in
+votes.  The players, votes and missions tables are indexed on agent class,
+seat, role and round.
+
+CSV export is a query over the store, so the same results can be analysed in
+a spreadsheet or with SQL.
+'''
+
+# Standard Modules
+import csv
+import sqlite3
+
+# Game Play Modules
+from agent import Agent
+from events import GameObserver
+from game import NOT_SENT
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    game_id INTEGER PRIMARY KEY,
+    number_of_players INTEGER NOT NULL,
+    missions_lost INTEGER NOT NULL,
+    resistance_won INTEGER NOT NULL,
+    spies INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    game_id INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    agent_class TEXT NOT NULL,
+    agent_name TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS proposals (
+    game_id INTEGER NOT NULL,
+    proposal INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    leader INTEGER NOT NULL,
+    team INTEGER NOT NULL,
+    approved INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS votes (
+    game_id INTEGER NOT NULL,
+    proposal INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    vote_for INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS missions (
+    game_id INTEGER NOT NULL,
+    proposal INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    leader INTEGER NOT NULL,
+    team INTEGER NOT NULL,
+    betrayals INTEGER NOT NULL,
+    betrayers INTEGER NOT NULL,
+    success INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS players_agent_class ON players (agent_class, role);
+CREATE INDEX IF NOT EXISTS players_seat ON players (game_id, seat);
+CREATE INDEX IF NOT EXISTS players_role ON players (role);
+CREATE INDEX IF NOT EXISTS proposals_round ON proposals (round);
+CREATE INDEX IF NOT EXISTS votes_seat ON votes (game_id, seat);
+CREATE INDEX IF NOT EXISTS votes_round ON votes (round, role);
+CREATE INDEX IF NOT EXISTS missions_round ON missions (round);
+'''
+
+# One row per agent class and role, as exported by Game.results_to_csv
+RESULTS_QUERY = '''
+SELECT players.agent_class, players.role, games.number_of_players,
+       COUNT(*) AS games,
+       SUM(CASE WHEN (players.role = 'spy') = (games.resistance_won = 0) THEN 1 ELSE 0 END) AS wins
+FROM players JOIN games ON games.game_id = players.game_id
+GROUP BY players.agent_class, players.role, games.number_of_players
+ORDER BY players.agent_class, players.role, games.number_of_players
+'''
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ResultsStore(GameObserver):
+    '''Writes played games to an SQLite database.  As a GameObserver it
+    stores every game it is given to or subscribed for as the game ends.'''
+
+    def __init__(self, path=':memory:', batch_size=DEFAULT_BATCH_SIZE):
+        '''
+        path is the database file, which is created if it doesn't exist,
+        batch_size is the number of games written in each transaction
+        '''
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+        self.next_game_id = self.connection.execute('SELECT COALESCE(MAX(game_id), -1) + 1 FROM games').fetchone()[0]
+        self._clear_batch()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _clear_batch(self):
+
+        self.pending = 0
+        self.games = list()
+        self.players = list()
+        self.proposals = list()
+        self.votes = list()
+        self.missions = list()
+
+    def append(self, game):
+        '''Add a played Game or AllocatedAgentsGame to the store'''
+
+        state = game.state
+
+        if state is None:
+            raise ResultsStoreException("Only played games can be stored")
+
+        game_id = self.next_game_id
+        self.next_game_id += 1
+
+        number_of_players = state.number_of_players
+        spies = state.spies
+        roles = ['spy' if spies >> seat & 1 else 'resistance' for seat in range(number_of_players)]
+
+        self.games.append((game_id, number_of_players, game.missions_lost, int(game.missions_lost < 3), spies))
+
+        for seat, agent in enumerate(game.agents):
+            self.players.append((game_id, seat, type(agent).__name__, str(agent.name), roles[seat]))
+
+        records = state.records
+        width = state.WIDTH
+        fails_required = Agent.fails_required[number_of_players]
+
+        attempt = 0
+        previous_round = None
+        for index in range(state.proposals):
+            offset = index * width
+            leader = records[offset] & 0xFF
+            rnd = records[offset] >> 8
+            attempt = attempt + 1 if rnd == previous_round else 0
+            previous_round = rnd
+            team = records[offset + 1]
+            votes_for = records[offset + 2]
+            betrayals = records[offset + 3]
+            approved = betrayals != NOT_SENT
+
+            self.proposals.append((game_id, index, rnd, leader, team, int(approved)))
+
+            # The engine records everyone as voting for the fifth proposal
+            if attempt < 4:
+                for seat in range(number_of_players):
+                    self.votes.append((game_id, index, rnd, seat, roles[seat], votes_for >> seat & 1))
+
+            if approved:
+                self.missions.append((game_id, index, rnd, leader, team, betrayals, records[offset + 4],
+                                      int(betrayals < fails_required[rnd])))
+
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def game_end(self, game):
+        self.append(game)
+
+    def flush(self):
+        '''Write the buffered games in a single transaction'''
+
+        if not self.pending:
+            return
+
+        with self.connection:
+            self.connection.executemany('INSERT INTO games VALUES (?, ?, ?, ?, ?)', self.games)
+            self.connection.executemany('INSERT INTO players VALUES (?, ?, ?, ?, ?)', self.players)
+            self.connection.executemany('INSERT INTO proposals VALUES (?, ?, ?, ?, ?, ?)', self.proposals)
+            self.connection.executemany('INSERT INTO votes VALUES (?, ?, ?, ?, ?, ?)', self.votes)
+            self.connection.executemany('INSERT INTO missions VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self.missions)
+
+        self._clear_batch()
+
+    def query(self, sql, parameters=()):
+        '''Run a query over everything stored, returning the cursor'''
+
+        self.flush()
+
+        return self.connection.execute(sql, parameters)
+
+    def to_csv(self, path, sql=RESULTS_QUERY, parameters=()):
+        '''Write the rows of a query, with its column names as the header, to a csv file'''
+
+        cursor = self.query(sql, parameters)
+
+        with open(path, 'w', newline='') as csv_file:
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow([column[0] for column in cursor.description])
+            csv_writer.writerows(cursor)
+
+    def close(self):
+
+        self.flush()
+        self.connection.close()
+
+
+class ResultsStoreException(Exception):
+    '''Raise when a game cannot be written to a results store'''
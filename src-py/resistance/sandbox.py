@@ -0,0 +1,255 @@
+'''
+Sandbox
+
+Hosts agents in worker processes so an agent that hangs or crashes can't take
+the engine down with it.  A SandboxedAgent stands in for an agent in any game
+and forwards its callbacks over a pipe to a long-lived worker process holding
+a copy of the agent.  The worker is kept warm and reused for every game the
+agent plays until it is closed.
+
+Messages are pickled (reply, calls) pairs sent with a length prefix by
+Connection.send_bytes, where calls is a list of (callback number, arguments)
+pairs.  The informational callbacks need no answer, so they are held back and
+sent in the same message as the agent's next decision.  Only messages ending
+in propose_mission, vote or betray ask for a reply, which makes a game one
+round trip per decision.  The callbacks left at the end of a game are sent on
+game_outcome without one.
+
+If the worker raises, does not reply within timeout seconds or dies, the agent
+plays the default action for the rest of the game:  proposing itself and the
+seats after it, voting for the mission and not betraying it.  A worker that
+timed out or died is replaced with a fresh copy of the agent for the next game.
+'''
+
+# Standard Modules
+import logging
+import multiprocessing
+import pickle
+import random
+import traceback
+
+# Game Play Modules
+from agent import Agent
+
+
+CALLBACKS = ('new_game', 'propose_mission', 'vote', 'vote_outcome', 'betray',
+             'mission_outcome', 'round_outcome', 'game_outcome')
+CALLBACK_NUMBERS = {callback: number for number, callback in enumerate(CALLBACKS)}
+CLOSE = len(CALLBACKS)
+
+DEFAULT_TIMEOUT = 1.0
+
+
+def serve(connection, agent, seed):
+    '''Worker process loop.  Runs each batch of callbacks on the agent and,
+    if the batch asks for a reply, replies with the result of the last one or
+    the traceback of a failure.'''
+
+    # Forked workers would otherwise all share the parent's random state
+    random.seed(seed)
+
+    while True:
+
+        try:
+            reply, calls = pickle.loads(connection.recv_bytes())
+        except EOFError:
+            return
+
+        result = None
+        try:
+            for number, args in calls:
+
+                if number == CLOSE:
+                    return
+
+                result = getattr(agent, CALLBACKS[number])(*args)
+
+        except Exception:
+            if reply:
+                connection.send_bytes(pickle.dumps((False, traceback.format_exc()), pickle.HIGHEST_PROTOCOL))
+            else:
+                logging.warning("SANDBOXED AGENT %s FAILED: %s", agent.name, traceback.format_exc())
+            continue
+
+        if reply:
+            connection.send_bytes(pickle.dumps((True, result), pickle.HIGHEST_PROTOCOL))
+
+
+class SandboxedAgent(Agent):
+    '''Plays an agent hosted in a worker process'''
+
+    def __init__(self, agent, timeout=DEFAULT_TIMEOUT):
+        '''
+        agent is the agent to host, which is copied into the worker,
+        timeout is the number of seconds to wait for each decision
+        '''
+        self.agent = agent
+        self.name = agent.name
+        self.timeout = timeout
+        self.process = None
+        self.connection = None
+        self.pending = list()
+        self.failed = False
+        self.failures = 0
+        self.number_of_players = None
+        self.player_number = None
+
+    def __str__(self):
+        return str(self.agent)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+
+        # A worker belongs to the process that started it
+        state = self.__dict__.copy()
+        state['process'] = None
+        state['connection'] = None
+        return state
+
+    def _start(self):
+
+        self.connection, worker_connection = multiprocessing.Pipe()
+        seed = random.randrange(2 ** 63)
+        self.process = multiprocessing.Process(target=serve, args=(worker_connection, self.agent, seed), daemon=True)
+        self.process.start()
+        worker_connection.close()
+
+    def _stop(self):
+
+        if self.process is None:
+            return
+
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def _fail(self, reason):
+        '''Play default actions for the rest of the game'''
+
+        logging.warning("SANDBOXED AGENT %s FAILED: %s", self.name, reason)
+        self.failed = True
+        self.failures += 1
+        self.pending = list()
+
+    def _decide(self, callback, default, *args):
+        '''Send the pending callbacks and a decision to the worker and wait for its answer'''
+
+        if self.failed:
+            return default
+
+        calls = self.pending
+        calls.append((CALLBACK_NUMBERS[callback], args))
+        self.pending = list()
+
+        if self.process is None:
+            self._start()
+
+        try:
+            self.connection.send_bytes(pickle.dumps((True, calls), pickle.HIGHEST_PROTOCOL))
+
+            if not self.connection.poll(self.timeout):
+                self._stop()
+                self._fail("no reply to {} within {}s".format(callback, self.timeout))
+                return default
+
+            succeeded, result = pickle.loads(self.connection.recv_bytes())
+
+        except (EOFError, OSError) as error:
+            self._stop()
+            self._fail("worker died ({})".format(error))
+            return default
+
+        if not succeeded:
+            self._fail(result)
+            return default
+
+        return result
+
+    def _inform(self, callback, *args):
+
+        if not self.failed:
+            self.pending.append((CALLBACK_NUMBERS[callback], args))
+
+    def flush(self):
+        '''Send the pending callbacks to the worker without waiting for a reply'''
+
+        if not self.pending:
+            return
+
+        calls = self.pending
+        self.pending = list()
+
+        if self.process is None:
+            self._start()
+
+        try:
+            self.connection.send_bytes(pickle.dumps((False, calls), pickle.HIGHEST_PROTOCOL))
+        except OSError as error:
+            self._stop()
+            self._fail("worker died ({})".format(error))
+
+    def close(self):
+        '''Send any pending callbacks and shut down the worker process'''
+
+        self.flush()
+
+        if self.process is None:
+            return
+
+        try:
+            self.connection.send_bytes(pickle.dumps((False, [(CLOSE, ())]), pickle.HIGHEST_PROTOCOL))
+        except OSError:
+            pass
+
+        self.process.join(self.timeout)
+        self._stop()
+
+    def new_game(self, number_of_players, player_number, spies):
+
+        self.failed = False
+        self.number_of_players = number_of_players
+        self.player_number = player_number
+        self._inform('new_game', number_of_players, player_number, spies)
+
+    def propose_mission(self, team_size, betrayals_required=1):
+        default = [(self.player_number + i) % self.number_of_players for i in range(team_size)]
+        return self._decide('propose_mission', default, team_size, betrayals_required)
+
+    def vote(self, mission, proposer):
+        return self._decide('vote', True, mission, proposer)
+
+    def vote_outcome(self, mission, proposer, votes):
+        self._inform('vote_outcome', mission, proposer, votes)
+
+    def betray(self, mission, proposer):
+        return self._decide('betray', False, mission, proposer)
+
+    def mission_outcome(self, mission, proposer, betrayals, mission_success):
+        self._inform('mission_outcome', mission, proposer, betrayals, mission_success)
+
+    def round_outcome(self, rounds_complete, missions_failed):
+        self._inform('round_outcome', rounds_complete, missions_failed)
+
+    def game_outcome(self, spies_win, spies):
+        self._inform('game_outcome', spies_win, spies)
+        self.flush()
+
+
+def sandbox(agents, timeout=DEFAULT_TIMEOUT):
+    '''Host each of a list of agents in its own worker process'''
+
+    return [SandboxedAgent(agent, timeout) for agent in agents]
+
+
+def close_all(agents):
+    '''Shut down the workers of a list of sandboxed agents'''
+
+    for agent in agents:
+        agent.close()
@@ -0,0 +1,102 @@
+'''
+Stopping
+
+Sequential stopping rules for AgentTester.  With a rule set the tester plays a
+matchup in chunks of games and checks the rule on the running resistance wins
+after each chunk, stopping as soon as the rule is met or number_of_games have
+been played.
+
+ConfidenceWidth     stops once the Wilson score interval of the resistance
+                    win rate is narrower than width
+SPRT                Wald's sequential probability ratio test of the resistance
+                    win rate being at most p0 against being at least p1.  The
+                    default asks whether the resistance or the spies are the
+                    stronger side, to within 5% either side of even.
+'''
+
+# Standard Modules
+import math
+from statistics import NormalDist
+
+
+class ConfidenceWidth():
+    '''Stop when the confidence interval of the win rate is narrower than width'''
+
+    def __init__(self, width=0.02, confidence=0.95, chunk_size=200):
+
+        self.width = width
+        self.confidence = confidence
+        self.chunk_size = chunk_size
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    def interval(self, wins, games):
+        '''Wilson score interval of the win rate'''
+
+        rate = wins / games
+        z2 = self.z ** 2
+
+        centre = (rate + z2 / (2 * games)) / (1 + z2 / games)
+        half_width = self.z * math.sqrt(rate * (1 - rate) / games + z2 / (4 * games ** 2)) / (1 + z2 / games)
+
+        return centre - half_width, centre + half_width
+
+    def done(self, wins, games):
+
+        low, high = self.interval(wins, games)
+
+        return high - low < self.width
+
+    def describe(self, wins, games):
+
+        low, high = self.interval(wins, games)
+
+        return "{}% CONFIDENCE INTERVAL: {} - {}%".format(round(self.confidence * 100, 3),
+                                                          round(low * 100, 3),
+                                                          round(high * 100, 3))
+
+
+class SPRT():
+    '''Stop when the win rate is decided to be at most p0 or at least p1,
+    with false positive rate alpha and false negative rate beta'''
+
+    def __init__(self, p0=0.45, p1=0.55, alpha=0.05, beta=0.05, chunk_size=50):
+
+        self.p0 = p0
+        self.p1 = p1
+        self.chunk_size = chunk_size
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+
+    def log_likelihood_ratio(self, wins, games):
+
+        return (wins * math.log(self.p1 / self.p0)
+                + (games - wins) * math.log((1 - self.p1) / (1 - self.p0)))
+
+    def decision(self, wins, games):
+        '''True if the win rate is at least p1, False if at most p0 and None if undecided'''
+
+        ratio = self.log_likelihood_ratio(wins, games)
+
+        if ratio >= self.upper:
+            return True
+
+        if ratio <= self.lower:
+            return False
+
+        return None
+
+    def done(self, wins, games):
+
+        return self.decision(wins, games) is not None
+
+    def describe(self, wins, games):
+
+        decision = self.decision(wins, games)
+
+        if decision is None:
+            return "UNDECIDED"
+
+        if decision:
+            return "RESISTANCE WIN RATE AT LEAST {}%".format(round(self.p1 * 100, 3))
+
+        return "RESISTANCE WIN RATE AT MOST {}%".format(round(self.p0 * 100, 3))
@@ -0,0 +1,247 @@
+'''
+Timing
+
+Decision time budgets for agents.  A game given a DecisionBudget plays every
+seat through a TimedAgent, which measures the wall time of each callback from
+the first proposal to game_outcome.  The latencies are recorded in a
+LatencyTelemetry shared by all the games using the budget.
+
+Agents are called in the game's own process, so a slow callback can't be
+interrupted.  The budget is enforced once the callback returns:
+
+    per_call    a propose_mission, vote or betray that takes longer is
+                discarded and the default action is played instead
+    per_game    an agent whose callbacks take longer in total over a game
+                forfeits it.  It is not called again that game and plays the
+                default action for every remaining decision.
+
+The default actions are to propose the leader and the seats after it, to vote
+for the mission and not to betray it, so a forfeited agent can't stall a round.
+
+Latencies are kept in fixed log scale histograms per agent class and callback,
+so the memory used does not grow with the number of games played.
+'''
+
+# Standard Modules
+import csv
+import logging
+import math
+from time import perf_counter
+
+# Game Play Modules
+from agent import Agent
+
+
+# Histogram buckets per doubling of latency, from 1 microsecond
+BUCKETS_PER_OCTAVE = 8
+BUCKET_COUNT = 36 * BUCKETS_PER_OCTAVE
+
+DECISIONS = ('propose_mission', 'vote', 'betray')
+
+
+class LatencyHistogram():
+    '''Counts latencies in log scale buckets.  Percentiles are the upper
+    bound of the bucket they fall in, so are within 9% of the true value.'''
+
+    __slots__ = ('counts', 'calls', 'total', 'max', 'overruns')
+
+    def __init__(self):
+
+        self.counts = [0] * BUCKET_COUNT
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.overruns = 0
+
+    def add(self, seconds):
+
+        microseconds = seconds * 1e6
+        bucket = 0 if microseconds <= 1 else min(int(math.log2(microseconds) * BUCKETS_PER_OCTAVE) + 1,
+                                                  BUCKET_COUNT - 1)
+
+        self.counts[bucket] += 1
+        self.calls += 1
+        self.total += seconds
+
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        '''Add the counts of another histogram to this one'''
+
+        for bucket, count in enumerate(other.counts):
+            self.counts[bucket] += count
+
+        self.calls += other.calls
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.overruns += other.overruns
+
+    def percentile(self, percent):
+        '''Latency in seconds that percent of the calls took no longer than'''
+
+        if self.calls == 0:
+            return 0.0
+
+        target = math.ceil(self.calls * percent / 100)
+        seen = 0
+
+        for bucket, count in enumerate(self.counts):
+            seen += count
+
+            if seen >= target:
+                upper = 2 ** (bucket / BUCKETS_PER_OCTAVE) / 1e6
+                return min(upper, self.max)
+
+        return self.max
+
+
+class LatencyTelemetry():
+    '''Latency histograms by agent class and callback, and the number of
+    games each agent class has forfeited'''
+
+    def __init__(self):
+
+        self.histograms = dict()
+        self.forfeits = dict()
+
+    def histogram(self, agent_class, callback):
+
+        key = (agent_class, callback)
+
+        if key not in self.histograms:
+            self.histograms[key] = LatencyHistogram()
+
+        return self.histograms[key]
+
+    def forfeit(self, agent_class):
+
+        self.forfeits[agent_class] = self.forfeits.get(agent_class, 0) + 1
+
+    def merge(self, other):
+        '''Add the telemetry of another LatencyTelemetry, such as one returned by a pool worker'''
+
+        for (agent_class, callback), histogram in other.histograms.items():
+            self.histogram(agent_class, callback).merge(histogram)
+
+        for agent_class, forfeits in other.forfeits.items():
+            self.forfeits[agent_class] = self.forfeits.get(agent_class, 0) + forfeits
+
+    def summary(self):
+        '''A row for each agent class and callback with the call count, the
+        p50, p99 and max latency in seconds and the number of overruns'''
+
+        return [{'agent_class': agent_class,
+                 'callback': callback,
+                 'calls': histogram.calls,
+                 'p50': histogram.percentile(50),
+                 'p99': histogram.percentile(99),
+                 'max': histogram.max,
+                 'overruns': histogram.overruns,
+                 'forfeits': self.forfeits.get(agent_class, 0)}
+                for (agent_class, callback), histogram in sorted(self.histograms.items())]
+
+    def to_csv(self, path):
+        '''Export the summary as a csv file'''
+
+        rows = self.summary()
+
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=['agent_class', 'callback', 'calls',
+                                                          'p50', 'p99', 'max', 'overruns', 'forfeits'])
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def print_summary(self):
+
+        for row in self.summary():
+            print("{agent_class} {callback}: {calls} calls, p50 {p50:.6f}s, p99 {p99:.6f}s, "
+                  "max {max:.6f}s, {overruns} overruns, {forfeits} forfeits".format(**row))
+
+
+class DecisionBudget():
+    '''Per call and per game time limits in seconds.  Either limit can be None
+    to only measure.  Every game using the budget records to its telemetry.'''
+
+    def __init__(self, per_call=None, per_game=None, telemetry=None):
+
+        self.per_call = per_call
+        self.per_game = per_game
+        self.telemetry = telemetry if telemetry is not None else LatencyTelemetry()
+
+    def seats(self, agents):
+        '''Wrap the seated agents of a game for timing'''
+
+        return [TimedAgent(agent, seat, len(agents), self) for seat, agent in enumerate(agents)]
+
+
+class TimedAgent(Agent):
+    '''Times the callbacks of the agent at a seat for a single game and
+    plays the default action when it goes over its budget'''
+
+    def __init__(self, agent, seat, number_of_players, budget):
+
+        self.agent = agent
+        self.seat = seat
+        self.number_of_players = number_of_players
+        self.name = agent.name
+        self.budget = budget
+        self.agent_class = agent.__class__.__name__
+        self.game_time = 0.0
+        self.forfeited = False
+
+    def __str__(self):
+        return str(self.agent)
+
+    def _call(self, callback, default, *args):
+        '''Call the agent, returning default if it has forfeited or overruns'''
+
+        if self.forfeited:
+            return default
+
+        start = perf_counter()
+        result = getattr(self.agent, callback)(*args)
+        elapsed = perf_counter() - start
+
+        histogram = self.budget.telemetry.histogram(self.agent_class, callback)
+        histogram.add(elapsed)
+        self.game_time += elapsed
+
+        if self.budget.per_call is not None and callback in DECISIONS and elapsed > self.budget.per_call:
+            logging.debug("%s OVERRAN %s BY %ss", self.name, callback, elapsed - self.budget.per_call)
+            histogram.overruns += 1
+            result = default
+
+        if self.budget.per_game is not None and self.game_time > self.budget.per_game:
+            logging.debug("%s FORFEITED THE GAME AFTER %ss", self.name, self.game_time)
+            self.budget.telemetry.forfeit(self.agent_class)
+            self.forfeited = True
+            result = default
+
+        return result
+
+    def new_game(self, number_of_players, player_number, spies):
+        # Untimed, as Game tells the agents of a new game before timing their seats
+        self.agent.new_game(number_of_players, player_number, spies)
+
+    def propose_mission(self, team_size, betrayals_required=1):
+        default = [(self.seat + i) % self.number_of_players for i in range(team_size)]
+        return self._call('propose_mission', default, team_size, betrayals_required)
+
+    def vote(self, mission, proposer):
+        return self._call('vote', True, mission, proposer)
+
+    def vote_outcome(self, mission, proposer, votes):
+        self._call('vote_outcome', None, mission, proposer, votes)
+
+    def betray(self, mission, proposer):
+        return self._call('betray', False, mission, proposer)
+
+    def mission_outcome(self, mission, proposer, betrayals, mission_success):
+        self._call('mission_outcome', None, mission, proposer, betrayals, mission_success)
+
+    def round_outcome(self, rounds_complete, missions_failed):
+        self._call('round_outcome', None, rounds_complete, missions_failed)
+
+    def game_outcome(self, spies_win, spies):
+        self._call('game_outcome', None, spies_win, spies)
@@ -0,0 +1,603 @@
+'''
+Tournament Server
+
+Hosts games between remote agents on a single asyncio event loop.  Agents
+connect over TCP, or over WebSocket when the websockets package is installed,
+and are played through the Agent method set.  Every connection joins a pool
+of idle agents.  Games are started by drawing players from the pool at random
+and the players go back in the pool when the game ends, so a connection plays
+game after game without reconnecting and no thread is used per connection.
+
+Messages are JSON objects.  Over TCP each message is sent with a 4 byte big
+endian length prefix, over WebSocket each message is a text frame.
+
+    client -> server    {"hello": name}                 on connecting
+    server -> client    {"calls": [[callback, arg, ...], ...], "reply": bool}
+    client -> server    {"result": value} or {"error": text}
+    server -> client    {"close": true}                 when shutting down
+
+The server queues the informational callbacks and sends them in the same
+message as the agent's next decision.  Only messages ending in a
+propose_mission, vote or betray ask for a reply, and the callbacks left at the
+end of a game are sent without one.  An agent that replies with an error or an
+invalid decision plays the default action for the rest of the game.  An agent
+that times out or disconnects is dropped from the pool, and a game waiting for
+players raises TournamentServerException once too few agents are connected.
+
+run_client connects any in-process Agent as a stand-in for a remote bot.
+'''
+
+# Standard Modules
+import asyncio
+import json
+import logging
+import random
+import struct
+import traceback
+from time import perf_counter
+
+# Game Play Modules
+from agent import Agent
+from agent.random_agent import RandomAgent
+from events import game_observers
+from game import GameState, Mission, to_bitmask
+
+# Optional Modules
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+PORT = 8765
+FRAME = struct.Struct('>I')
+DEFAULT_TIMEOUT = 1.0
+
+
+class StreamConnection():
+    '''Length prefixed JSON messages over an asyncio stream'''
+
+    def __init__(self, reader, writer):
+
+        self.reader = reader
+        self.writer = writer
+
+    async def recv(self):
+
+        header = await self.reader.readexactly(FRAME.size)
+        body = await self.reader.readexactly(FRAME.unpack(header)[0])
+        return json.loads(body)
+
+    async def send(self, message):
+
+        data = json.dumps(message, separators=(',', ':')).encode()
+        self.writer.write(FRAME.pack(len(data)) + data)
+        await self.writer.drain()
+
+    async def close(self):
+
+        self.writer.close()
+
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class WebSocketConnection():
+    '''JSON messages as WebSocket text frames'''
+
+    def __init__(self, websocket):
+
+        self.websocket = websocket
+
+    async def recv(self):
+
+        try:
+            return json.loads(await self.websocket.recv())
+        except websockets.ConnectionClosed as error:
+            raise ConnectionError(str(error))
+
+    async def send(self, message):
+
+        try:
+            await self.websocket.send(json.dumps(message, separators=(',', ':')))
+        except websockets.ConnectionClosed as error:
+            raise ConnectionError(str(error))
+
+    async def close(self):
+
+        await self.websocket.close()
+
+
+class RemoteAgent():
+    '''A connected agent.  The informational methods queue the callback and
+    the decisions are coroutines that send the queue and wait for the answer.'''
+
+    def __init__(self, connection, name, timeout=DEFAULT_TIMEOUT):
+
+        self.connection = connection
+        self.name = name
+        self.timeout = timeout
+        self.pending = list()
+        self.failed = False
+        self.connected = True
+        self.closed = asyncio.Event()
+        self.number_of_players = None
+        self.player_number = None
+
+        # A LatencyHistogram to record decision round trips in, if any
+        self.latency = None
+
+    def __str__(self):
+        return 'Agent ' + self.name
+
+    def __repr__(self):
+        return self.__str__()
+
+    async def _decide(self, callback, default, *args):
+
+        if self.failed or not self.connected:
+            return default
+
+        calls = self.pending
+        calls.append([callback, *args])
+        self.pending = list()
+
+        start = perf_counter()
+
+        try:
+            await self.connection.send({'calls': calls, 'reply': True})
+            message = await asyncio.wait_for(self.connection.recv(), self.timeout)
+
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError) as error:
+            logging.warning("REMOTE AGENT %s DISCONNECTED: %r", self.name, error)
+            await self.disconnect()
+            return default
+
+        except asyncio.CancelledError:
+            # The reply may still arrive and would be read as the answer to the
+            # agent's next decision, so the agent can't be played again
+            logging.warning("REMOTE AGENT %s DISCONNECTED: decision cancelled", self.name)
+            await self.disconnect()
+            raise
+
+        if self.latency is not None:
+            self.latency.add(perf_counter() - start)
+
+        if not isinstance(message, dict) or 'result' not in message:
+            self._fail(message.get('error') if isinstance(message, dict) else message)
+            return default
+
+        return message['result']
+
+    def _fail(self, reason):
+
+        logging.warning("REMOTE AGENT %s FAILED: %s", self.name, reason)
+        self.failed = True
+        self.pending = list()
+
+    def _inform(self, callback, *args):
+
+        if not self.failed and self.connected:
+            self.pending.append([callback, *args])
+
+    async def flush(self):
+        '''Send the queued callbacks without waiting for a reply'''
+
+        if not self.pending or not self.connected:
+            return
+
+        calls = self.pending
+        self.pending = list()
+
+        try:
+            await self.connection.send({'calls': calls, 'reply': False})
+        except ConnectionError:
+            await self.disconnect()
+
+    async def disconnect(self, message=None):
+
+        if not self.connected:
+            return
+
+        self.connected = False
+
+        try:
+            if message is not None:
+                await self.connection.send(message)
+            await self.connection.close()
+        except ConnectionError:
+            pass
+
+        self.closed.set()
+
+    def new_game(self, number_of_players, player_number, spies):
+
+        self.failed = False
+        self.number_of_players = number_of_players
+        self.player_number = player_number
+        self._inform('new_game', number_of_players, player_number, spies)
+
+    async def propose_mission(self, team_size, betrayals_required=1):
+
+        default = [(self.player_number + i) % self.number_of_players for i in range(team_size)]
+        team = await self._decide('propose_mission', default, team_size, betrayals_required)
+
+        # Seats are checked before the set is built, as JSON lists and objects can't be hashed
+        valid = (isinstance(team, list)
+                 and len(team) == team_size
+                 and all(type(i) is int and 0 <= i < self.number_of_players for i in team)
+                 and len(set(team)) == team_size)
+
+        if not valid:
+            self._fail("invalid team {}".format(team))
+            return default
+
+        return team
+
+    async def vote(self, mission, proposer):
+        return bool(await self._decide('vote', True, mission, proposer))
+
+    def vote_outcome(self, mission, proposer, votes):
+        self._inform('vote_outcome', mission, proposer, votes)
+
+    async def betray(self, mission, proposer):
+        return bool(await self._decide('betray', False, mission, proposer))
+
+    def mission_outcome(self, mission, proposer, betrayals, mission_success):
+        self._inform('mission_outcome', mission, proposer, betrayals, mission_success)
+
+    def round_outcome(self, rounds_complete, missions_failed):
+        self._inform('round_outcome', rounds_complete, missions_failed)
+
+    def game_outcome(self, spies_win, spies):
+        self._inform('game_outcome', spies_win, spies)
+
+
+class RemoteGame():
+    '''A game of RemoteAgents played as a coroutine.  Follows the rules and
+    turn order of game.Game, with the votes and betrayals of each proposal
+    collected from all players at once.'''
+
+    agents = None
+    num_players = 0
+    spies = None
+    state = None
+    log = None
+    observers = ()
+
+    def __init__(self, agents, log=None, observers=None):
+
+        if len(agents) < 5 or len(agents) > 10:
+            raise Exception('Agent array out of range')
+
+        self.log = log
+        self.observers = game_observers(observers, log)
+
+        self.agents = agents.copy()
+        random.shuffle(self.agents)
+        self.num_players = len(agents)
+        self.spies = random.sample(range(self.num_players), Agent.spy_count[self.num_players])
+        self.missions_lost = 0
+
+    @property
+    def rounds(self):
+        '''Rounds played so far, rendered from the game state'''
+
+        if self.state is None:
+            return []
+
+        return self.state.rounds(self.agents)
+
+    async def play(self):
+
+        agents = self.agents
+        number_of_players = self.num_players
+        state = self.state = GameState(number_of_players, self.spies)
+        observers = self.observers
+
+        for agent_id, agent in enumerate(agents):
+            spy_list = self.spies.copy() if agent_id in self.spies else []
+            agent.new_game(number_of_players, agent_id, spy_list)
+
+        if observers:
+            for o in observers:
+                o.game_start(self)
+
+        leader_id = 0
+        for rnd in range(5):
+
+            mission_size = Agent.mission_sizes[number_of_players][rnd]
+            fails_required = Agent.fails_required[number_of_players][rnd]
+            success = False
+
+            for proposal in range(5):
+
+                team = await agents[leader_id].propose_mission(mission_size, fails_required)
+
+                index = state.proposals
+                state.proposals += 1
+                team = Mission.record_proposal(state, index, rnd, leader_id, team, observers)
+
+                # The fifth proposal is approved without a vote
+                if proposal == 4:
+                    votes_mask = (1 << number_of_players) - 1
+                else:
+                    votes = await asyncio.gather(*[a.vote(team, leader_id) for a in agents])
+                    votes_mask = to_bitmask(i for i, vote in enumerate(votes) if vote)
+
+                proposer = leader_id
+                leader_id = (leader_id + 1) % number_of_players
+
+                if not Mission.record_votes(state, index, agents, rnd, proposer, team, votes_mask, observers):
+                    continue
+
+                on_mission = [i for i in team if state.spies >> i & 1]
+                betrayed = await asyncio.gather(*[agents[i].betray(team, proposer) for i in on_mission])
+                fails = [i for i, betrayal in zip(on_mission, betrayed) if betrayal]
+
+                betrayals = Mission.record_betrayals(state, index, agents, rnd, proposer, team,
+                                                     len(fails), to_bitmask(fails), fails_required, observers)
+                success = betrayals < fails_required
+                break
+
+            if not success:
+                self.missions_lost += 1
+
+            for a in agents:
+                a.round_outcome(rnd + 1, self.missions_lost)
+            if observers:
+                for o in observers:
+                    o.round_end(rnd + 1, self.missions_lost)
+
+        for a in agents:
+            a.game_outcome(self.missions_lost > 2, self.spies)
+        if observers:
+            for o in observers:
+                o.game_end(self)
+
+        await asyncio.gather(*[a.flush() for a in agents])
+
+
+class TournamentServer():
+    '''Accepts agent connections into a pool and plays games between them'''
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, log=None, observers=None):
+        '''
+        timeout is the number of seconds each agent has for a decision,
+        log and observers are given to every game played
+        '''
+        self.timeout = timeout
+        self.log = log
+        self.observers = observers
+        self.idle = list()
+        self.connected = list()
+        self.available = None
+        self.servers = list()
+        self.results = dict()
+        self.games_played = 0
+        self.active_games = 0
+
+    async def _join(self, connection):
+        '''Add a new connection to the pool and hold it open until it is dropped'''
+
+        try:
+            hello = await asyncio.wait_for(connection.recv(), self.timeout)
+            name = str(hello['hello'])
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, KeyError, TypeError, ValueError):
+            await connection.close()
+            return
+
+        agent = RemoteAgent(connection, name, self.timeout)
+
+        async with self.available:
+            self.idle.append(agent)
+            self.connected.append(agent)
+            self.available.notify_all()
+
+        await agent.closed.wait()
+
+        # Wake the games waiting for players, as there may no longer be enough
+        async with self.available:
+            if agent in self.idle:
+                self.idle.remove(agent)
+            self.connected.remove(agent)
+            self.available.notify_all()
+
+    async def _accept_stream(self, reader, writer):
+
+        await self._join(StreamConnection(reader, writer))
+
+    async def _accept_websocket(self, websocket, path=None):
+
+        await self._join(WebSocketConnection(websocket))
+
+    async def start(self, host='127.0.0.1', port=PORT):
+        '''Listen for TCP agents.  Returns the port, so port 0 picks a free one.'''
+
+        if self.available is None:
+            self.available = asyncio.Condition()
+
+        server = await asyncio.start_server(self._accept_stream, host, port)
+        self.servers.append(server)
+
+        return server.sockets[0].getsockname()[1]
+
+    async def start_websocket(self, host='127.0.0.1', port=PORT + 1):
+        '''Listen for WebSocket agents'''
+
+        if websockets is None:
+            raise TournamentServerException("WebSocket agents need the websockets package")
+
+        if self.available is None:
+            self.available = asyncio.Condition()
+
+        server = await websockets.serve(self._accept_websocket, host, port)
+        self.servers.append(server)
+
+        return port
+
+    async def wait_for_agents(self, count):
+        '''Wait until count agents have connected'''
+
+        async with self.available:
+            await self.available.wait_for(lambda: len(self.idle) >= count)
+
+    async def _acquire(self, number_of_players):
+        '''Draw number_of_players idle agents from the pool, waiting for games
+        to end if needed.  Raises TournamentServerException if fewer agents
+        than that are still connected.'''
+
+        async with self.available:
+            await self.available.wait_for(lambda: (len(self.idle) >= number_of_players
+                                                   or len(self.connected) < number_of_players))
+
+            if len(self.idle) < number_of_players:
+                raise TournamentServerException(
+                    "{} players wanted but only {} agents are connected".format(number_of_players,
+                                                                               len(self.connected)))
+
+            agents = random.sample(self.idle, number_of_players)
+            for agent in agents:
+                self.idle.remove(agent)
+
+        return agents
+
+    async def _release(self, agents):
+
+        async with self.available:
+            self.idle.extend(agent for agent in agents if agent.connected)
+            self.available.notify_all()
+
+    async def play_game(self, number_of_players):
+        '''Play a single game between players drawn from the pool'''
+
+        agents = await self._acquire(number_of_players)
+        self.active_games += 1
+
+        try:
+            game = RemoteGame(agents, self.log, self.observers)
+            await game.play()
+        finally:
+            self.active_games -= 1
+            await self._release(agents)
+
+        spies_win = game.missions_lost > 2
+        for seat, agent in enumerate(game.agents):
+            wins, games = self.results.get(agent.name, (0, 0))
+            self.results[agent.name] = (wins + ((seat in game.spies) == spies_win), games + 1)
+
+        self.games_played += 1
+
+        return game
+
+    async def play_games(self, number_of_games, number_of_players, concurrency=1):
+        '''Play number_of_games games with up to concurrency games in progress at once'''
+
+        remaining = [number_of_games]
+
+        async def table():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                await self.play_game(number_of_players)
+
+        tables = [asyncio.ensure_future(table()) for _ in range(concurrency)]
+
+        try:
+            await asyncio.gather(*tables)
+        except TournamentServerException:
+            # Let the games in progress finish before giving up
+            remaining[0] = 0
+            await asyncio.gather(*tables, return_exceptions=True)
+            raise
+
+    async def close(self):
+        '''Stop listening and disconnect every idle agent'''
+
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+
+        for agent in list(self.idle):
+            await agent.disconnect({'close': True})
+
+        self.idle = list()
+
+
+async def serve_agent(agent, connection):
+    '''Answer the server's messages with an in-process agent until it closes the connection'''
+
+    while True:
+
+        try:
+            message = await connection.recv()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+
+        if message.get('close'):
+            await connection.close()
+            return
+
+        try:
+            result = None
+            for callback, *args in message['calls']:
+                result = getattr(agent, callback)(*args)
+
+        except Exception:
+            if message['reply']:
+                await connection.send({'error': traceback.format_exc()})
+            continue
+
+        if message['reply']:
+            await connection.send({'result': result})
+
+
+async def run_client(agent, host='127.0.0.1', port=PORT):
+    '''Connect an in-process agent to a tournament server over TCP'''
+
+    reader, writer = await asyncio.open_connection(host, port)
+    connection = StreamConnection(reader, writer)
+
+    await connection.send({'hello': agent.name})
+    await serve_agent(agent, connection)
+
+
+async def run_websocket_client(agent, uri):
+    '''Connect an in-process agent to a tournament server over WebSocket'''
+
+    if websockets is None:
+        raise TournamentServerException("WebSocket agents need the websockets package")
+
+    async with websockets.connect(uri) as websocket:
+        connection = WebSocketConnection(websocket)
+
+        await connection.send({'hello': agent.name})
+        await serve_agent(agent, connection)
+
+
+class TournamentServerException(Exception):
+    '''Raise when the tournament server can't be started or can't seat a game as asked'''
+
+
+async def demonstration(number_of_agents=20, number_of_games=1000, number_of_players=5, concurrency=4):
+    '''Play games between local RandomAgents connected through the server'''
+
+    server = TournamentServer()
+    port = await server.start(port=0)
+
+    clients = [asyncio.ensure_future(run_client(RandomAgent(name='RANDOM_{}'.format(i)), port=port))
+               for i in range(number_of_agents)]
+
+    await server.wait_for_agents(number_of_agents)
+    await server.play_games(number_of_games, number_of_players, concurrency)
+    await server.close()
+    await asyncio.gather(*clients)
+
+    for name, (wins, games) in sorted(server.results.items()):
+        print("{}: WIN PERCENT {}% OF {} GAMES".format(name, round(wins / games * 100, 3), games))
+
+
+if __name__ == '__main__':
+
+    asyncio.run(demonstration())
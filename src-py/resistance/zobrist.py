@@ -0,0 +1,160 @@
+'''
+Zobrist
+
+Zobrist hashing of the public situation of a game, for agents that want to
+remember what they worked out about a situation when they reach it again.  Two
+histories are in the same public situation when they have the same table size,
+round and number of rejected proposals in the round, and the same team and
+number of betrayals on every mission played so far, however many proposals and
+votes it took to get there.  Which missions failed follows from the betrayals.
+
+The hash is the XOR of a random 64 bit key for each of these facts, so it is
+updated in constant time as each proposal is decided:
+
+    PublicHistory       the hash of a game, kept by the engine in each
+                        GameState as Mission.play decides proposals.  An agent
+                        can keep its own from its vote_outcome and
+                        mission_outcome callbacks, which gives the same values.
+    TranspositionTable  a bounded least recently used map from hashes, or
+                        keys built from them, to whatever an agent wants to
+                        memoize.  Keep one on an agent to reuse evaluations
+                        across decisions, and across games when the agent
+                        instance is kept from game to game.
+
+The keys are drawn from a fixed seed, so hashes are the same in every process
+and from run to run.  Votes and who led are not public situation, so anything
+memoized under a hash should only depend on the facts above.
+'''
+
+# Standard Modules
+from collections import OrderedDict
+
+# Numerical Modules
+import numpy
+
+
+SEED = 0x5245534953544E43
+
+ROUNDS = 5
+PROPOSALS = 5
+MAX_PLAYERS = 10
+MAX_TEAM_SIZE = 5
+
+
+def _keys(rng, *shape):
+    '''Random 64 bit keys as nested lists of ints'''
+
+    count = int(numpy.prod(shape))
+    keys = numpy.frombuffer(rng.bytes(8 * count), dtype=numpy.uint64)
+    return keys.reshape(shape).tolist()
+
+
+_rng = numpy.random.default_rng(SEED)
+
+# Keys for the table size, the rejections so far in each round and the team
+# and betrayals of each round's mission
+TABLE_KEYS = _keys(_rng, MAX_PLAYERS + 1)
+REJECTION_KEYS = _keys(_rng, ROUNDS, PROPOSALS)
+MISSION_KEYS = _keys(_rng, ROUNDS, 1 << MAX_PLAYERS, MAX_TEAM_SIZE + 1)
+
+
+class PublicHistory():
+    '''The incremental Zobrist hash of a game's public situation, in value'''
+
+    __slots__ = ('number_of_players', 'rnd', 'rejections', 'value')
+
+    def __init__(self, number_of_players):
+
+        self.number_of_players = number_of_players
+        self.rnd = 0
+        self.rejections = 0
+        self.value = TABLE_KEYS[number_of_players] ^ REJECTION_KEYS[0][0]
+
+    def rejected(self):
+        '''A proposal of the current round was voted down'''
+
+        rnd = self.rnd
+        if rnd < ROUNDS and self.rejections < PROPOSALS - 1:
+            self.value ^= REJECTION_KEYS[rnd][self.rejections] ^ REJECTION_KEYS[rnd][self.rejections + 1]
+            self.rejections += 1
+
+    def mission(self, team_mask, betrayals):
+        '''The mission of the current round was played by team_mask with betrayals betrayals'''
+
+        rnd = self.rnd
+        if rnd >= ROUNDS:
+            return
+
+        self.value ^= (MISSION_KEYS[rnd][team_mask][min(betrayals, MAX_TEAM_SIZE)]
+                       ^ REJECTION_KEYS[rnd][self.rejections])
+
+        self.rnd = rnd + 1
+        self.rejections = 0
+        if self.rnd < ROUNDS:
+            self.value ^= REJECTION_KEYS[self.rnd][0]
+
+    def vote_outcome(self, mission, proposer, votes):
+        '''Update from an agent's vote_outcome callback.  Approved teams are
+        hashed when the mission is played.'''
+
+        if 2 * len(votes) <= self.number_of_players:
+            self.rejected()
+
+    def mission_outcome(self, mission, proposer, betrayals, mission_success):
+        '''Update from an agent's mission_outcome callback'''
+
+        team_mask = 0
+        for player in mission:
+            team_mask |= 1 << player
+
+        self.mission(team_mask, betrayals)
+
+
+class TranspositionTable():
+    '''A bounded map from public situation keys to memoized values, evicting
+    the least recently used entry when it is full'''
+
+    def __init__(self, max_entries=100000):
+
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+
+        return len(self.entries)
+
+    def __contains__(self, key):
+
+        return key in self.entries
+
+    def get(self, key, default=None):
+        '''The value stored under key, or default'''
+
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        # Mark as recently used
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def put(self, key, value):
+        '''Store value under key, evicting the least recently used entry if the table is full'''
+
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,12 @@
+'''
+The game modules import each other as top level modules, as they do when run
+from the resistance directory, so the tests put that directory on the path.
+Run from src-py:
+
+    python -m pytest tests
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resistance'))
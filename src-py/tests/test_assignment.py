@@ -0,0 +1,39 @@
+'''
+Seeded AgentTester runs give the same wins however many workers play them
+'''
+
+import pytest
+
+import assignment
+from assignment import AgentTester
+from agent.random_agent import RandomAgent
+from agent.deterministic_agent import DeterministicAgent
+from agent.inference_agent import InferenceAgent
+
+
+NUMBER_OF_GAMES = 60
+SEED = 3001
+
+
+def matchups(tester):
+    '''The wins of a few matchups played by tester'''
+
+    return [tester.test_single_class(RandomAgent),
+            tester.test_classes_by_type(InferenceAgent, DeterministicAgent),
+            tester.test_classes_by_selected_spy(InferenceAgent, True, RandomAgent, DeterministicAgent)]
+
+
+@pytest.mark.parametrize('agent_count', [5, 7])
+@pytest.mark.parametrize('stratified', [False, True])
+def test_parallel_wins_match_serial(monkeypatch, agent_count, stratified):
+
+    # The tester reads the table size from the module, as the summary sweep sets it
+    monkeypatch.setattr(assignment, 'agent_count', agent_count, raising=False)
+
+    serial = AgentTester(NUMBER_OF_GAMES, seed=SEED, stratified=stratified)
+    parallel = AgentTester(NUMBER_OF_GAMES, workers=2, seed=SEED, stratified=stratified)
+
+    try:
+        assert matchups(parallel) == matchups(serial)
+    finally:
+        parallel.close()
@@ -0,0 +1,157 @@
+'''
+The vectorised SpyPosterior updates match brute force enumeration of the spy
+sets, with each event's likelihood worked out player by player from the
+OpponentModel
+'''
+
+import random
+from itertools import combinations
+from math import comb
+
+import numpy
+import pytest
+
+from agent import Agent
+from agent.spy_posterior import OpponentModel, SpyPosterior
+from game import to_bitmask
+
+
+@pytest.fixture(autouse=True)
+def table_cache(monkeypatch, tmp_path):
+
+    # The combinatorics tables are cached under the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def vote_likelihood(model, spies, team, leader, votes_for, number_of_players):
+    '''The probability of the leader proposing team and of the votes, if spies are the spies'''
+
+    dirty = any(player in spies for player in team)
+
+    if leader in spies:
+        likelihood = model.spy_leader_dirty if dirty else 1 - model.spy_leader_dirty
+    else:
+        likelihood = model.leader_dirty if dirty else 1 - model.leader_dirty
+
+    for player in range(number_of_players):
+
+        if player in spies:
+            approve = model.spy_approve_dirty if dirty else model.spy_approve_clean
+        else:
+            approve = model.resistance_approve
+
+        likelihood *= approve if player in votes_for else 1 - approve
+
+    return likelihood
+
+
+def mission_likelihood(model, spies, team, betrayals):
+    '''The probability of betrayals on the mission, if spies are the spies.
+    A player listed twice on the team is asked to betray twice.'''
+
+    spies_on_team = sum(player in spies for player in team)
+    if betrayals > spies_on_team:
+        return 0.0
+
+    return (comb(spies_on_team, betrayals)
+            * model.betrayal ** betrayals
+            * (1 - model.betrayal) ** (spies_on_team - betrayals))
+
+
+class BruteForcePosterior():
+    '''The posterior as a dictionary from spy sets to probabilities'''
+
+    def __init__(self, model, number_of_players, excluded=()):
+
+        self.model = model
+        self.number_of_players = number_of_players
+        spy_sets = combinations(range(number_of_players), Agent.spy_count[number_of_players])
+        self.probabilities = {spies: 0.0 if any(player in spies for player in excluded) else 1.0
+                              for spies in spy_sets}
+        self._normalise()
+
+    def _normalise(self):
+
+        total = sum(self.probabilities.values())
+        self.probabilities = {spies: probability / total for spies, probability in self.probabilities.items()}
+
+    def vote_outcome(self, team, leader, votes_for):
+
+        for spies in self.probabilities:
+            self.probabilities[spies] *= vote_likelihood(self.model, spies, team, leader, votes_for,
+                                                         self.number_of_players)
+        self._normalise()
+
+    def mission_outcome(self, team, betrayals):
+
+        for spies in self.probabilities:
+            self.probabilities[spies] *= mission_likelihood(self.model, spies, team, betrayals)
+        self._normalise()
+
+    def vector(self, spy_sets):
+        '''The probabilities in the order of the bitmasks spy_sets'''
+
+        by_mask = {to_bitmask(spies): probability for spies, probability in self.probabilities.items()}
+        return numpy.array([by_mask[int(mask)] for mask in spy_sets])
+
+
+@pytest.mark.parametrize('number_of_players', [5, 6, 7])
+@pytest.mark.parametrize('resistance_owner', [False, True])
+def test_updates_match_enumeration(number_of_players, resistance_owner):
+
+    rng = random.Random(number_of_players)
+    model = OpponentModel()
+    excluded = (0,) if resistance_owner else ()
+
+    posterior = SpyPosterior(model)
+    posterior.reset(number_of_players, excluded)
+    expected = BruteForcePosterior(model, number_of_players, excluded)
+
+    true_spies = rng.sample(range(1 if resistance_owner else 0, number_of_players),
+                            Agent.spy_count[number_of_players])
+
+    for rnd in range(5):
+
+        team_size = Agent.mission_sizes[number_of_players][rnd]
+
+        for leader in rng.sample(range(number_of_players), 2):
+
+            team = rng.sample(range(number_of_players), team_size)
+            votes_for = [player for player in range(number_of_players) if rng.random() < 0.6]
+
+            posterior.vote_outcome(to_bitmask(team), leader, to_bitmask(votes_for))
+            expected.vote_outcome(team, leader, votes_for)
+
+            numpy.testing.assert_allclose(posterior.probabilities, expected.vector(posterior.spy_sets),
+                                          rtol=1e-9, atol=1e-12)
+
+        # Betrayals the true spies could have made, so the update never rules everything out
+        spies_on_team = sum(player in true_spies for player in team)
+        betrayals = rng.randint(0, spies_on_team)
+
+        posterior.mission_outcome(team, betrayals)
+        expected.mission_outcome(team, betrayals)
+
+        numpy.testing.assert_allclose(posterior.probabilities, expected.vector(posterior.spy_sets),
+                                      rtol=1e-9, atol=1e-12)
+
+    marginals = [sum(probability for spies, probability in expected.probabilities.items() if player in spies)
+                 for player in range(number_of_players)]
+    numpy.testing.assert_allclose(posterior.marginals, marginals, rtol=1e-9, atol=1e-12)
+
+
+def test_duplicate_seats_betray_once_each():
+
+    model = OpponentModel()
+
+    posterior = SpyPosterior(model)
+    posterior.reset(5)
+    expected = BruteForcePosterior(model, 5)
+
+    # An agent may propose a team with a player listed twice
+    team = [1, 1, 3]
+    posterior.mission_outcome(team, 2)
+    expected.mission_outcome(team, 2)
+
+    numpy.testing.assert_allclose(posterior.probabilities, expected.vector(posterior.spy_sets),
+                                  rtol=1e-9, atol=1e-12)